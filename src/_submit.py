@@ -57,6 +57,7 @@ PlaylistItem = sp.PlaylistItem
 PlayblastExport = backend.PlayblastExport
 PlayListUtils = backend.PlayListUtils
 cacheexport = backend.cacheexport
+preflight = backend.preflight
 root_path = osp.dirname(osp.dirname(__file__))
 ui_path = osp.join(root_path, "ui")
 icon_path = osp.join(root_path, "icons")
@@ -400,9 +401,9 @@ class SubmitterWidget(QWidget):
         self.setTotalCount()
         return item
 
-    def setHUDColor(self):
+    def setHUDColor(self, viewport):
         color = "Green"
-        exportutils.setHUDColor(
+        viewport.setHUDColors(
             self.__colors_mapping__.get(color),
             self.__colors_mapping__.get(color),
         )
@@ -432,33 +433,69 @@ class SubmitterWidget(QWidget):
 
         return shots
 
+    def checkPaths(self, paths):
+        """Run the preflight checks for ``paths`` and keep the progress bar
+        moving as the results come in"""
+        paths = list(dict.fromkeys(paths))
+        self.progressBar.setMinimum(0)
+        self.progressBar.setMaximum(len(paths))
+        self.progressBar.setValue(0)
+        self.progressBar.show()
+
+        def onResult(path, status):
+            self.progressBar.setValue(self.progressBar.value() + 1)
+            qApp.processEvents()
+
+        try:
+            return preflight.checkPaths(
+                paths, onResult=onResult, idle=qApp.processEvents
+            )
+        finally:
+            self.progressBar.hide()
+            self.progressBar.setValue(0)
+
     def allPathsExist(self):
         shots = {}
-        for item in self.playlist.getItems():
-            if item.selected:
-                # assert item.actions is not None
-                for action in item.actions.getActions():
-                    if action.enabled and not osp.exists(action.path):  # type: ignore
-                        if item.name in shots:
-                            shots[item.name].append(action.path)  # type: ignore
-                        else:
-                            shots[item.name] = [action.path]  # type: ignore
+        actions = [
+            (item, action)
+            for item in self.playlist.getItems()
+            if item.selected
+            for action in item.actions.getActions()
+            if action.enabled
+        ]
+        results = self.checkPaths(
+            action.path
+            for _, action in actions
+            if not exportutils.isKnownDir(action.path)
+        )
+        for item, action in actions:
+            status = results.get(action.path, preflight.EXISTS)
+            if status != preflight.EXISTS:
+                path = action.path
+                if status == preflight.TIMEOUT:
+                    path += " (not responding)"
+                shots.setdefault(item.name, []).append(path)
 
         return shots
 
     def ldLinked(self):
         objects = []
+        refs = []
         for item in self.playlist.getItems():
             if item.selected:
                 # assert item.actions is not None
                 ce = CacheExport.getActionFromList(item.actions)
                 for _set in ce.get("objects", []):
                     ref = imaya.getRefFromSet(pc.PyNode(_set))
-                    if ref and osp.exists(str(ref.path)):
-                        if not exportutils.linkedLD(str(ref.path)):
-                            objects.append(_set)
-                    else:
-                        objects.append(_set)
+                    refs.append((_set, str(ref.path) if ref else None))
+
+        results = self.checkPaths(path for _, path in refs if path)
+        for _set, path in refs:
+            if path and results.get(path) == preflight.EXISTS:
+                if not exportutils.linkedLD(path):
+                    objects.append(_set)
+            else:
+                objects.append(_set)
 
         return objects
 
@@ -530,6 +567,8 @@ class SubmitterWidget(QWidget):
                 icon=QMessageBox.Information,
             )
             return
+        exportutils.forgetDirs()
+        self.createOutputDirs()
         badShots = self.allPathsExist()
         if badShots and not self.localButton.isChecked():
             numShots = len(badShots)
@@ -602,6 +641,10 @@ class SubmitterWidget(QWidget):
         except Exception:
             pass
 
+        exportutils.errorsList.extend(
+            self.createOutputDirs(withActions=not self.localButton.isChecked())
+        )
+        viewport = backend.viewportstate.ViewportState()
         try:
             self.exportButton.setEnabled(False)
             self.closeButton.setEnabled(False)
@@ -611,14 +654,15 @@ class SubmitterWidget(QWidget):
             exportutils.setOriginalCamera()
             exportutils.setOriginalFrame()
             exportutils.setSelection()
-            exportutils.saveHUDColor()
-            exportutils.hideShowCurves(True)
-            exportutils.hideFaceUi()
-            self.setHUDColor()
-            backend.playblast.showNameLabel()
+            viewport.snapshot(
+                item.camera for item in self._playlist.getItems() if item.selected
+            )
+            self.setHUDColor(viewport)
+            backend.hud.begin()
             errors = {}
             self.progressBar.setValue(0)
             self.stopButton.setEnabled(True)
+            exportutils.startTransfers()
             generator = self._playlist.performActions(
                 sound=self.audioButton.isChecked(),
                 hd=self.hdButton.isChecked(),
@@ -626,6 +670,7 @@ class SubmitterWidget(QWidget):
                 local=self.localButton.isChecked(),
                 hdOnly=self.hdOnlyButton.isChecked(),
                 defaultResolution=self.defaultResolutionButton.isChecked(),
+                viewport=viewport,
             )
             self.progressBar.setMaximum(typing.cast("int", next(generator)))
             qApp.processEvents()
@@ -640,6 +685,9 @@ class SubmitterWidget(QWidget):
                 qApp.processEvents()
 
             exportutils.saveMayaFile(self.playlist.getItems())
+            backend.playblast.finishEncoding()
+            review = backend.playblast.assembleSequence(self._playlist)
+            exportutils.finishTransfers()
             temp = " shots " if len(errors) > 1 else " shot "
             if errors:
                 detail = ""
@@ -662,7 +710,13 @@ class SubmitterWidget(QWidget):
                 + str(len(self._playlist.getItems())),
                 icon=QMessageBox.Information,
                 details="Exported shots: "
-                + ", ".join([item.name for item in self.playlist.getItems()]),
+                + ", ".join([item.name for item in self.playlist.getItems()])
+                + (
+                    "\nManifest: %s" % exportutils.lastManifest
+                    if exportutils.lastManifest
+                    else ""
+                )
+                + ("\nSequence movie: %s" % review if review else ""),
             )
 
         except Exception as ex:
@@ -677,15 +731,16 @@ class SubmitterWidget(QWidget):
                 ),
             )
         finally:
+            backend.playblast.finishEncoding()
+            exportutils.finishTransfers()
             self.progressBar.hide()
             PlayListUtils.restoreDisplayLayersState(state)
             exportutils.restoreOriginalCamera()
             exportutils.restoreOriginalFrame()
             exportutils.restoreSelection()
-            exportutils.restoreHUDColor()
-            exportutils.hideShowCurves(False)
-            exportutils.showFaceUi()
-            backend.playblast.removeNameLabel()
+            viewport.restore()
+            backend.capturepanel.close()
+            backend.hud.end()
             self.exportButton.setEnabled(True)
             self.closeButton.setEnabled(True)
             self.stopButton.hide()
@@ -730,32 +785,30 @@ class SubmitterWidget(QWidget):
 
     def getBasePath(self, cameraName):
         prefix = self.getSeqPath()
-        prefixPath = osp.join(prefix, "SHOTS")
-        if not osp.exists(prefixPath):
-            os.mkdir(prefixPath)
         cameraName = re.sub("(?i)^ep\\d*_", "", str(cameraName))
-        shotPath = osp.join(prefixPath, str(cameraName))
-        if not osp.exists(shotPath):
-            os.mkdir(shotPath)
-        return osp.join(shotPath, "animation")
+        return osp.join(prefix, "SHOTS", str(cameraName), "animation")
 
     def getCachePath(self, cameraName):
-        animPath = self.getBasePath(cameraName)
-        if not osp.exists(animPath):
-            os.mkdir(animPath)
-        cachePath = osp.join(animPath, "cache")
-        if not osp.exists(cachePath):
-            os.mkdir(cachePath)
-        return cachePath
+        return exportutils.planDir(
+            osp.join(self.getBasePath(cameraName), "cache")
+        )
 
     def getPlayblastPath(self, cameraName):
-        animPath = self.getBasePath(cameraName)
-        if not osp.exists(animPath):
-            os.mkdir(animPath)
-        previewPath = osp.join(animPath, "preview")
-        if not osp.exists(previewPath):
-            os.mkdir(previewPath)
-        return previewPath
+        return exportutils.planDir(
+            osp.join(self.getBasePath(cameraName), "preview")
+        )
+
+    def createOutputDirs(self, withActions=False):
+        """Create the directories planned by the path builders in one parallel
+        pass, ``withActions`` adds the ones the selected actions write into"""
+        if withActions:
+            for item in self.playlist.getItems():
+                if item.selected:
+                    for action in item.actions.getActions():
+                        if action.enabled:
+                            for path in action.outputDirs():
+                                exportutils.planDir(path)
+        return exportutils.createPlannedDirs()
 
 
 class SubmitterWindow(QMainWindow):
@@ -1059,6 +1112,7 @@ class ShotForm(QDialog):
         return self.autoCreateButton.isChecked()
 
     def callCreate(self):
+        self.submitterWidget.createOutputDirs()
         # playblastPath = str(self.playblastPathBox.text())
         # cachePath = str(self.cachePathBox.text())
         # if self.playblastEnableButton.isChecked() and not self.autoCreate():
@@ -1191,6 +1245,8 @@ class ShotForm(QDialog):
             self.progressBar.setValue(i + 1)
             qApp.processEvents()
 
+        for error in self.submitterWidget.createOutputDirs():
+            log.warning(error)
         self.progressBar.hide()
         self.progressBar.setValue(0)
         self.accept()
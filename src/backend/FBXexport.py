@@ -1,9 +1,11 @@
+import contextlib
 import pathlib
 import re
 import typing
 from logging import getLogger
 
 import maya.cmds as cmds
+import maya.mel as mel
 import pymel.core as pc
 from PySide2 import QtWidgets
 
@@ -18,6 +20,93 @@ if typing.TYPE_CHECKING:
 
 log = getLogger("FBXExport")
 
+# "exporter": the FBX plugin bakes the animation while it writes the file,
+# "undo": bake in the scene and undo it once the file is written
+BAKE_MODE = "exporter"
+BAKE_CHUNK = "multiShotExportFBXBake"
+# exporter settings for a baked export of the selection only
+EXPORTER_BAKE_SETTINGS = (
+    "FBXExportBakeComplexAnimation -v true",
+    "FBXExportBakeComplexStart -v %(start)d",
+    "FBXExportBakeComplexEnd -v %(end)d",
+    "FBXExportBakeComplexStep -v 1",
+    "FBXExportBakeResampleAnimation -v true",
+    "FBXExportConstraints -v false",
+    "FBXExportInputConnections -v false",
+)
+
+
+def loadFBXPlugin():
+    if not cmds.pluginInfo("fbxmaya", q=True, loaded=True):
+        cmds.loadPlugin("fbxmaya", quiet=True)
+
+
+def exportSelected(path: pathlib.Path):
+    cmds.file(
+        path.as_posix(),
+        force=True,
+        options="v=0",
+        type="FBX export",
+        preserveReferences=True,
+        exportSelected=True,
+    )
+
+
+@contextlib.contextmanager
+def exporterBake(start, end):
+    """Have the FBX exporter bake the animation of what it writes, the
+    user's exporter settings are put back after the block"""
+    mel.eval("FBXPushSettings")
+    try:
+        for setting in EXPORTER_BAKE_SETTINGS:
+            mel.eval(setting % {"start": start, "end": end})
+        yield
+    finally:
+        mel.eval("FBXPopSettings")
+
+
+@contextlib.contextmanager
+def undoneBake(nodes, start, end):
+    """Bake ``nodes`` in the scene for the block, in an undo chunk that is
+    undone after it. The selection is restored as well"""
+    selection = cmds.ls(selection=True, long=True) or []
+    undoState = cmds.undoInfo(q=True, state=True)
+    cmds.undoInfo(state=True)
+    cmds.undoInfo(openChunk=True, chunkName=BAKE_CHUNK)
+    try:
+        cmds.bakeResults(
+            nodes,
+            time=(start, end),
+            simulation=True,
+            sampleBy=1,
+            minimizeRotation=True,
+        )
+        yield
+    finally:
+        cmds.undoInfo(closeChunk=True)
+        # an empty chunk is not recorded, undoing would revert the artist's
+        # last action instead
+        if cmds.undoInfo(q=True, undoName=True) == BAKE_CHUNK:
+            cmds.undo()
+        else:
+            log.warning("Nothing was baked to undo")
+        cmds.undoInfo(state=undoState)
+        # without the nodes the bake or the undo deleted
+        selection = cmds.ls(selection, long=True) if selection else []
+        if selection:
+            cmds.select(selection, replace=True)
+        else:
+            cmds.select(clear=True)
+
+
+def bakeOnExport(nodes, start, end):
+    """Bake the animation of ``nodes`` into the export without leaving
+    anything in the scene, see :data:`BAKE_MODE`"""
+    if BAKE_MODE == "exporter" and mel.eval('exists "FBXExportBakeComplexAnimation"'):
+        return exporterBake(start, end)
+    return undoneBake(nodes, start, end)
+
+
 # class FBXConfig(typing_extensions.TypedDict):
 #     """Configuration for FBX export."""
 
@@ -69,6 +158,9 @@ class FBXExport(Action):
         pc.select(camera)
         fillinout.fill()
         pc.select(clear=True)
+        start = cmds.playbackOptions(q=True, minTime=True)
+        end = cmds.playbackOptions(q=True, maxTime=True)
+        loadFBXPlugin()
         tempPath = pathlib.Path(self.tempPath.name) / imaya.getNiceName(
             item.name,
         )
@@ -84,46 +176,22 @@ class FBXExport(Action):
                 continue
 
             group_rigname = group + ":Group"
-
-            dupe = typing.cast(
-                "pc.nt.Transform",
-                pc.duplicate(
-                    group_rigname,
-                    name=f"{group}_dupe:Group",
-                    renameChildren=True,
-                    upstreamNodes=True,
-                )[0],
-            )
-
-            log.info(f"Duplicated group {group_rigname} to {dupe.name()}")
-
-            dupe_sgs = [
+            sgs = [
                 x
-                for x in dupe.getChildren(type=pc.nt.Transform)
+                for x in pc.PyNode(group_rigname).getChildren(type=pc.nt.Transform)
                 if ns_regex.match(x.name())
             ]
 
-            pc.select(*dupe_sgs, replace=True)
+            pc.select(*sgs, replace=True)
             cmds.SelectHierarchy()
             log.info(f"Hierarchy selected for group: {group}")
-            cmds.BakeSimulation()
-            log.info(f"Baked simulation for group: {group}")
             file_name = f"{group.rstrip('_rig')}.fbx"
             log.info(f"Exporting {file_name} to {tempPath}")
             file_path = tempPath / file_name
-            # file -force -options "v=0;" -typ "FBX export" -pr -es "C:/Users/zaid.ali/Documents/maya/projects/default/scenes/1.fbx";
-            cmds.file(
-                file_path.as_posix(),
-                force=True,
-                options="v=0",
-                type="FBX export",
-                preserveReferences=True,
-                exportSelected=True,
-            )
+            nodes = cmds.ls(selection=True, type="transform", long=True)
+            with bakeOnExport(nodes, start, end):
+                exportSelected(file_path)
             log.info(f"Exported {file_name} to {tempPath}")
-            # Delete the temporary duplicated and baked objects
-            log.info(f"Deleting duplicates for group: {group}")
-            pc.delete(dupe)
             pc.select(clear=True)
         log.info("Exporting all groups completed.")
 
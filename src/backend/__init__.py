@@ -4,12 +4,28 @@ from . import (
     FBXexport,
     _backend,
     _geoset,
+    audioslice,
     cacheexport,
+    camerabake,
+    capturepanel,
+    contentstore,
     exportutils,
+    framecache,
+    history,
+    hud,
+    imageencode,
+    manifest,
+    nukecamera,
     playblast,
+    preflight,
     shotactions,
     shotplaylist,
+    stagecache,
     textureexport,
+    thumbnails,
+    transfer,
+    videoencode,
+    viewportstate,
 )
 from . import fillinout as fillinout
 from . import imaya as imaya
@@ -17,8 +33,24 @@ from . import iutil as iutil
 
 reload(_geoset)
 reload(_backend)
+reload(transfer)
+reload(stagecache)
+reload(contentstore)
+reload(manifest)
+reload(history)
+reload(preflight)
+reload(viewportstate)
+reload(capturepanel)
 reload(exportutils)
+reload(hud)
+reload(imageencode)
+reload(audioslice)
+reload(videoencode)
+reload(thumbnails)
 reload(shotactions)
+reload(camerabake)
+reload(framecache)
+reload(nukecamera)
 reload(cacheexport)
 reload(textureexport)
 reload(playblast)
@@ -0,0 +1,99 @@
+"""Cut the sequence audio into per shot WAV segments.
+
+The scene's audio file is opened once per export and every shot only
+reads its own range from it, a chunk at a time. The encoder then muxes
+the segment as it is instead of seeking into the whole sequence audio
+for each shot. The parts of a shot before or after the audio are filled
+with silence.
+"""
+
+import os
+import shutil
+import tempfile
+import typing
+import wave
+from logging import getLogger
+
+log = getLogger("MultiShotExport.AudioSlice")
+
+# audio frames read and written at a time
+CHUNK_FRAMES = 65536
+
+
+class AudioSlicer(object):
+    """Slices of the PCM WAV ``path``, that starts at scene frame ``offset``
+    (the audio node's offset) and plays at ``fps``"""
+
+    def __init__(self, path, offset=0.0, fps=24.0):
+        self.path = str(path)
+        self.offset = float(offset)
+        self.fps = float(fps)
+        # raises wave.Error for anything but uncompressed PCM
+        self._wave = wave.open(self.path, "rb")
+        self.params = self._wave.getparams()
+        self.workDir = tempfile.mkdtemp(prefix="multishot_audio_")
+        self._slices: typing.Dict[typing.Tuple[float, float], str] = {}
+
+    def matches(self, path, offset, fps) -> bool:
+        return (str(path), float(offset), float(fps)) == (
+            self.path,
+            self.offset,
+            self.fps,
+        )
+
+    def sampleAt(self, frame) -> int:
+        """Index of the audio frame playing at scene ``frame``"""
+        seconds = (float(frame) - self.offset) / self.fps
+        return int(round(seconds * self.params.framerate))
+
+    def _silence(self, out: wave.Wave_write, count: int):
+        frameSize = self.params.nchannels * self.params.sampwidth
+        # 8 bit WAV is unsigned
+        byte = b"\x80" if self.params.sampwidth == 1 else b"\x00"
+        while count > 0:
+            size = min(count, CHUNK_FRAMES)
+            out.writeframesraw(byte * (size * frameSize))
+            count -= size
+
+    def slice(self, start, end) -> str:
+        """WAV of scene frames ``start`` to ``end`` included, written once
+        per range"""
+        key = (float(start), float(end))
+        if key in self._slices:
+            return self._slices[key]
+        first = self.sampleAt(start)
+        total = max(0, self.sampleAt(float(end) + 1) - first)
+        lead = min(total, max(0, -first))
+        readFrom = max(0, first)
+        body = max(0, min(first + total, self.params.nframes) - readFrom)
+        output = os.path.join(self.workDir, "%d_%d.wav" % (len(self._slices), first))
+        with wave.open(output, "wb") as out:
+            out.setnchannels(self.params.nchannels)
+            out.setsampwidth(self.params.sampwidth)
+            out.setframerate(self.params.framerate)
+            self._silence(out, lead)
+            if body:
+                self._wave.setpos(readFrom)
+                remaining = body
+                while remaining > 0:
+                    data = self._wave.readframes(min(remaining, CHUNK_FRAMES))
+                    if not data:
+                        break
+                    out.writeframesraw(data)
+                    remaining -= len(data) // (
+                        self.params.nchannels * self.params.sampwidth
+                    )
+                body -= remaining
+            self._silence(out, total - lead - body)
+        self._slices[key] = output
+        return output
+
+    def close(self):
+        self._wave.close()
+        shutil.rmtree(self.workDir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
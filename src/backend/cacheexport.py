@@ -1,3 +1,4 @@
+import contextlib
 import os
 import os.path as osp
 import pathlib
@@ -5,6 +6,7 @@ import re
 import shutil
 import subprocess
 import typing
+from logging import getLogger
 
 import maya.cmds as cmds
 import pymel.core as pc
@@ -17,18 +19,27 @@ from PySide2.QtWidgets import (
 )
 
 from ..shot_form_tab import ShotFormExportTypeTab
-from . import exportutils, fillinout, imaya, shotactions, shotplaylist
+from . import (
+    camerabake,
+    exportutils,
+    fillinout,
+    imageencode,
+    imaya,
+    nukecamera,
+    shotactions,
+    shotplaylist,
+    transfer,
+)
 from .exceptions import *  # noqa: F403
 
 if typing.TYPE_CHECKING:
     from .._submit import Item, ShotForm, SubmitterWidget
 
+log = getLogger("MultiShotExport.CacheExport")
+
 PlayListUtils = shotplaylist.PlaylistUtils
 Action = shotactions.Action
 errorsList = []
-openMotion = osp.join(osp.dirname(__file__), "openMotion.mel").replace("\\", "/")
-mel = '\nsource "%s";\n' % openMotion
-pc.mel.eval(mel)
 
 
 class CacheExportConf(te.TypedDict):
@@ -51,7 +62,13 @@ class CacheExportConf(te.TypedDict):
     texture_export_data: typing.Dict[str, typing.List[str]]
     texture_resX: int
     texture_resY: int
+    texture_format: te.Literal["png", "tif"]
+    texture_png_compression: int
+    texture_tif_compression: int
+    texture_encode_workers: int
     worldSpace: te.Literal[0, 1]
+    direct_write: te.Literal[0, 1]
+    reuse_cache: te.Literal[0, 1]
 
 
 class CacheExport(Action):
@@ -93,7 +110,15 @@ class CacheExport(Action):
             },
             texture_resX=1024,
             texture_resY=1024,
+            texture_format="png",
+            texture_png_compression=6,
+            texture_tif_compression=6,
+            texture_encode_workers=0,
             worldSpace=1,
+            direct_write=0,
+            # publish a cache built by an earlier export again when nothing
+            # it depends on changed, see camerabake.historyFingerprint
+            reuse_cache=0,
         )
 
     def perform(self, **kwargs: typing.Any) -> None:
@@ -105,97 +130,79 @@ class CacheExport(Action):
             conf["cache_dir"] = pathlib.Path(self.path)
             pc.select(item.camera)
             fillinout.fill()
-            if self.exportCache(conf, kwargs.get("local", False)):
-                self.exportAnimatedTextures(conf, kwargs.get("local", False))
-                pc.delete([x.getParent() for x in self.combineMeshes])
+            self.combineMeshes = []
+            try:
+                exported = self.exportCache(conf, kwargs.get("local", False))
+                if exported:
+                    self.exportAnimatedTextures(conf, kwargs.get("local", False))
+            finally:
+                # also when the cache failed, they are not left in the scene
+                if self.combineMeshes:
+                    pc.delete([x.getParent() for x in self.combineMeshes])
                 del self.combineMeshes[:]
+            if exported:
                 self.exportCam(item.camera, kwargs.get("local", False))
 
+    def outputDirs(self):
+        return [osp.join(osp.dirname(self.path), "camera")]
+
     def exportCam(self, orig_cam: pc.nt.Transform, local=False):
-        osp.splitext(cmds.file(query=True, location=True))
         path = osp.join(osp.dirname(self.path), "camera")
-        if not osp.exists(path):
-            os.mkdir(path)
-        itemName = imaya.getNiceName(self.plItem.name) + "_cam" + imaya.getExtension()
-        tempFilePath = osp.join(self.tempPath.name, itemName)
-        pc.select(orig_cam)
-        try:
-            p = typing.cast("pc.nt.Transform", pc.ls(selection=True)[0]).firstParent()
-            if pc.nt.ParentConstraint in [obj.__class__ for obj in p.getChildren()]:
-                flag = True
-            else:
-                flag = False
-        except pc.MayaNodeError:
-            flag = False
-
-        if flag:
-            pc.select(orig_cam)
-            duplicate_cam = pc.duplicate(
-                rr=True, name="mutishot_export_duplicate_camera"
-            )[0]
-            pc.parent(duplicate_cam, w=True)
-            pc.select([orig_cam, duplicate_cam])
-            constraints = set(pc.ls(type=pc.nt.ParentConstraint))
-            pc.mel.eval(
-                'doCreateParentConstraintArgList 1 { "0","0","0","0","0","0","0","1","","1" };'
-            )
-            if constraints:
-                cons = (
-                    set(pc.ls(type=pc.nt.ParentConstraint))
-                    .difference(constraints)
-                    .pop()
+        if local:
+            path = exportutils.getLocalDestination(path)
+        else:
+            # already made by the batch pass, only a set lookup here
+            exportutils.ensureDir(path)
+        baseName = imaya.getNiceName(self.plItem.name) + "_cam"
+        fingerprintName = baseName + ".json"
+        fingerprint = camerabake.cameraFingerprint(
+            orig_cam, self.plItem.inFrame, self.plItem.outFrame
+        )
+        if camerabake.isUpToDate(path, fingerprintName, fingerprint):
+            log.info(f"Camera {orig_cam} unchanged since last export, skipping")
+            return
+        key = "camera-%s" % baseName
+        if fingerprint is not None:
+            key += "-" + fingerprint
+        cache = exportutils.getStagingCache()
+        # without a fingerprint a cached camera may be stale, always rebuilt
+        if fingerprint is None or cache.get(key) is None:
+            with cache.building(key) as build:
+                tempFilePath = osp.join(build, baseName + ".ma")
+                # world space bake sampled straight from the (possibly
+                # constrained) camera, nothing is duplicated, renamed or
+                # reconnected in the scene
+                samples = camerabake.sampleCamera(
+                    orig_cam, self.plItem.inFrame, self.plItem.outFrame
                 )
-            else:
-                cons = pc.ls(type=pc.nt.ParentConstraint)[0]
-            pc.select(cl=True)
-            pc.select(duplicate_cam)
-            pc.mel.eval(
-                'bakeResults -simulation true -t "%s:%s" -sampleBy 1 -disableImplicitControl true -preserveOutsideKeys true -sparseAnimCurveBake false -removeBakedAttributeFromLayer false -removeBakedAnimFromLayer false -bakeOnOverrideLayer false -minimizeRotation true -controlPoints false -shape true {"%s"};'
-                % (
-                    self.plItem.inFrame,
-                    self.plItem.outFrame,
-                    duplicate_cam.name(),
+                camerabake.writeMayaAscii(
+                    samples, tempFilePath, name=imaya.getNiceName(orig_cam.name())
                 )
-            )
-            pc.delete(cons)
-            name = imaya.getNiceName(orig_cam.name())
-            name2 = imaya.getNiceName(orig_cam.firstParent().name())
-            pc.rename(orig_cam, "temp_cam_name_from_multiShotExport")
-            pc.rename(orig_cam.firstParent(), "temp_group_name_from_multiShotExport")
-            pc.rename(duplicate_cam, name)
-            for node in pc.listConnections(orig_cam.getShape()):
-                if isinstance(node, pc.nt.AnimCurve):
-                    try:
-                        attr = node.outputs(plugs=True)[0].name().split(".")[-1]
-                    except IndexError:
-                        continue
-
-                    attribute = ".".join([duplicate_cam.name(), attr])
-                    node.output.connect(attribute, f=True)
-
-            pc.select(duplicate_cam)
-        tempFilePath = pc.exportSelected(
-            tempFilePath,
-            force=True,
-            expressions=True,
-            constructionHistory=False,
-            channels=True,
-            shader=False,
-            constraints=False,
-            options="v=0",
-            typ=imaya.getFileType(),
-            pr=False,
+                # comp gets the same samples, no second pass over the timeline
+                tempFilePath2 = nukecamera.writeNuke(
+                    samples, osp.splitext(tempFilePath)[0] + ".nk"
+                )
+                tempFilePath3 = nukecamera.writeChan(
+                    samples, osp.splitext(tempFilePath)[0] + ".chan"
+                )
+                camerabake.writeFingerprint(
+                    osp.join(build, fingerprintName),
+                    fingerprint,
+                    [tempFilePath, tempFilePath2, tempFilePath3],
+                )
+        else:
+            log.info(f"Camera {orig_cam} was built earlier, publishing it again")
+        jobs = [
+            exportutils.copyFile(phile, path, move=False)
+            for phile in cache.files(key)
+            if phile.name != fingerprintName
+        ]
+        # recorded last and only when everything made it, so a failed copy
+        # never leaves a matching fingerprint next to stale files
+        fingerprintJob = exportutils.copyFile(
+            cache.entryPath(key) / fingerprintName, path, move=False, requires=jobs
         )
-        tempFilePath2 = osp.splitext(tempFilePath)[0] + ".nk"
-        pc.mel.openMotion(tempFilePath2, ".txt")
-        if local:
-            path = exportutils.getLocalDestination(path)
-        exportutils.copyFile(tempFilePath, path)
-        exportutils.copyFile(tempFilePath2, path)
-        if flag:
-            pc.delete(duplicate_cam)
-            pc.rename(orig_cam, name)
-            pc.rename(orig_cam.firstParent(), name2)
+        cache.pinUntil(key, jobs + [fingerprintJob])
 
     @property
     def path(self) -> str:
@@ -225,7 +232,10 @@ class CacheExport(Action):
         if len(self.objects) == 0:
             self.enabled = False
 
-    def MakeMeshes(self, objSets):
+    def MakeMeshes(self, objSets, build=True):
+        """Combine the meshes of every set into one cache mesh. With
+        ``build`` off only the mappings are written, for caches reused from
+        the staging cache"""
         mapping = {}
         self.combineMeshes = []
         names = set()
@@ -249,18 +259,20 @@ class CacheExport(Action):
                     + "\nReason: This set is no longer a valid set"
                 )
                 continue
-            combineMesh = pc.createNode("mesh")
             name = imaya.getNiceName(objectSet) + "_cache"
             if name in names:
                 name += str(count)
                 count += 1
             names.add(name)
-            pc.rename(combineMesh, name)
 
             mapping[osp.normpath(osp.join(self.path, name))] = str(
                 getattr(imaya.getRefFromSet(pc.PyNode(objectSet)), "path", "")
             )
+            if not build:
+                continue
 
+            combineMesh = pc.createNode("mesh")
+            pc.rename(combineMesh, name)
             self.combineMeshes.append(combineMesh)
             polyUnite = pc.createNode("polyUnite")
             for i in range(0, len(meshes)):
@@ -290,59 +302,114 @@ class CacheExport(Action):
             except Exception as ex:
                 errorsList.append(str(ex))
 
-        pc.select(self.combineMeshes)
+        if build:
+            pc.select(self.combineMeshes)
         return
 
+    def buildKey(self) -> str:
+        """Staging cache key of a geometry cache that is not reused"""
+        return "cache-%s" % imaya.getNiceName(self.__item__.name)
+
+    def cacheKey(self, conf) -> typing.Optional[str]:
+        """Staging cache key of the geometry cache, changes with anything
+        upstream of the cached sets, the range or the cache settings. None
+        when the sets can not be fingerprinted"""
+        members = []
+        for _set in self.get("objects"):
+            members.extend(cmds.sets(_set, q=True) or [])
+        settings = sorted(
+            (key, value) for key, value in conf.items() if key != "cache_dir"
+        )
+        fingerprint = camerabake.historyFingerprint(
+            members,
+            conf["start_time"],
+            conf["end_time"],
+            extra=[sorted(self.get("objects")), settings],
+        )
+        if fingerprint is None:
+            return None
+        return "%s-%s" % (self.buildKey(), fingerprint)
+
     def exportCache(self, conf, local=False):
         pc.select(cl=True)
         if self.get("objects"):
-            item = self.__item__
             path = conf.get("cache_dir")
-            tempPath = pathlib.Path(self.tempPath.name) / imaya.getNiceName(
-                item.name,
-            )
-            if not tempPath.exists():
-                tempPath.mkdir(parents=True, exist_ok=True)
-            conf["cache_dir"] = tempPath.as_posix()
-            command = (
-                "doCreateGeometryCache3 {version} "
-                "{{ "
-                '"{time_range_mode}", '  # 1
-                '"{start_time}", '  # 2
-                '"{end_time}", '  # 3
-                '"{cache_file_dist}", '  # 4
-                '"{refresh_during_caching}", '  # 5
-                '"{cache_dir}", '  # 6
-                '"{cache_per_geo}", '  # 7
-                '"{cache_name}", '  # 8
-                '"{cache_name_as_prefix}", '  # 9
-                '"{action_to_perform}", '  # 10
-                '"{force_save}", '  # 11
-                '"{simulation_rate}", '  # 12
-                '"{sample_multiplier}", '  # 13
-                '"{inherit_modf_from_cache}", '  # 14
-                '"{store_doubles_as_float}", '  # 15
-                '"{cache_format}", '  # 16
-                '"{worldSpace}" '  # 17
-                "}};"
-            ).format(**conf)
-            self.MakeMeshes(self.get("objects"))
-            pc.Mel.eval(command)
-
-            try:
-                for phile in tempPath.iterdir():
-                    # if local:
-                    #     path = exportutils.getLocalDestination(phile)
-                    # saves to network drive by default now
-                    exportutils.copyFile(phile, path)
-
-            except Exception as ex:
-                pc.warning(str(ex))
-
+            staging = None
+            if conf.get("direct_write"):
+                # write straight into a hidden folder next to the final
+                # location and publish with a rename, the cache is written once
+                try:
+                    staging = transfer.stagingDir(path)
+                except OSError as ex:
+                    log.warning(f"Could not stage into {path}: {ex}")
+            cache = exportutils.getStagingCache()
+            key = None
+            if staging is not None:
+                build = contextlib.nullcontext(staging)
+            else:
+                if conf.get("reuse_cache"):
+                    key = self.cacheKey(conf)
+                if key is not None and cache.get(key) is not None:
+                    log.info(f"{self.plItem.name} cache unchanged, reusing it")
+                    self.MakeMeshes(self.get("objects"), build=False)
+                    self.publishCached(key, path)
+                    return True
+                key = key or self.buildKey()
+                build = cache.building(key)
+            with build as tempPath:
+                conf["cache_dir"] = tempPath.as_posix()
+                command = (
+                    "doCreateGeometryCache3 {version} "
+                    "{{ "
+                    '"{time_range_mode}", '  # 1
+                    '"{start_time}", '  # 2
+                    '"{end_time}", '  # 3
+                    '"{cache_file_dist}", '  # 4
+                    '"{refresh_during_caching}", '  # 5
+                    '"{cache_dir}", '  # 6
+                    '"{cache_per_geo}", '  # 7
+                    '"{cache_name}", '  # 8
+                    '"{cache_name_as_prefix}", '  # 9
+                    '"{action_to_perform}", '  # 10
+                    '"{force_save}", '  # 11
+                    '"{simulation_rate}", '  # 12
+                    '"{sample_multiplier}", '  # 13
+                    '"{inherit_modf_from_cache}", '  # 14
+                    '"{store_doubles_as_float}", '  # 15
+                    '"{cache_format}", '  # 16
+                    '"{worldSpace}" '  # 17
+                    "}};"
+                ).format(**conf)
+                self.MakeMeshes(self.get("objects"))
+                pc.Mel.eval(command)
+
+            if staging is not None:
+                try:
+                    exportutils.recordPublished(transfer.publishStaged(staging, path))
+                except Exception as ex:
+                    errorsList.append(str(ex))
+                return True
+
+            self.publishCached(key, path)
             return True
         errorsList.append("No objects found enabled in " + self.plItem.name)
         return False
 
+    def publishCached(self, key, path):
+        """Queue copies of a staging cache entry, the entry itself is kept
+        for the next export"""
+        cache = exportutils.getStagingCache()
+        jobs = []
+        try:
+            for phile in cache.files(key):
+                # saves to network drive by default now
+                jobs.append(exportutils.copyFile(phile, path, move=False))
+
+        except Exception as ex:
+            pc.warning(str(ex))
+        finally:
+            cache.pinUntil(key, jobs)
+
     def getAnimatedTextures(self, conf: CacheExportConf):
         """Use the conf to find texture attributes to identify texture
         attributes in the present scene/shot"""
@@ -367,10 +434,13 @@ class CacheExport(Action):
         animatedTextures = self.getAnimatedTextures(conf)
         if not animatedTextures:
             return False
-        tempFilePath = osp.join(self.tempPath.name, "tex")
+        # per shot, earlier shots may still be waiting on their transfers
+        tempFilePath = osp.join(
+            self.tempPath.name, "tex", imaya.getNiceName(self._item.name)
+        )
         if osp.exists(tempFilePath):
             shutil.rmtree(tempFilePath)
-        os.mkdir(tempFilePath)
+        os.makedirs(tempFilePath)
         inframe, outframe = self._item.inFrame, self._item.outFrame
         if not inframe or not outframe:
             inframe, outframe = self._item.autosetInOut()
@@ -378,26 +448,39 @@ class CacheExport(Action):
         end_time = int(outframe)
         rx = conf["texture_resX"]
         ry = conf["texture_resY"]
-        for curtime in range(start_time, end_time + 1):
-            num = "%04d" % curtime
-            pc.currentTime(curtime, e=True)
-            for name, attr in animatedTextures:
-                fileImageName = osp.join(tempFilePath, ".".join([name, num, "png"]))
-                newobj = pc.convertSolidTx(
-                    attr,
-                    samplePlane=True,
-                    rx=rx,
-                    ry=ry,
-                    fil="png",
-                    fileImageName=fileImageName,
-                )
-                pc.delete(newobj)
-                textures_exported = True
+        fmt = conf.get("texture_format", "png")
+        # maya only samples and dumps raw pixels, the pool does the encoding
+        with imageencode.EncoderPool(
+            fmt=fmt,
+            level=conf.get("texture_%s_compression" % fmt, 6),
+            workers=conf.get("texture_encode_workers") or None,
+        ) as pool:
+            for curtime in range(start_time, end_time + 1):
+                num = "%04d" % curtime
+                pc.currentTime(curtime, e=True)
+                for name, attr in animatedTextures:
+                    fileImageName = osp.join(
+                        tempFilePath, ".".join([name, num, fmt])
+                    )
+                    rawImageName = pool.rawPath(fileImageName)
+                    newobj = pc.convertSolidTx(
+                        attr,
+                        samplePlane=True,
+                        rx=rx,
+                        ry=ry,
+                        fil=imageencode.RAW_FORMAT,
+                        fileImageName=rawImageName,
+                    )
+                    pc.delete(newobj)
+                    pool.submit(rawImageName, fileImageName)
+                    textures_exported = True
+
+            errorsList.extend(pool.wait())
 
         target_dir = osp.join(self.path, "tex")
         try:
-            if not osp.exists(target_dir) and not local:
-                os.mkdir(target_dir)
+            if not local:
+                exportutils.ensureDir(target_dir)
         except Exception as ex:
             errorsList.append(str(ex))
 
@@ -0,0 +1,471 @@
+import array
+import contextlib
+import hashlib
+import json
+import math
+import os
+import typing
+from logging import getLogger
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+log = getLogger("MultiShotExport.CameraBake")
+
+LENS_ATTRS = (
+    "focalLength",
+    "horizontalFilmAperture",
+    "verticalFilmAperture",
+    "lensSqueezeRatio",
+    "fStop",
+    "focusDistance",
+    "shutterAngle",
+    "centerOfInterest",
+    "nearClipPlane",
+    "farClipPlane",
+    "horizontalFilmOffset",
+    "verticalFilmOffset",
+    "overscan",
+)
+# lens attributes keyed as distances and angles, the rest are plain numbers
+LINEAR_LENS_ATTRS = (
+    "focusDistance",
+    "centerOfInterest",
+    "nearClipPlane",
+    "farClipPlane",
+)
+ANGULAR_LENS_ATTRS = ("shutterAngle",)
+
+
+class CameraSamples(typing.NamedTuple):
+    """World space camera motion and lens data sampled once per frame"""
+
+    name: str
+    frames: typing.List[float]
+    # (x, y, z) per frame in centimeters
+    translate: typing.List[typing.Tuple[float, float, float]]
+    # (x, y, z) per frame in degrees, in ``rotateOrder``
+    rotate: typing.List[typing.Tuple[float, float, float]]
+    rotateOrder: int
+    # per frame in maya's internal units, centimeters and radians
+    lens: typing.Dict[str, typing.List[float]]
+    filmFit: int
+    timeUnit: str
+
+
+def frameRange(start, end, step=1):
+    frame = float(start)
+    while frame <= end + 1e-6:
+        yield frame
+        frame += step
+
+
+def sampleCamera(camera, start, end, step=1) -> CameraSamples:
+    """Evaluate the world matrix and lens attributes of ``camera`` for every
+    frame in the range in one pass, without touching the current time or
+    creating any nodes"""
+    sel = om.MSelectionList()
+    sel.add(str(camera))
+    dagPath = sel.getDagPath(0)
+    transformFn = om.MFnDependencyNode(dagPath.node())
+    shapePath = om.MDagPath(dagPath)
+    shapePath.extendToShape()
+    shapeFn = om.MFnDependencyNode(shapePath.node())
+
+    worldMatrixPlug = transformFn.findPlug("worldMatrix", False)
+    worldMatrixPlug = worldMatrixPlug.elementByLogicalIndex(dagPath.instanceNumber())
+    lensPlugs = {attr: shapeFn.findPlug(attr, False) for attr in LENS_ATTRS}
+    rotateOrder = transformFn.findPlug("rotateOrder", False).asInt()
+    filmFit = shapeFn.findPlug("filmFit", False).asInt()
+    timeUnit = cmds.currentUnit(q=True, time=True)
+    uiUnit = om.MTime.uiUnit()
+
+    frames = []
+    translate = []
+    rotate = []
+    lens = {attr: [] for attr in LENS_ATTRS}
+    previous = None
+    for frame in frameRange(start, end, step):
+        context = om.MDGContext(om.MTime(frame, uiUnit))
+        original = context.makeCurrent()
+        try:
+            matrix = om.MFnMatrixData(worldMatrixPlug.asMObject()).matrix()
+            for attr, plug in lensPlugs.items():
+                lens[attr].append(plug.asDouble())
+        finally:
+            original.makeCurrent()
+
+        xform = om.MTransformationMatrix(matrix)
+        euler = xform.rotation(asQuaternion=False)
+        euler.reorderIt(rotateOrder)
+        if previous is not None:
+            # same as bakeResults -minimizeRotation, no flips between frames
+            euler.setToClosestSolution(previous)
+        previous = euler
+        t = xform.translation(om.MSpace.kWorld)
+        frames.append(frame)
+        translate.append((t.x, t.y, t.z))
+        rotate.append(tuple(math.degrees(a) for a in (euler.x, euler.y, euler.z)))
+
+    return CameraSamples(
+        name=str(camera).split("|")[-1].split(":")[-1],
+        frames=frames,
+        translate=translate,
+        rotate=rotate,
+        rotateOrder=rotateOrder,
+        lens=lens,
+        filmFit=filmFit,
+        timeUnit=timeUnit,
+    )
+
+
+def _isStatic(values: typing.Sequence[float]):
+    return all(abs(v - values[0]) < 1e-9 for v in values)
+
+
+def _animCurve(f, nodeType, name, frames, values, destination):
+    f.write('createNode %s -n "%s";\n' % (nodeType, name))
+    f.write('\tsetAttr ".wgt" no;\n')
+    f.write('\tsetAttr -s %d ".ktv[0:%d]"' % (len(frames), len(frames) - 1))
+    for frame, value in zip(frames, values):
+        f.write(" %r %r" % (frame, value))
+    f.write(";\n")
+    f.write('connectAttr "%s.o" "%s";\n' % (name, destination))
+
+
+def writeMayaAscii(samples: CameraSamples, path, name=None):
+    """Write the sampled camera straight into a maya ascii file with baked
+    anim curves, so no temporary camera has to be built in the scene"""
+    name = name or samples.name
+    shape = name + "Shape"
+    channels = {
+        "translateX": [t[0] for t in samples.translate],
+        "translateY": [t[1] for t in samples.translate],
+        "translateZ": [t[2] for t in samples.translate],
+        "rotateX": [r[0] for r in samples.rotate],
+        "rotateY": [r[1] for r in samples.rotate],
+        "rotateZ": [r[2] for r in samples.rotate],
+    }
+    with open(path, "w") as f:
+        f.write("//Maya ASCII scene\n")
+        f.write("//Name: %s\n" % name)
+        f.write("currentUnit -l centimeter -a degree -t %s;\n" % samples.timeUnit)
+        f.write('createNode transform -n "%s";\n' % name)
+        f.write('\tsetAttr ".ro" %d;\n' % samples.rotateOrder)
+        f.write('createNode camera -n "%s" -p "%s";\n' % (shape, name))
+        f.write('\tsetAttr -k off ".v";\n')
+        f.write('\tsetAttr ".ff" %d;\n' % samples.filmFit)
+        lens = {
+            attr: (
+                [math.degrees(v) for v in values]
+                if attr in ANGULAR_LENS_ATTRS
+                else values
+            )
+            for attr, values in samples.lens.items()
+        }
+        for attr, values in lens.items():
+            if values and _isStatic(values):
+                f.write('\tsetAttr ".%s" %r;\n' % (attr, values[0]))
+
+        for attr, values in channels.items():
+            _animCurve(
+                f,
+                "animCurveTL" if attr.startswith("translate") else "animCurveTA",
+                "%s_%s" % (name, attr),
+                samples.frames,
+                values,
+                "%s.%s" % (name, attr),
+            )
+        for attr, values in lens.items():
+            if values and not _isStatic(values):
+                if attr in LINEAR_LENS_ATTRS:
+                    nodeType = "animCurveTL"
+                elif attr in ANGULAR_LENS_ATTRS:
+                    nodeType = "animCurveTA"
+                else:
+                    nodeType = "animCurveTU"
+                _animCurve(
+                    f,
+                    nodeType,
+                    "%s_%s" % (shape, attr),
+                    samples.frames,
+                    values,
+                    "%s.%s" % (shape, attr),
+                )
+        f.write("// End of %s\n" % os.path.basename(str(path)))
+
+    return path
+
+
+FINGERPRINT_VERSION = 1
+# what may drive a camera whose fingerprint is taken, the curves connected
+# to it are hashed
+CAMERA_DRIVERS = ("animCurveTL", "animCurveTA", "animCurveTU", "animCurveTT", "time")
+HISTORY_FINGERPRINT_VERSION = 2
+
+
+def _cameraDependencies(camera):
+    """The camera, its shape, every dag parent and everything that drives
+    them through constraints (followed recursively)"""
+    nodes = []
+    pending = [cmds.ls(str(camera), long=True)[0]]
+    pending.extend(cmds.listRelatives(pending[0], shapes=True, fullPath=True) or [])
+    seen = set()
+    while pending:
+        node = pending.pop()
+        if node in seen:
+            continue
+        seen.add(node)
+        nodes.append(node)
+        parents = cmds.listRelatives(node, parent=True, fullPath=True) or []
+        pending.extend(parents)
+        for constraint in set(
+            cmds.listConnections(node, s=True, d=False, type="constraint") or []
+        ):
+            if constraint in seen:
+                continue
+            seen.add(constraint)
+            nodes.append(constraint)
+            targets = cmds.listConnections(
+                constraint + ".target", s=True, d=False, type="transform"
+            )
+            pending.extend(cmds.ls(targets or [], long=True))
+    return nodes
+
+
+def curveData(curve):
+    return [
+        cmds.listConnections(curve + ".output", s=False, d=True, plugs=True),
+        cmds.keyframe(curve, q=True, timeChange=True, valueChange=True),
+        cmds.keyTangent(
+            curve,
+            q=True,
+            inAngle=True,
+            outAngle=True,
+            inWeight=True,
+            outWeight=True,
+        ),
+        cmds.keyTangent(curve, q=True, inTangentType=True, outTangentType=True),
+        cmds.getAttr(curve + ".preInfinity"),
+        cmds.getAttr(curve + ".postInfinity"),
+    ]
+
+
+def cameraFingerprint(camera, start, end) -> typing.Optional[str]:
+    """Hash of everything that affects the exported camera: anim curves,
+    constraints and static transforms of the camera and whatever drives it,
+    its lens attributes and the shot range.
+
+    None when anything else drives the camera (anim layers, expressions,
+    motion paths, driven keys...), its changes would not show in the hash"""
+    dependencies = _cameraDependencies(camera)
+    known = set(dependencies)
+    drivers = [
+        node
+        for node in cmds.ls(cmds.listHistory(dependencies) or [], long=True)
+        if node not in known and cmds.nodeType(node) not in CAMERA_DRIVERS
+    ]
+    if drivers:
+        log.info("Not fingerprinting %s, driven by %s", camera, drivers)
+        return None
+
+    data: typing.List[typing.Any] = [
+        FINGERPRINT_VERSION,
+        float(start),
+        float(end),
+        cmds.currentUnit(q=True, time=True),
+        cmds.currentUnit(q=True, linear=True),
+    ]
+    for node in dependencies:
+        data.append(node)
+        data.append(cmds.nodeType(node))
+        if cmds.objectType(node, isAType="transform"):
+            data.append(cmds.getAttr(node + ".matrix", time=start))
+            data.append(cmds.getAttr(node + ".rotateOrder"))
+        elif cmds.objectType(node, isAType="camera"):
+            data.append(
+                [cmds.getAttr(node + "." + attr, time=start) for attr in LENS_ATTRS]
+            )
+            data.append(cmds.getAttr(node + ".filmFit"))
+        elif cmds.objectType(node, isAType="constraint"):
+            for attr in cmds.listAttr(node, keyable=True, scalar=True) or []:
+                data.append((attr, cmds.getAttr(node + "." + attr, time=start)))
+            for index in cmds.getAttr(node + ".target", multiIndices=True) or []:
+                for attr in ("targetOffsetTranslate", "targetOffsetRotate"):
+                    plug = "%s.target[%d].%s" % (node, index, attr)
+                    if cmds.objExists(plug):
+                        data.append((plug, cmds.getAttr(plug)))
+        for curve in sorted(
+            set(cmds.listConnections(node, s=True, d=False, type="animCurve") or [])
+        ):
+            data.append(curveData(curve))
+
+    return hashlib.sha1(json.dumps(data, default=str).encode("utf-8")).hexdigest()
+
+
+def _dagAncestors(node) -> typing.List[str]:
+    ancestors = []
+    parents = cmds.listRelatives(node, parent=True, fullPath=True)
+    while parents:
+        ancestors.append(parents[0])
+        parents = cmds.listRelatives(parents[0], parent=True, fullPath=True)
+    return ancestors
+
+
+def _staticValues(node) -> typing.List[typing.Any]:
+    """Every scalar attribute of ``node`` that nothing drives, keyable or
+    not: deformer and blendShape weights, envelopes, constraint offsets...
+    Per component values (``weightList[i].weights[j]``) are left to the
+    evaluated meshes, reading them one by one would take longer than the
+    cache"""
+    values = []
+    for attr in cmds.listAttr(node, scalar=True, multi=True, settable=True) or []:
+        if attr.count("[") > 1:
+            continue
+        with contextlib.suppress(ValueError, RuntimeError):
+            values.append((attr, cmds.getAttr(node + "." + attr)))
+    return values
+
+
+def _digest(values: typing.Iterable[float], typecode="d") -> str:
+    return hashlib.sha1(array.array(typecode, values).tobytes()).hexdigest()
+
+
+def _evaluate(plugs: typing.Sequence[om.MPlug], frames) -> typing.List[str]:
+    """Digest of every plug (meshes and matrices) at each of ``frames``"""
+    uiUnit = om.MTime.uiUnit()
+    digests = []
+    for frame in frames:
+        context = om.MDGContext(om.MTime(frame, uiUnit))
+        original = context.makeCurrent()
+        try:
+            for plug in plugs:
+                data = plug.asMObject()
+                if data.hasFn(om.MFn.kMesh):
+                    mesh = om.MFnMesh(data)
+                    counts, vertices = mesh.getVertices()
+                    digests.append(
+                        _digest(c for p in mesh.getPoints() for c in (p.x, p.y, p.z))
+                    )
+                    digests.append(_digest(list(counts) + list(vertices), "i"))
+                else:
+                    matrix = om.MFnMatrixData(data).matrix()
+                    digests.append(
+                        _digest(
+                            matrix.getElement(row, column)
+                            for row in range(4)
+                            for column in range(4)
+                        )
+                    )
+        finally:
+            original.makeCurrent()
+    return digests
+
+
+def _plug(node, attr) -> om.MPlug:
+    sel = om.MSelectionList()
+    sel.add(node)
+    plug = om.MFnDependencyNode(sel.getDependNode(0)).findPlug(attr, False)
+    return plug.elementByLogicalIndex(0) if plug.isArray else plug
+
+
+def historyFingerprint(nodes, start, end, extra=()) -> typing.Optional[str]:
+    """Hash of everything a geometry cache of ``nodes`` depends on, to tell
+    that one built earlier can be reused as is: the anim curves and the
+    undriven attribute values of their whole history (dag ancestors
+    included), the world matrix of every transform on every frame, the
+    evaluated meshes on the first and last frame and the files of the
+    references involved.
+
+    None when the history has nodes driven by time other than anim curves,
+    expressions or simulations, which can not be fingerprinted"""
+    roots = set(cmds.ls(list(nodes), long=True))
+    for node in list(roots):
+        roots.update(_dagAncestors(node))
+        roots.update(cmds.listRelatives(node, shapes=True, fullPath=True) or [])
+    history = set(cmds.ls(cmds.listHistory(list(roots)) or [], long=True))
+    history.update(roots)
+    for node in list(history):
+        if cmds.objectType(node, isAType="dagNode"):
+            history.update(_dagAncestors(node))
+    timeDriven = [
+        node
+        for node in cmds.ls(
+            cmds.listConnections("time1", s=False, d=True) or [], long=True
+        )
+        if node in history and not cmds.objectType(node, isAType="animCurve")
+    ]
+    if timeDriven:
+        log.info("Not fingerprinting %s, driven by time: %s", nodes, timeDriven)
+        return None
+
+    data: typing.List[typing.Any] = [
+        HISTORY_FINGERPRINT_VERSION,
+        float(start),
+        float(end),
+        cmds.currentUnit(q=True, time=True),
+        cmds.currentUnit(q=True, linear=True),
+        list(extra),
+    ]
+    files = set()
+    transforms = []
+    meshes = []
+    for node in sorted(history):
+        data.append(node)
+        data.append(cmds.nodeType(node))
+        if cmds.objectType(node, isAType="animCurve"):
+            data.append(curveData(node))
+            continue
+        if cmds.objectType(node, isAType="mesh"):
+            # the points and tweaks are covered by the evaluated mesh
+            meshes.append(_plug(node, "outMesh"))
+        else:
+            data.append(_staticValues(node))
+            if cmds.objectType(node, isAType="transform"):
+                transforms.append(_plug(node, "worldMatrix"))
+        if cmds.objectType(node, isAType="expression"):
+            data.append(cmds.expression(node, q=True, string=True))
+        if cmds.referenceQuery(node, isNodeReferenced=True):
+            files.add(cmds.referenceQuery(node, filename=True, withoutCopyNumber=True))
+    data.append(_evaluate(transforms, frameRange(start, end)))
+    data.append(_evaluate(meshes, sorted({float(start), float(end)})))
+    for phile in sorted(files):
+        with contextlib.suppress(OSError):
+            data.append((phile, os.path.getmtime(phile), os.path.getsize(phile)))
+
+    return hashlib.sha1(json.dumps(data, default=str).encode("utf-8")).hexdigest()
+
+
+def readFingerprint(path) -> typing.Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def writeFingerprint(path, fingerprint, files):
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "fingerprint": fingerprint,
+                "files": [os.path.basename(str(phile)) for phile in files],
+            },
+            f,
+            indent=4,
+        )
+    return path
+
+
+def isUpToDate(directory, fingerprintName, fingerprint) -> bool:
+    """True when the fingerprint recorded in ``directory`` matches and every
+    file exported along with it is still there"""
+    if fingerprint is None:
+        return False
+    recorded = readFingerprint(os.path.join(str(directory), fingerprintName))
+    if not recorded or recorded.get("fingerprint") != fingerprint:
+        return False
+    return all(
+        os.path.isfile(os.path.join(str(directory), phile))
+        for phile in recorded.get("files", [])
+    )
@@ -0,0 +1,99 @@
+"""Dedicated offscreen model panel the playblasts capture from.
+
+The panel lives in a hidden window created the first time a playblast
+needs it and is only configured again when its settings change. It draws
+polygon meshes only, so rig controls, face UI curves, the grid and the
+manipulators never reach the capture and nothing in the scene has to be
+selected and hidden for it. Display layers still decide which meshes
+show.
+"""
+
+import contextlib
+import typing
+from logging import getLogger
+
+import maya.cmds as cmds
+
+log = getLogger("MultiShotExport.CapturePanel")
+
+PANEL = "multiShotExportCapturePanel"
+WINDOW = "multiShotExportCaptureWindow"
+# the last settings applied to the panel
+__configured__: typing.Optional[dict] = None
+
+
+def defaultConf() -> typing.Dict[str, typing.Any]:
+    return {
+        "textures": True,
+        # "default", "all", "active", "flat" or "none"
+        "lights": "default",
+        "shadows": False,
+        # 0 turns anti aliasing off
+        "aa_samples": 8,
+    }
+
+
+def editorFlags(conf) -> typing.Dict[str, typing.Any]:
+    """modelEditor flags of the panel: polygons only, fixed look"""
+    return {
+        "allObjects": False,
+        "polymeshes": True,
+        "grid": False,
+        "manipulators": False,
+        "selectionHiliteDisplay": False,
+        "headsUpDisplay": True,
+        "displayAppearance": "smoothShaded",
+        "wireframeOnShaded": False,
+        "useDefaultMaterial": False,
+        "displayTextures": bool(conf["textures"]),
+        "displayLights": conf["lights"],
+        "shadows": bool(conf["shadows"]),
+    }
+
+
+def exists() -> bool:
+    return bool(cmds.modelPanel(PANEL, exists=True))
+
+
+def _create():
+    if cmds.window(WINDOW, exists=True):
+        cmds.deleteUI(WINDOW)
+    window = cmds.window(WINDOW, title="MultiShot Capture", widthHeight=(320, 180))
+    cmds.paneLayout()
+    cmds.modelPanel(PANEL, menuBarVisible=False, label="MultiShot Capture")
+    cmds.showWindow(window)
+    # the playblasts render offscreen, the window only has to exist
+    cmds.window(window, e=True, iconify=True)
+    with contextlib.suppress(RuntimeError):
+        cmds.modelEditor(PANEL, e=True, rendererName="vp2Renderer")
+
+
+def get(conf=None, viewport=None) -> str:
+    """The capture panel, created and configured once for ``conf``. The
+    render settings go through ``viewport``, a
+    :class:`viewportstate.ViewportState`, which restores them"""
+    global __configured__
+    conf = dict(defaultConf(), **(conf or {}))
+    if not exists():
+        _create()
+        __configured__ = None
+    if conf != __configured__:
+        cmds.modelEditor(PANEL, e=True, **editorFlags(conf))
+        __configured__ = conf
+    if viewport is not None:
+        samples = int(conf["aa_samples"])
+        viewport.setAttr("hardwareRenderingGlobals.multiSampleEnable", samples > 0)
+        if samples > 0:
+            viewport.setAttr("hardwareRenderingGlobals.multiSampleCount", samples)
+    return PANEL
+
+
+def lookThru(camera):
+    cmds.modelPanel(PANEL, e=True, camera=str(camera))
+
+
+def close():
+    global __configured__
+    __configured__ = None
+    if cmds.window(WINDOW, exists=True):
+        cmds.deleteUI(WINDOW)
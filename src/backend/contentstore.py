@@ -0,0 +1,175 @@
+"""Content-addressed store on the share, so identical outputs are stored
+and transferred once per sequence.
+
+Published files are uploaded once to ``<sequence>/.multishot_store`` under
+their sha512. The shot folder then gets a hardlink to the stored object,
+or in ``"ref"`` mode a small json file next to where the file would have
+been, pointing into the store. A file that is already in the store is not
+uploaded again.
+
+Linked files share their data with the stored object, re-publishing
+replaces the link but editing one in place would change every shot using
+it. Shares without hardlinks (SMB/CIFS mounts usually) are detected once,
+files published there in ``"link"`` mode are plain copies that skip the
+store.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import typing
+import uuid
+from logging import getLogger
+from pathlib import Path
+
+from . import transfer
+
+log = getLogger("MultiShotExport.ContentStore")
+
+STORE_DIR = ".multishot_store"
+REF_SUFFIX = ".msref"
+LINK = "link"
+REF = "ref"
+
+
+def storeRoot(target) -> typing.Optional[Path]:
+    """The store for the sequence ``target`` belongs to, next to its
+    ``SHOTS`` folder. None for paths outside a sequence"""
+    parts = Path(target).parts
+    if "SHOTS" not in parts:
+        return None
+    return Path(*parts[: parts.index("SHOTS")]) / STORE_DIR
+
+
+def objectPath(root: Path, digest: str) -> Path:
+    return root / "objects" / digest[:2] / digest
+
+
+def readRef(path) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def resolve(path) -> Path:
+    """The file to read for ``path``, following a ref when there is one"""
+    path = Path(path)
+    if not path.exists():
+        ref = readRef(path.with_name(path.name + REF_SUFFIX))
+        if ref:
+            return path.parent / ref["object"]
+    return path
+
+
+class ContentStore(object):
+    """Publishes through the store, used as the copier of a
+    :class:`transfer.TransferQueue`. Files under ``minSize`` are plain
+    copies, the hashing and the extra lookups are not worth it"""
+
+    def __init__(self, mode=LINK, minSize=64 * 1024):
+        if mode not in (LINK, REF):
+            raise ValueError("Unknown content store mode: %s" % mode)
+        self.mode = mode
+        self.minSize = minSize
+        # store root -> whether it supports hardlinks
+        self._linkable: typing.Dict[Path, bool] = {}
+        # digest -> lock held while uploading it
+        self._uploads: typing.Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def canLink(self, root: Path) -> bool:
+        """Whether hardlinks work in ``root``, tried once per store"""
+        with self._lock:
+            if root in self._linkable:
+                return self._linkable[root]
+        probe = root / ("link_probe_%s" % uuid.uuid4().hex)
+        linked = probe.with_name(probe.name + ".link")
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+            probe.write_bytes(b"")
+            os.link(str(probe), str(linked))
+            linkable = True
+        except OSError as ex:
+            log.warning(
+                "No hardlinks in %s (%s), publishing plain copies there", root, ex
+            )
+            linkable = False
+        finally:
+            for path in (linked, probe):
+                with contextlib.suppress(OSError):
+                    path.unlink()
+        with self._lock:
+            self._linkable[root] = linkable
+        return linkable
+
+    def upload(self, src: Path, obj: Path, copier):
+        """Copy ``src`` into the store as ``obj``. The temporary name only
+        depends on the digest, so a big upload cut short is resumed by the
+        next attempt from its ``.part``"""
+        with self._lock:
+            lock = self._uploads.setdefault(obj.name, threading.Lock())
+        with lock:
+            if obj.is_file() and obj.stat().st_size == src.stat().st_size:
+                # an other shot uploaded it while this one was waiting
+                return
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            temp = obj.with_name(obj.name + ".tmp")
+            copier(src, temp)
+            try:
+                os.replace(str(temp), str(obj))
+            except OSError:
+                # an other export uploaded the same object in the meantime
+                if not obj.is_file():
+                    raise
+                with contextlib.suppress(OSError):
+                    temp.unlink()
+
+    def publish(self, src: Path, target: Path, copier=transfer.smartCopy):
+        """Publish ``src`` to ``target`` through the store and return its
+        sha512, ``copier`` does the actual uploads"""
+        root = storeRoot(target)
+        if (
+            root is None
+            or src.stat().st_size < self.minSize
+            or (self.mode == LINK and not self.canLink(root))
+        ):
+            return copier(src, target)
+        digest = transfer.hashFile(src)
+        obj = objectPath(root, digest)
+        if obj.is_file() and obj.stat().st_size == src.stat().st_size:
+            log.debug("%s is already stored as %s", src, digest)
+        else:
+            self.upload(src, obj, copier)
+
+        ref = target.with_name(target.name + REF_SUFFIX)
+        if self.mode == LINK:
+            with contextlib.suppress(OSError):
+                ref.unlink()
+            if target.is_file():
+                target.unlink()
+            try:
+                os.link(str(obj), str(target))
+            except OSError as ex:
+                # the store links fine but not this folder, a mount inside
+                # the sequence, rare enough to pay for the second upload
+                log.warning("Could not link %s, copying it: %s", target, ex)
+                copier(src, target)
+            return digest
+
+        if target.is_file():
+            target.unlink()
+        with open(ref, "w") as f:
+            json.dump(
+                {
+                    "hash": digest,
+                    "size": src.stat().st_size,
+                    "name": target.name,
+                    "object": os.path.relpath(str(obj), str(target.parent)),
+                },
+                f,
+                indent=4,
+            )
+        return digest
@@ -1,7 +1,8 @@
-import contextlib
+import concurrent.futures
+import json
 import os
-import shutil
 import tempfile
+import time
 import typing
 from logging import getLogger
 from pathlib import Path
@@ -10,7 +11,15 @@ import maya.cmds as cmds
 import pymel.core as pc
 import pymel.core.general
 
-from . import fillinout, imaya, iutil
+from . import (
+    contentstore,
+    fillinout,
+    imaya,
+    iutil,
+    manifest,
+    stagecache,
+    transfer,
+)
 
 log = getLogger("MultiShotExport.ExportUtils")
 
@@ -21,18 +30,6 @@ localPath = Path(tempfile.TemporaryDirectory().name)
 __original_camera__ = None
 __original_frame__ = None
 __selection__ = None
-__resolutionGate__ = True
-__safeAction__ = True
-__safeTitle__ = True
-__resolutionGateMask__ = True
-__hud_frame_1__ = "__hud_frame_1__"
-__hud_frame_2__ = "__hud_frame_2__"
-__labelColor__ = None
-__valueColor__ = None
-__current_frame__ = None
-__camera_name__ = None
-__focal_length__ = None
-__DEFAULT_RESOLUTION__ = None
 __fps_mapping__ = {
     "game": "15 fps",
     "film": "Film (24 fps)",
@@ -47,10 +44,22 @@ __fps_mapping__ = {
     "hour": "hours",
 }
 __stretchMeshEnvelope__ = {}
-__2d_pane_zoom__ = {}
+# how much wider than the resolution gate the standard playblast frames
+GATE_OVERSCAN = 1.4
+HD_RESOLUTION = (1920, 1080)
 home = Path("~").expanduser() / "temp_shots_export"
 if not home.exists():
     home.mkdir(parents=True, exist_ok=True)
+transferJournal = Path("~").expanduser() / "temp_shots_export_transfers.jsonl"
+transfers: typing.Optional[transfer.TransferQueue] = None
+manifestDir = Path("~").expanduser() / "temp_shots_export_manifests"
+lastManifest: typing.Optional[Path] = None
+stagingCacheRoot = Path("~").expanduser() / "temp_shots_export_cache"
+stagingCache: typing.Optional[stagecache.StagingCache] = None
+# directories known to exist on the share, so repeat checks skip the stat
+__known_dirs__: typing.Set[str] = set()
+# directories asked for by the path builders, created by createPlannedDirs
+__planned_dirs__: typing.Set[str] = set()
 
 
 def camHasKeys(camera):
@@ -70,22 +79,98 @@ def getEnvFilePath():
     return envs
 
 
+def _dirKey(path):
+    return osp.normcase(osp.normpath(str(path)))
+
+
+def _markKnown(key):
+    while key not in __known_dirs__:
+        __known_dirs__.add(key)
+        parent = osp.dirname(key)
+        if parent == key:
+            break
+        key = parent
+
+
+def ensureDir(path):
+    """Create ``path`` and its missing parents, directories already seen in
+    this session are not checked again"""
+    key = _dirKey(path)
+    if key not in __known_dirs__:
+        os.makedirs(str(path), exist_ok=True)
+        _markKnown(key)
+    return str(path)
+
+
+def isKnownDir(path) -> bool:
+    return _dirKey(path) in __known_dirs__
+
+
+def planDir(path):
+    """Queue ``path`` for the next :func:`createPlannedDirs` instead of
+    creating it right away"""
+    if _dirKey(path) not in __known_dirs__:
+        __planned_dirs__.add(str(path))
+    return str(path)
+
+
+def ensureDirs(paths, workers=16) -> typing.List[str]:
+    """Create every missing directory in ``paths`` in one parallel pass and
+    return the errors. Only the deepest ones are created, makedirs takes
+    care of their parents"""
+    wanted = {}
+    for path in paths:
+        key = _dirKey(path)
+        if key not in __known_dirs__:
+            wanted[key] = str(path)
+    parents = set()
+    for key in wanted:
+        parent = osp.dirname(key)
+        while parent not in parents and parent != osp.dirname(parent):
+            parents.add(parent)
+            parent = osp.dirname(parent)
+    leaves = [path for key, path in wanted.items() if key not in parents]
+    errors = []
+    if not leaves:
+        return errors
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(workers, len(leaves)),
+        thread_name_prefix="MultiShotMkdir",
+    ) as executor:
+        futures = {executor.submit(ensureDir, path): path for path in leaves}
+        for future in concurrent.futures.as_completed(futures):
+            ex = future.exception()
+            if ex is not None:
+                errors.append(
+                    "Could not create %s\nReason: %s" % (futures[future], ex)
+                )
+    return errors
+
+
+def createPlannedDirs() -> typing.List[str]:
+    paths = list(__planned_dirs__)
+    __planned_dirs__.clear()
+    return ensureDirs(paths)
+
+
+def forgetDirs():
+    """Drop the known directories, the next checks go to the disk again"""
+    __known_dirs__.clear()
+
+
 def getSaveFilePath(items):
     try:
         items = [item for item in items if item.selected]
         path = [
             action for action in items[0].actions.getActions() if action.enabled
         ][0].path.split("SHOTS")[0]
-        animPath = osp.join(path, "ANIMATION")
-        if not osp.exists(animPath):
-            os.mkdir(animPath)
-        path = osp.join(animPath, "MULTISHOTEXPORT")
-        if not osp.exists(path):
-            os.mkdir(path)
-        path = osp.join(path, "__".join([item.name for item in items]))
-        if not osp.exists(path):
-            os.mkdir(path)
-        return path
+        path = osp.join(
+            path,
+            "ANIMATION",
+            "MULTISHOTEXPORT",
+            "__".join([item.name for item in items]),
+        )
+        return ensureDir(path)
     except Exception as ex:
         errorsList.append("Could not save maya file\nReason: " + str(ex))
 
@@ -98,28 +183,6 @@ def saveMayaFile(items):
             copyFile(filename, path, move=False)
 
 
-def turn2dPanZoomOff(camera):
-    global __2d_pane_zoom__
-    enabled = camera.panZoomEnabled.get()
-    if enabled:
-        __2d_pane_zoom__["enabled"] = enabled
-        __2d_pane_zoom__["horizontalPan"] = camera.horizontalPan.get()
-        camera.horizontalPan.set(0)
-        __2d_pane_zoom__["verticalPan"] = camera.verticalPan.get()
-        camera.verticalPan.set(0)
-        __2d_pane_zoom__["zoom"] = camera.zoom.get()
-        camera.zoom.set(1)
-        camera.panZoomEnabled.set(0)
-
-
-def restore2dPanZoom(camera):
-    if __2d_pane_zoom__:
-        camera.panZoomEnabled.set(__2d_pane_zoom__["enabled"])
-        camera.horizontalPan.set(__2d_pane_zoom__["horizontalPan"])
-        camera.verticalPan.set(__2d_pane_zoom__["verticalPan"])
-        camera.zoom.set(__2d_pane_zoom__["zoom"])
-
-
 def showInViewMessage(msg):
     pc.inViewMessage(msg="<hl>%s<hl>" % msg, fade=True, position="midCenter")
 
@@ -172,62 +235,154 @@ def getLocalDestination(des: typing.Union[str, Path], depth=3):
     return tempPath
 
 
-def copyFile(src, des, depth=3, move=True):
-    src = Path(src)
-    des = Path(des)
-    try:
-        existingFile = des / src.name
-        if osp.exists(existingFile) and osp.isfile(existingFile):
-            os.remove(existingFile)
-        shutil.copy(str(src), str(des))
-    except Exception as ex:
+def getTransferConf():
+    """Transfer settings, overridable per studio with a ``TransferConf`` json
+    file next to this module. ``policies`` is keyed by destination root
+    (``\\\\server\\share`` or ``X:``) with a ``default`` fallback, e.g.::
+
+        {"policies": {"P:": {"max_concurrent": 2, "bandwidth": 50000000}}}
+    """
+    conf = {
+        "workers": 8,
+        "retries": 3,
+        # sha512 of every published file goes into the run manifest
+        "hash_sources": True,
+        # hardlink copies that land on the same volume as their source, the
+        # staging cache entries are never modified in place so they can be
+        # published this way (moves are always renamed)
+        "link": False,
+        # read every published file back to compare hashes after the export
+        "verify_hash": False,
+        # size budget of the local cache of built outputs, in GB
+        "staging_cache_gb": 20,
+        # publish big files once per sequence through a content-addressed
+        # store on the share, "mode" is "link" or "ref"
+        "content_store": {"enabled": False, "mode": "link", "min_size": 65536},
+        "policies": {
+            "default": {"max_concurrent": 4, "bandwidth": None},
+        },
+    }
+    confPath = osp.join(osp.dirname(__file__), "TransferConf")
+    if osp.exists(confPath):
         try:
-            basename = iutil.basename(des, depth)
-            tempPath = home / basename
-            if not tempPath.exists():
-                tempPath.mkdir(parents=True, exist_ok=True)
-            tempPath2 = tempPath / src.name
-            if tempPath2.exists():
-                tempPath2.unlink()
-            shutil.copy(src, tempPath)
-        except Exception as ex2:
-            pc.warning(ex2)
-
-        errorsList.append(str(ex))
-    finally:
-        if move:
-            os.remove(src)
-
-
-def hideFaceUi():
-    sel = pc.ls(selection=True)
-    pc.select(pc.ls(regex="(?i).*:?UI_grp"))
-    pc.Mel.eval("HideSelectedObjects")
-    pc.select(sel)
+            with open(confPath) as f:
+                conf.update(json.load(f))
+        except (IOError, ValueError) as ex:
+            log.warning(f"Could not read {confPath}: {ex}")
+    return conf
+
+
+def startTransfers():
+    """Route every :func:`copyFile` through a background transfer queue until
+    :func:`finishTransfers` is called. Transfers an earlier session did not
+    finish are queued again"""
+    global transfers
+    if transfers is None:
+        conf = getTransferConf()
+        transfers = transfer.TransferQueue(
+            transferJournal,
+            home,
+            workers=conf["workers"],
+            retries=conf["retries"],
+            policies=conf["policies"],
+            hashSources=conf["hash_sources"],
+            link=conf["link"],
+            store=getContentStore(conf),
+        )
+        transfers.resume()
+    return transfers
+
+
+def finishTransfers():
+    """Barrier: wait for all queued copies, record them in a manifest and
+    report whatever did not make it into :data:`errorsList`"""
+    global transfers
+    if transfers is None:
+        return []
+    queue, transfers = transfers, None
+    jobs = queue.wait()
+    queue.close()
+    errorsList.extend(verifyTransfers(jobs))
+    # nothing is being built into the cache anymore
+    cache = getStagingCache()
+    cache.clearBuilds()
+    cache.evict()
+    return jobs
+
+
+def getContentStore(conf) -> typing.Optional[contentstore.ContentStore]:
+    storeConf = conf.get("content_store") or {}
+    if not storeConf.get("enabled"):
+        return None
+    return contentstore.ContentStore(
+        mode=storeConf.get("mode", contentstore.LINK),
+        minSize=storeConf.get("min_size", 65536),
+    )
 
 
-def showFaceUi():
-    sel = pc.ls(selection=True)
-    pc.select(pc.ls(regex="(?i).*:?UI_grp"))
-    pc.showHidden(b=True)
-    pc.select(sel)
+def getStagingCache() -> stagecache.StagingCache:
+    """The local cache exporters build into, see :mod:`stagecache`"""
+    global stagingCache
+    if stagingCache is None:
+        budget = getTransferConf()["staging_cache_gb"] * 1024**3
+        stagingCache = stagecache.StagingCache(stagingCacheRoot, int(budget))
+    return stagingCache
 
 
-def setDefaultResolution(res, default=False):
-    global __DEFAULT_RESOLUTION__
-    __DEFAULT_RESOLUTION__ = getDefaultResolution()
-    if default:
+def verifyTransfers(jobs) -> typing.List[str]:
+    """Write the run manifest for ``jobs`` to :data:`manifestDir` and check
+    every destination against it in parallel"""
+    global lastManifest
+    data = manifest.fromJobs(jobs, scene=cmds.file(q=True, location=True))
+    try:
+        lastManifest = manifest.write(
+            manifestDir / time.strftime("manifest_%Y%m%d_%H%M%S.json"), data
+        )
+    except (IOError, OSError) as ex:
+        log.warning(f"Could not write the transfer manifest: {ex}")
+    return manifest.verify(data, deep=getTransferConf()["verify_hash"])
+
+
+def copyFile(src, des, depth=3, move=True, requires=(), append=False, exclusive=False):
+    """Copy ``src`` into ``des``, falling back to :data:`home` on failure.
+    While a transfer session is running the copy is only queued and the
+    returned :class:`transfer.TransferJob` completes later. With ``append``
+    ``src`` is added at the end of the destination file, with ``exclusive``
+    it is only written if the destination file does not exist yet"""
+    if transfers is not None:
+        return transfers.submit(
+            src,
+            des,
+            depth=depth,
+            move=move,
+            requires=requires,
+            append=append,
+            exclusive=exclusive,
+        )
+    job = transfer.TransferJob(
+        src, des, depth, move, append=append, exclusive=exclusive
+    )
+    if any(not r.ok for r in requires if r is not None):
+        job.skip()
+        return job
+    transfer.runJob(job, home)
+    if job.error:
+        errorsList.append(job.error)
+        if job.status == transfer.FAILED:
+            pc.warning(job.error)
+    return job
+
+
+def recordPublished(jobs: typing.Iterable[transfer.TransferJob]):
+    """Add ``jobs`` published without :func:`copyFile` to the run manifest,
+    their errors are reported along with the transfers'"""
+    jobs = list(jobs)
+    if transfers is not None:
+        transfers.track(jobs)
         return
-    node = pc.ls("defaultResolution")[0]
-    node.width.set(res[0])
-    node.height.set(res[1])
-
-
-def restoreDefaultResolution():
-    res = __DEFAULT_RESOLUTION__
-    node = pc.ls("defaultResolution")[0]
-    node.width.set(res[0])
-    node.height.set(res[1])
+    for job in jobs:
+        if job.error:
+            errorsList.append(job.error)
 
 
 def getDefaultResolution():
@@ -235,34 +390,6 @@ def getDefaultResolution():
     return (node.width.get(), node.height.get())
 
 
-def saveHUDColor():
-    global __valueColor__
-    global __labelColor__
-    __labelColor__ = pymel.core.general.displayColor(
-        "headsUpDisplayLabels", dormant=True, q=True
-    )
-    __valueColor__ = pymel.core.general.displayColor(
-        "headsUpDisplayValues", dormant=True, q=True
-    )
-
-
-def restoreHUDColor():
-    if __labelColor__ and __valueColor__:
-        setHUDColor(__labelColor__, __valueColor__)
-
-
-def setHUDColor(color1, color2):
-    with contextlib.suppress(Exception):
-        pymel.core.general.displayColor(
-            "headsUpDisplayLabels", color1, dormant=True
-        )
-
-    with contextlib.suppress(Exception):
-        pymel.core.general.displayColor(
-            "headsUpDisplayValues", color2, dormant=True
-        )
-
-
 def getFrameRate():
     global __fps_mapping__
     unit = pymel.core.general.currentUnit(q=True, time=True)
@@ -272,134 +399,6 @@ def getFrameRate():
     return unit
 
 
-def showFrameInfo(pl_item):
-    global __camera_name__
-    fps = getFrameRate()
-    inOut = str(pl_item.inFrame) + " - " + str(pl_item.outFrame)
-
-    def getFps():
-        return fps
-
-    def getInOut():
-        return inOut
-
-    removeFrameInfo()
-    pc.headsUpDisplay(
-        __hud_frame_1__,
-        lfs="large",
-        label="FPS:",
-        section=6,
-        block=pc.headsUpDisplay(nfb=6),
-        blockSize="medium",
-        dfs="large",
-        command=getFps,
-    )
-    pc.headsUpDisplay(
-        __hud_frame_2__,
-        lfs="large",
-        label="IN OUT:",
-        section=6,
-        block=pc.headsUpDisplay(nfb=6),
-        blockSize="medium",
-        dfs="large",
-        command=getInOut,
-    )
-    __camera_name__ = pc.optionVar(q="cameraNamesVisibility")
-    # __current_frame__ = pc.optionVar(q="currentFrameVisibility")
-    # __focal_length__ = pc.optionVar(q="focalLengthVisibility")
-    pc.mel.eval("setCurrentFrameVisibility(1)")
-    pc.headsUpDisplay(
-        "HUDCurrentFrame", e=True, lfs="large", dfs="large", bs="medium"
-    )
-    pc.Mel.eval("setFocalLengthVisibility(1)")
-    pc.headsUpDisplay(
-        "HUDFocalLength", e=True, lfs="large", dfs="large", bs="medium"
-    )
-    pc.Mel.eval("setCameraNamesVisibility(1)")
-    pc.headsUpDisplay(
-        "HUDCameraNames", e=True, lfs="large", dfs="large", bs="medium"
-    )
-
-
-def removeFrameInfo(all=False):
-    if pc.headsUpDisplay(__hud_frame_1__, exists=True):
-        pc.headsUpDisplay(__hud_frame_1__, rem=True)
-    if pc.headsUpDisplay(__hud_frame_2__, exists=True):
-        pc.headsUpDisplay(__hud_frame_2__, rem=True)
-    if all:
-        pc.Mel.eval("setCurrentFrameVisibility(0)")
-        pc.Mel.eval("setFocalLengthVisibility(0)")
-        pc.Mel.eval("setCameraNamesVisibility(0)")
-
-
-def restoreFrameInfo():
-    if __camera_name__:
-        pc.Mel.eval("setCameraNamesVisibility(1)")
-    if __current_frame__:
-        pc.Mel.eval("setCurrentFrameVisibility(1)")
-    if __focal_length__:
-        pc.Mel.eval("setFocalLengthVisibility(1)")
-
-
-def turnResolutionGateOn(camera):
-    global __resolutionGateMask__
-    global __safeTitle__
-    global __resolutionGate__
-    global __safeAction__
-    oscan = 1.4
-    if not pc.camera(camera, q=True, displayResolution=True):
-        __resolutionGate__ = False
-        pc.camera(camera, e=True, displayResolution=True, overscan=oscan)
-    if pc.camera(camera, q=True, displaySafeAction=True):
-        __safeAction__ = False
-        pc.camera(camera, e=True, displaySafeAction=False, overscan=oscan)
-    if pc.camera(camera, q=True, displaySafeTitle=True):
-        __safeTitle__ = False
-        pc.camera(camera, e=True, displaySafeTitle=False, overscan=oscan)
-    if not pc.camera(camera, q=True, dgm=True):
-        __resolutionGateMask__ = False
-        pc.camera(camera, e=True, dgm=True, overscan=oscan)
-
-
-def turnResolutionGateOff(camera):
-    global __resolutionGate__
-    global __safeAction__
-    global __safeTitle__
-    if not __resolutionGate__:
-        pc.camera(camera, e=True, displayResolution=False, overscan=1.0)
-        __resolutionGate__ = True
-    if not __safeAction__:
-        pc.camera(camera, e=True, displaySafeAction=True, overscan=1.0)
-        __safeAction__ = True
-    if not __safeTitle__:
-        pc.camera(camera, e=True, displaySafeTitle=True, overscan=1.0)
-        __safeTitle__ = True
-    if not __resolutionGateMask__:
-        pc.camera(camera, e=True, dgm=False, overscan=1.0)
-
-
-def turnResolutionGateOffPer(camera):
-    pc.camera(camera, e=True, displayResolution=False, overscan=1.0)
-    pc.camera(camera, e=True, displaySafeAction=False, overscan=1.0)
-    pc.camera(camera, e=True, displaySafeTitle=False, overscan=1.0)
-    pc.camera(camera, e=True, dgm=False, overscan=1.0)
-
-
-def hideShowCurves(flag):
-    sel = pc.ls(selection=True)
-    try:
-        if flag:
-            pc.select(pc.ls(type=pc.nt.NurbsCurve))
-            pc.Mel.eval("HideSelectedObjects")
-        else:
-            pc.select(pc.ls(type=pc.nt.NurbsCurve))
-            pc.showHidden(b=True)
-    except Exception:
-        pass
-
-    pc.select(sel)
-
-
 def getAudioNode():
     nodes = pc.ls(type=["audio"])
     if nodes:
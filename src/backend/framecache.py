@@ -0,0 +1,235 @@
+"""Reuse playblast frames that did not change since the last capture.
+
+Every frame gets a fingerprint of what can change its pixels: the value of
+every time anim curve driving something visible at that frame, the camera
+at that frame, and a per shot part covering the display layers, the unkeyed
+poses, the driven keys, the references and the capture settings. The frames
+of a shot are kept as a :class:`stagecache.StagingCache` entry along with
+their fingerprints, the next capture links the unchanged ones over and only
+playblasts the rest.
+
+Anything that is not driven by anim curves (simulations, caches,
+expressions reading the time) is only covered through the references and
+the unkeyed values, clear the cache entry to force a full capture.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import typing
+from logging import getLogger
+from pathlib import Path
+
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import maya.cmds as cmds
+
+from . import camerabake
+
+log = getLogger("MultiShotExport.FrameCache")
+
+FINGERPRINTS_FILE = "frames.json"
+# anim curves keyed on time, the others are driven keys
+TIME_CURVES = ["animCurveTA", "animCurveTL", "animCurveTT", "animCurveTU"]
+
+
+def _hash(data) -> str:
+    return hashlib.sha1(json.dumps(data, default=str).encode("utf-8")).hexdigest()
+
+
+def _isUnder(node: str, roots: typing.Iterable[str]) -> bool:
+    return any(node == root or node.startswith(root + "|") for root in roots)
+
+
+def displayLayerState():
+    """(name, visibility, members) of every display layer, and the long
+    names of everything hidden by them"""
+    state = []
+    hidden = []
+    for layer in sorted(cmds.ls(type="displayLayer")):
+        if layer == "defaultLayer" or cmds.referenceQuery(
+            layer, isNodeReferenced=True
+        ):
+            continue
+        members = sorted(
+            cmds.ls(
+                cmds.editDisplayLayerMembers(layer, q=True, fullNames=True) or [],
+                long=True,
+            )
+        )
+        visible = cmds.getAttr(layer + ".visibility")
+        state.append((layer, visible, members))
+        if not visible:
+            hidden.extend(members)
+    return state, hidden
+
+
+def _drives(curve, hidden) -> bool:
+    """Whether ``curve`` drives at least one node not hidden by a display
+    layer"""
+    targets = cmds.listConnections(curve + ".output", s=False, d=True) or []
+    if not targets:
+        return False
+    return not hidden or not all(
+        _isUnder(node, hidden) for node in cmds.ls(targets, long=True)
+    )
+
+
+def _visibleCurves(hidden) -> typing.List[oma.MFnAnimCurve]:
+    """Time anim curves driving at least one node that is not hidden by a
+    display layer"""
+    curves = []
+    for curve in cmds.ls(type=TIME_CURVES):
+        if not _drives(curve, hidden):
+            continue
+        sel = om.MSelectionList()
+        sel.add(curve)
+        curves.append(oma.MFnAnimCurve(sel.getDependNode(0)))
+    return curves
+
+
+def _drivenKeys(hidden) -> typing.List[typing.Any]:
+    """Keys and driver of every visible driven key curve, they have no
+    value at a time. What drives them is covered by the time curves and
+    the unkeyed values"""
+    data = []
+    for curve in sorted(cmds.ls(type="animCurve")):
+        if cmds.nodeType(curve) in TIME_CURVES or not _drives(curve, hidden):
+            continue
+        data.append(
+            (
+                cmds.listConnections(curve + ".input", s=True, d=False, plugs=True),
+                camerabake.curveData(curve),
+            )
+        )
+    return data
+
+
+def _unkeyedValues(hidden):
+    """Keyable values of visible controls that nothing drives, a pose change
+    without a key has to invalidate the frames too"""
+    values = []
+    controls = cmds.listRelatives(
+        cmds.ls(type="nurbsCurve", long=True), parent=True, fullPath=True
+    )
+    for node in sorted(set(controls or [])):
+        if hidden and _isUnder(node, hidden):
+            continue
+        for attr in cmds.listAttr(node, keyable=True, scalar=True) or []:
+            plug = node + "." + attr
+            with contextlib.suppress(ValueError, RuntimeError):
+                if not cmds.listConnections(plug, s=True, d=False):
+                    values.append((plug, cmds.getAttr(plug)))
+    return values
+
+
+def _references():
+    references = []
+    for phile in cmds.file(q=True, reference=True) or []:
+        if not cmds.referenceQuery(phile, isLoaded=True):
+            continue
+        path = cmds.referenceQuery(phile, filename=True, withoutCopyNumber=True)
+        with contextlib.suppress(OSError):
+            references.append(
+                (path, os.path.getmtime(path), os.path.getsize(path))
+            )
+    return references
+
+
+def frameFingerprints(camera, start, end, settings=()) -> typing.Dict[int, str]:
+    """Fingerprint of every frame of the shot, ``settings`` are whatever
+    else changes the capture (size, format, gates...)"""
+    layers, hidden = displayLayerState()
+    shotKey = _hash(
+        [
+            camerabake.FINGERPRINT_VERSION,
+            list(settings),
+            str(camera),
+            cmds.currentUnit(q=True, time=True),
+            layers,
+            _unkeyedValues(hidden),
+            _drivenKeys(hidden),
+            _references(),
+        ]
+    )
+    curves = _visibleCurves(hidden)
+    samples = camerabake.sampleCamera(camera, start, end)
+    uiUnit = om.MTime.uiUnit()
+    fingerprints = {}
+    for i, frame in enumerate(samples.frames):
+        mtime = om.MTime(frame, uiUnit)
+        data = [
+            shotKey,
+            samples.translate[i],
+            samples.rotate[i],
+            [values[i] for values in samples.lens.values()],
+            [round(curve.evaluate(mtime), 9) for curve in curves],
+        ]
+        fingerprints[int(round(frame))] = _hash(data)
+    return fingerprints
+
+
+def readFingerprints(entry: typing.Optional[Path]) -> typing.Dict[int, str]:
+    if entry is None:
+        return {}
+    try:
+        with open(entry / FINGERPRINTS_FILE) as f:
+            return {int(frame): fp for frame, fp in json.load(f).items()}
+    except (IOError, ValueError):
+        return {}
+
+
+def _linkOrCopy(src: Path, dst: Path):
+    try:
+        os.link(str(src), str(dst))
+    except OSError:
+        shutil.copy2(str(src), str(dst))
+
+
+def stageFrames(
+    cache,
+    key: str,
+    fingerprints: typing.Dict[int, str],
+    frameName: typing.Callable[[int], str],
+    capture: typing.Callable[[Path, typing.List[int]], None],
+) -> Path:
+    """Build the cache entry ``key`` holding every frame of
+    ``fingerprints``: frames unchanged since the previous entry are linked
+    over, ``capture(folder, frames)`` has to write the others. Returns the
+    entry folder"""
+    previous = cache.get(key)
+    recorded = readFingerprints(previous)
+    with cache.building(key) as build:
+        missing = []
+        for frame, fingerprint in sorted(fingerprints.items()):
+            name = frameName(frame)
+            if (
+                previous is not None
+                and recorded.get(frame) == fingerprint
+                and (previous / name).is_file()
+            ):
+                _linkOrCopy(previous / name, build / name)
+            else:
+                missing.append(frame)
+        log.info(
+            "%s: reusing %d frames, capturing %d",
+            key,
+            len(fingerprints) - len(missing),
+            len(missing),
+        )
+        if missing:
+            capture(build, missing)
+            lost = [
+                frame for frame in missing if not (build / frameName(frame)).is_file()
+            ]
+            if lost:
+                # not committed, the next capture starts over
+                raise IOError(
+                    "%s: %d frames were not captured (%s...)"
+                    % (key, len(lost), lost[0])
+                )
+        with open(build / FINGERPRINTS_FILE, "w") as f:
+            json.dump({str(k): v for k, v in fingerprints.items()}, f)
+    return cache.entryPath(key)
@@ -0,0 +1,159 @@
+"""Playblast history of a shot, kept next to its movie.
+
+Every playblast appends one json line to ``<shot>.history.jsonl``, so
+blasting a shot no longer reads and rewrites its whole history and two
+artists blasting the same shot do not lose each other's entries. A small
+``<shot>.history.json`` index holding the latest entry is renamed into
+place after each append, reading it does not touch the history. Everything
+goes out through the transfer queue, with its retries and home folder
+fallback.
+
+The ``user`` of every entry is the artist who blasted the shot first, the
+way the old ``<shot>.json`` files recorded it. Those are imported into the
+history the first time the shot is blasted again and left as they are,
+they no longer get the new playblasts.
+"""
+
+import contextlib
+import json
+import os
+import typing
+from logging import getLogger
+from pathlib import Path
+
+log = getLogger("MultiShotExport.History")
+
+HISTORY_VERSION = 1
+HISTORY_SUFFIX = ".history.jsonl"
+INDEX_SUFFIX = ".history.json"
+LEGACY_SUFFIX = ".json"
+
+
+def historyPath(folder, name) -> Path:
+    return Path(folder) / (name + HISTORY_SUFFIX)
+
+
+def indexPath(folder, name) -> Path:
+    return Path(folder) / (name + INDEX_SUFFIX)
+
+
+def _readJson(path) -> typing.Any:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def _lastLine(path: Path, block=4096) -> typing.Optional[bytes]:
+    """The last complete line of ``path``, read backwards from the end"""
+    try:
+        f = open(path, "rb")
+    except IOError:
+        return None
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        data = b""
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+            lines = data.rstrip(b"\n").split(b"\n")
+            if len(lines) > 1 or start == 0:
+                return lines[-1] or None
+    return None
+
+
+def readIndex(folder, name) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    index = _readJson(indexPath(folder, name))
+    if isinstance(index, dict) and index.get("version") == HISTORY_VERSION:
+        return index
+    return None
+
+
+def latest(folder, name) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """The last playblast of the shot, from the index or else from the end
+    of the history"""
+    index = readIndex(folder, name)
+    if index is not None:
+        return index.get("latest")
+    line = _lastLine(historyPath(folder, name))
+    if line is None:
+        return None
+    try:
+        return json.loads(line.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def entries(folder, name) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """Every playblast of the shot, oldest first"""
+    with contextlib.suppress(IOError):
+        with open(historyPath(folder, name), encoding="utf-8") as f:
+            for line in f:
+                with contextlib.suppress(ValueError):
+                    yield json.loads(line)
+
+
+def readLegacy(folder, name) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Entries of an old ``<shot>.json``, oldest first"""
+    data = _readJson(Path(folder) / (name + LEGACY_SUFFIX))
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return []
+    return [entry for entry in reversed(data) if isinstance(entry, dict)]
+
+
+def _writeLines(path: Path, lines: typing.Iterable[typing.Dict[str, typing.Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(line) + "\n" for line in lines)
+    return path
+
+
+def _writeJson(path: Path, data: typing.Any) -> Path:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+    return path
+
+
+def append(folder, name, entry: typing.Dict[str, typing.Any], workDir, copyFile):
+    """Add ``entry`` to the history of the shot ``name`` in ``folder`` and
+    return it, with the user who blasted the shot first.
+
+    The files are written to ``workDir`` and published with ``copyFile``
+    (:func:`exportutils.copyFile`), the share is only read here"""
+    workDir = Path(workDir)
+    required = []
+    previous = latest(folder, name)
+    if previous is None and not historyPath(folder, name).exists():
+        # the history starts with the old <shot>.json, only written when no
+        # other blast of the shot created the history in the meantime
+        legacy = readLegacy(folder, name)
+        if legacy:
+            log.info("Importing %d playblasts of %s", len(legacy), name)
+            imported = workDir / "imported" / (name + HISTORY_SUFFIX)
+            imported.parent.mkdir(parents=True, exist_ok=True)
+            _writeLines(imported, legacy)
+            required.append(copyFile(imported, folder, depth=3, exclusive=True))
+            previous = legacy[-1]
+    if previous and previous.get("user") is not None:
+        entry = dict(entry, user=previous["user"])
+
+    part = _writeLines(workDir / (name + HISTORY_SUFFIX), [entry])
+    index = _writeJson(
+        workDir / (name + INDEX_SUFFIX),
+        {
+            "version": HISTORY_VERSION,
+            "name": name,
+            "user": entry.get("user"),
+            "history": part.name,
+            "latest": entry,
+        },
+    )
+    # a single small append, concurrent blasts cannot overwrite each
+    # other's lines
+    appended = copyFile(part, folder, depth=3, append=True, requires=required)
+    copyFile(index, folder, depth=3, requires=[appended])
+    return entry
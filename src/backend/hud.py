@@ -0,0 +1,128 @@
+"""Playblast HUDs, created once per export.
+
+Every HUD reads what it shows from :data:`current`, moving on to the next
+shot only updates that state and refreshes the HUDs whose value changed
+instead of removing and rebuilding all of them.
+"""
+
+import contextlib
+import functools
+import time
+import typing
+from logging import getLogger
+
+import pymel.core as pc
+
+log = getLogger("MultiShotExport.HUD")
+
+__HUD_DATE__ = "__HUD_DATE__"
+__HUD_LABEL__ = "__HUD_LABEL__"
+__HUD_USERNAME__ = "__HUD_USERNAME__"
+__hud_frame_1__ = "__hud_frame_1__"
+__hud_frame_2__ = "__hud_frame_2__"
+# maya's own HUDs shown along with ours, their visibility is handled by
+# viewportstate.ViewportState
+MAYA_HUDS = ("HUDCurrentFrame", "HUDFocalLength", "HUDCameraNames")
+
+
+class HUDState(object):
+    """What the HUDs currently show"""
+
+    def __init__(self):
+        self.date = ""
+        self.label = ""
+        self.username = ""
+        self.fps = ""
+        self.inOut = ""
+
+
+current = HUDState()
+# set for the length of an export, see begin
+keep = False
+
+# name: (state attribute, headsUpDisplay flags)
+HUDS: typing.Dict[str, typing.Tuple[str, typing.Dict[str, typing.Any]]] = {
+    __HUD_DATE__: ("date", {"section": 1, "blockSize": "large"}),
+    __HUD_LABEL__: ("label", {"section": 2, "blockSize": "large"}),
+    __HUD_USERNAME__: ("username", {"section": 3, "blockSize": "large"}),
+    __hud_frame_1__: (
+        "fps",
+        {"section": 6, "blockSize": "medium", "label": "FPS:", "lfs": "large"},
+    ),
+    __hud_frame_2__: (
+        "inOut",
+        {"section": 6, "blockSize": "medium", "label": "IN OUT:", "lfs": "large"},
+    ),
+}
+
+
+def _read(attr):
+    return getattr(current, attr)
+
+
+def isShown() -> bool:
+    return all(pc.headsUpDisplay(name, q=True, exists=True) for name in HUDS)
+
+
+def show():
+    """Create the HUDs, they keep showing :data:`current` until
+    :func:`remove`"""
+    for name, (attr, flags) in HUDS.items():
+        if pc.headsUpDisplay(name, q=True, exists=True):
+            pc.headsUpDisplay(name, remove=True)
+        pc.headsUpDisplay(
+            name,
+            block=pc.headsUpDisplay(nfb=flags["section"]),
+            dfs="large",
+            command=functools.partial(_read, attr),
+            **flags,
+        )
+    for name in MAYA_HUDS:
+        with contextlib.suppress(RuntimeError):
+            pc.headsUpDisplay(name, e=True, lfs="large", dfs="large", bs="medium")
+
+
+def remove():
+    for name in HUDS:
+        if pc.headsUpDisplay(name, exists=True):
+            pc.headsUpDisplay(name, rem=True)
+
+
+def update(**values):
+    """Set the values of :class:`HUDState` and refresh the HUDs showing
+    the ones that changed"""
+    values.setdefault("date", time.strftime("%d/%m/%Y %H:%M"))
+    changed = set()
+    for attr, value in values.items():
+        if getattr(current, attr) != value:
+            setattr(current, attr, value)
+            changed.add(attr)
+    for name, (attr, _) in HUDS.items():
+        if attr in changed and pc.headsUpDisplay(name, exists=True):
+            pc.headsUpDisplay(name, refresh=True)
+
+
+def begin():
+    """Keep the HUDs between shots until :func:`end`, they are created by
+    the first playblast that needs them"""
+    global keep
+    keep = True
+
+
+def end():
+    global keep
+    keep = False
+    remove()
+
+
+@contextlib.contextmanager
+def session():
+    """Show the HUDs for the block, they stay up after it between
+    :func:`begin` and :func:`end`"""
+    if not isShown():
+        show()
+    try:
+        yield
+    finally:
+        if not keep:
+            remove()
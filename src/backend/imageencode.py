@@ -0,0 +1,175 @@
+import concurrent.futures
+import os
+import struct
+import threading
+import typing
+import zlib
+from logging import getLogger
+
+log = getLogger("MultiShotExport.ImageEncode")
+
+RAW_FORMAT = "bmp"
+ENCODERS: typing.Dict[str, typing.Callable[..., None]] = {}
+
+
+class RawImage(typing.NamedTuple):
+    width: int
+    height: int
+    # tightly packed 8-bit RGB rows, top row first
+    pixels: bytes
+
+
+def readBMP(path) -> RawImage:
+    """Read an uncompressed 24/32 bit BMP (what maya writes for the raw bake
+    format) into a :class:`RawImage`"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] != b"BM":
+        raise ValueError("%s is not a BMP file" % path)
+    offset = struct.unpack_from("<I", data, 10)[0]
+    width, height, _, bpp, compression = struct.unpack_from("<iiHHI", data, 18)
+    if compression not in (0, 3) or bpp not in (24, 32):
+        raise ValueError("Unsupported BMP layout in %s" % path)
+    step = bpp // 8
+    stride = (width * step + 3) & ~3
+    bottomUp = height > 0
+    height = abs(height)
+    rows = []
+    for y in range(height):
+        start = offset + (height - 1 - y if bottomUp else y) * stride
+        row = data[start : start + width * step]
+        # BGR(A) -> RGB
+        rgb = bytearray(width * 3)
+        rgb[0::3] = row[2::step]
+        rgb[1::3] = row[1::step]
+        rgb[2::3] = row[0::step]
+        rows.append(bytes(rgb))
+    return RawImage(width, height, b"".join(rows))
+
+
+def _pngChunk(tag: bytes, payload: bytes):
+    return (
+        struct.pack(">I", len(payload))
+        + tag
+        + payload
+        + struct.pack(">I", zlib.crc32(tag + payload) & 0xFFFFFFFF)
+    )
+
+
+def writePNG(path, image: RawImage, level=6):
+    """Write an 8-bit RGB PNG. zlib releases the GIL while compressing so
+    several of these can run side by side in a thread pool"""
+    stride = image.width * 3
+    scanlines = b"".join(
+        b"\x00" + image.pixels[y * stride : (y + 1) * stride]
+        for y in range(image.height)
+    )
+    header = struct.pack(">IIBBBBB", image.width, image.height, 8, 2, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_pngChunk(b"IHDR", header))
+        f.write(_pngChunk(b"IDAT", zlib.compress(scanlines, level)))
+        f.write(_pngChunk(b"IEND", b""))
+
+
+def writeTIFF(path, image: RawImage, level=6):
+    """Write a single strip 8-bit RGB TIFF. ``level`` 0 writes it
+    uncompressed, anything else uses deflate at that level"""
+    data = image.pixels
+    compression = 1
+    if level:
+        data = zlib.compress(data, level)
+        compression = 8
+    entries = [
+        (256, 4, 1, image.width),  # ImageWidth
+        (257, 4, 1, image.height),  # ImageLength
+        (258, 3, 3, 0),  # BitsPerSample -> offset patched below
+        (259, 3, 1, compression),  # Compression
+        (262, 3, 1, 2),  # PhotometricInterpretation: RGB
+        (273, 4, 1, 0),  # StripOffsets -> patched below
+        (277, 3, 1, 3),  # SamplesPerPixel
+        (278, 4, 1, image.height),  # RowsPerStrip
+        (279, 4, 1, len(data)),  # StripByteCounts
+        (284, 3, 1, 1),  # PlanarConfiguration: chunky
+    ]
+    ifdOffset = 8
+    ifdSize = 2 + len(entries) * 12 + 4
+    bitsOffset = ifdOffset + ifdSize
+    dataOffset = bitsOffset + 6
+    ifd = struct.pack("<H", len(entries))
+    for tag, typ, count, value in entries:
+        if tag == 258:
+            value = bitsOffset
+        elif tag == 273:
+            value = dataOffset
+        if typ == 3 and count == 1:
+            ifd += struct.pack("<HHIHH", tag, typ, count, value, 0)
+        else:
+            ifd += struct.pack("<HHII", tag, typ, count, value)
+    ifd += struct.pack("<I", 0)
+    with open(path, "wb") as f:
+        f.write(b"II*\x00" + struct.pack("<I", ifdOffset))
+        f.write(ifd)
+        f.write(struct.pack("<HHH", 8, 8, 8))
+        f.write(data)
+
+
+ENCODERS["png"] = writePNG
+ENCODERS["tif"] = writeTIFF
+
+
+class EncoderPool(object):
+    """Encode raw bakes written by maya on the main thread into their final
+    format in a pool of worker threads.
+
+    The main thread only has to dump the sampled pixels uncompressed and
+    can move straight on to the next frame while the workers compress."""
+
+    def __init__(self, fmt="png", level=6, workers=None):
+        if fmt not in ENCODERS:
+            raise ValueError("Unsupported texture format: %s" % fmt)
+        self.fmt = fmt
+        self.level = level
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers or min(8, os.cpu_count() or 1),
+            thread_name_prefix="MultiShotEncoder",
+        )
+        self._futures: typing.List[concurrent.futures.Future] = []
+        self._lock = threading.Lock()
+
+    def rawPath(self, path):
+        """Where maya should write the raw bake for the final ``path``"""
+        return os.path.splitext(path)[0] + "." + RAW_FORMAT
+
+    def submit(self, rawPath, path):
+        future = self._executor.submit(self._encode, rawPath, path)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _encode(self, rawPath, path):
+        image = readBMP(rawPath)
+        ENCODERS[self.fmt](path, image, self.level)
+        os.remove(rawPath)
+        return path
+
+    def wait(self) -> typing.List[str]:
+        """Block until everything submitted is encoded and return the errors"""
+        errors = []
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in concurrent.futures.as_completed(futures):
+            ex = future.exception()
+            if ex is not None:
+                log.error("Texture encode failed", exc_info=ex)
+                errors.append(str(ex))
+        return errors
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
@@ -0,0 +1,135 @@
+"""Per-run record of every file an export published, and a pass that checks
+the destinations against it.
+
+A manifest is a json file with one entry per transfer job: where the file
+came from, where it ended up, its size and sha512 and how long it took.
+:func:`verify` can be pointed at any manifest later on to confirm that a
+sequence export is still complete on the share.
+"""
+
+import concurrent.futures
+import json
+import os
+import time
+import typing
+from logging import getLogger
+from pathlib import Path
+
+from . import contentstore, transfer
+
+log = getLogger("MultiShotExport.Manifest")
+
+MANIFEST_VERSION = 1
+
+
+def entryFromJob(job: "transfer.TransferJob") -> typing.Dict[str, typing.Any]:
+    return {
+        "src": str(job.src),
+        "des": str(job.des),
+        "target": None if job.target is None else str(job.target),
+        "status": job.status,
+        "size": job.size,
+        "hash": job.hash,
+        "append": job.append or job.exclusive,
+        "attempts": job.attempts,
+        "started": job.started,
+        "finished": job.finished,
+        "seconds": (
+            None
+            if job.started is None or job.finished is None
+            else round(job.finished - job.started, 3)
+        ),
+        "error": job.error,
+    }
+
+
+def fromJobs(jobs: typing.Iterable["transfer.TransferJob"], **info):
+    """Manifest data for ``jobs``, ``info`` is stored along with it (scene,
+    shots...)"""
+    return dict(
+        info,
+        version=MANIFEST_VERSION,
+        created=time.time(),
+        files=[entryFromJob(job) for job in jobs],
+    )
+
+
+def write(path, data: typing.Dict[str, typing.Any]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(str(temp), str(path))
+    return path
+
+
+def read(path) -> typing.Dict[str, typing.Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def checkEntry(entry: typing.Dict[str, typing.Any], deep=False) -> typing.Optional[str]:
+    """Why ``entry`` is not where it should be, None when it is.
+    ``deep`` also hashes the published file, which reads it back in full"""
+    status = entry.get("status")
+    if status == transfer.SKIPPED:
+        return None
+    if status == transfer.FALLBACK:
+        return "%s could not be published to %s, it was saved to %s\nReason: %s" % (
+            entry["src"],
+            entry["des"],
+            entry["target"],
+            entry.get("error"),
+        )
+    if status != transfer.DONE or not entry.get("target"):
+        return "%s was not published to %s: %s" % (
+            entry["src"],
+            entry["des"],
+            entry.get("error") or status,
+        )
+    target = contentstore.resolve(entry["target"])
+    try:
+        size = os.stat(target).st_size
+    except OSError:
+        return "%s is missing" % target
+    expected = entry.get("size")
+    if entry.get("append"):
+        # only the appended part is known, the rest of the file is older or
+        # was written by an other export
+        if expected is not None and size < expected:
+            return "%s has %d bytes, expected at least %d" % (target, size, expected)
+        return None
+    if expected is not None and size != expected:
+        return "%s has %d bytes, expected %d" % (target, size, expected)
+    if deep and entry.get("hash") and transfer.hashFile(target) != entry["hash"]:
+        return "%s does not match its source" % target
+    return None
+
+
+def verify(
+    data: typing.Dict[str, typing.Any], deep=False, workers=16
+) -> typing.List[str]:
+    """Check every entry of a manifest in parallel and return the problems"""
+    entries = data.get("files", [])
+    if not entries:
+        return []
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(workers, len(entries)),
+        thread_name_prefix="MultiShotVerify",
+    ) as executor:
+        futures = [executor.submit(checkEntry, entry, deep) for entry in entries]
+        for future, entry in zip(futures, entries):
+            try:
+                error = future.result()
+            except Exception as ex:
+                error = "Could not verify %s: %s" % (entry.get("target"), ex)
+            if error:
+                errors.append(error)
+    return errors
+
+
+def verifyFile(path, deep=False) -> typing.List[str]:
+    """Verify a manifest written by an earlier export"""
+    return verify(read(path), deep=deep)
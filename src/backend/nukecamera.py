@@ -0,0 +1,109 @@
+"""Write sampled camera motion in the Nuke .nk and .chan formats.
+
+This module only depends on the standard library so the writers can be run
+(and checked) outside of maya with synthetic samples, anything shaped like
+:class:`camerabake.CameraSamples` can be passed in.
+"""
+
+import math
+import typing
+
+if typing.TYPE_CHECKING:
+    from .camerabake import CameraSamples
+
+# maya's rotateOrder enum -> nuke's rot_order knob
+ROTATE_ORDERS = ("XYZ", "YZX", "ZXY", "XZY", "YXZ", "ZYX")
+INCH_TO_MM = 25.4
+
+
+def _number(value: float) -> str:
+    return ("%.6f" % value).rstrip("0").rstrip(".") or "0"
+
+
+def _curve(f: typing.TextIO, start: float, values: typing.Iterable[float]):
+    f.write("{curve x%s" % _number(start))
+    for value in values:
+        f.write(" ")
+        f.write(_number(value))
+    f.write("}")
+
+
+def _knob(f: typing.TextIO, start: float, values: typing.Sequence[float]):
+    """A static value when nothing changes, a curve otherwise"""
+    if all(v == values[0] for v in values):
+        f.write(_number(values[0]))
+    else:
+        _curve(f, start, values)
+
+
+def verticalFov(focalLength: float, verticalAperture: float) -> float:
+    """Vertical field of view in degrees, aperture is in inches like maya's"""
+    return math.degrees(
+        2.0 * math.atan((verticalAperture * INCH_TO_MM * 0.5) / focalLength)
+    )
+
+
+def writeNukeCamera(f: typing.TextIO, samples: "CameraSamples", name=None):
+    """Stream a single Camera node for ``samples`` to the open file ``f``"""
+    start = samples.frames[0]
+    lens = samples.lens
+    f.write("push 0\n")
+    f.write("Camera {\n")
+    f.write(" selectable false\n")
+    f.write(" rot_order %s\n" % ROTATE_ORDERS[samples.rotateOrder])
+    for knob, values in (("translate", samples.translate), ("rotate", samples.rotate)):
+        f.write(" %s {" % knob)
+        for axis in range(3):
+            if axis:
+                f.write(" ")
+            _curve(f, start, (v[axis] for v in values))
+        f.write("}\n")
+    f.write(" focal {")
+    _curve(f, start, lens["focalLength"])
+    f.write("}\n")
+    f.write(" haperture ")
+    _knob(f, start, [v * INCH_TO_MM for v in lens["horizontalFilmAperture"]])
+    f.write("\n vaperture ")
+    _knob(f, start, [v * INCH_TO_MM for v in lens["verticalFilmAperture"]])
+    f.write("\n")
+    if "nearClipPlane" in lens and "farClipPlane" in lens:
+        f.write(" near ")
+        _knob(f, start, lens["nearClipPlane"])
+        f.write("\n far ")
+        _knob(f, start, lens["farClipPlane"])
+        f.write("\n")
+    f.write(" win_scale {1 1}\n")
+    f.write(" name Camera\n")
+    f.write(" label %s\n" % (name or samples.name))
+    f.write("}\n")
+
+
+def writeNuke(samples: "CameraSamples", path, name=None):
+    """Write a .nk script with the camera and a scene node, it can be pasted
+    into or imported by nuke"""
+    with open(path, "w") as f:
+        writeNukeCamera(f, samples, name=name)
+        f.write("Scene {\n")
+        f.write(" inputs 1\n")
+        f.write(" name Maya_Scene\n")
+        f.write("}\n")
+    return path
+
+
+def writeChan(samples: "CameraSamples", path):
+    """Write a .chan file, one line per frame with
+    ``frame tx ty tz rx ry rz vfov``"""
+    lens = samples.lens
+    with open(path, "w") as f:
+        for i, frame in enumerate(samples.frames):
+            values = [frame]
+            values.extend(samples.translate[i])
+            values.extend(samples.rotate[i])
+            values.append(
+                verticalFov(
+                    lens["focalLength"][i], lens["verticalFilmAperture"][i]
+                )
+            )
+            f.write("\t".join(_number(v) for v in values))
+            f.write("\n")
+    return path
@@ -1,29 +1,57 @@
 import contextlib
-import json
+import functools
 import os
 import os.path as osp
+import shutil
 import subprocess
+import tempfile
 import threading
 import typing
+import wave
+from logging import getLogger
 from typing import TYPE_CHECKING
 
 import pymel.core as pc
 from PySide2.QtWidgets import QCheckBox, QHBoxLayout, QLabel, QPushButton
 
 from ..shot_form_tab import ShotFormExportTypeTab
-from . import exportutils, imaya, shotactions, shotplaylist
+from . import (
+    audioslice,
+    camerabake,
+    capturepanel,
+    contentstore,
+    exportutils,
+    framecache,
+    history,
+    hud,
+    imaya,
+    shotactions,
+    shotplaylist,
+    thumbnails,
+    transfer,
+    videoencode,
+    viewportstate,
+)
 from .exceptions import *  # noqa: F403
 
 if TYPE_CHECKING:
     from .._submit import Item, ShotForm, SubmitterWidget
     from ..backend.shotplaylist import PlaylistItem
 
+log = getLogger("MultiShotExport.Playblast")
+
 PlayListUtils = shotplaylist.PlaylistUtils
 Action = shotactions.Action
-__poly_count__ = False
-__HUD_DATE__ = "__HUD_DATE__"
-__HUD_LABEL__ = "__HUD_LABEL__"
-__HUD_USERNAME__ = "__HUD_USERNAME__"
+encoders: typing.Optional[videoencode.VideoEncoderPool] = None
+contactSheet: typing.Optional[thumbnails.ContactSheet] = None
+# every audio opened during the export, queued encodes may still read
+# their slices until finishEncoding
+audioSlicers: typing.List[audioslice.AudioSlicer] = []
+SEQUENCE_MOVIE = "sequence_review.mov"
+HD_SUFFIX = "_HD"
+# published movie -> its transfer job, for assembleSequence
+publishedMovies: typing.Dict[str, "transfer.TransferJob"] = {}
+publishedLock = threading.Lock()
 __CURRENT_FRAME__ = 0.0
 
 
@@ -48,85 +76,196 @@ def playblast(data):
     )
 
 
-def getUsername():
-    return ""
+def getEncoders(conf) -> videoencode.VideoEncoderPool:
+    """The encoder pool shared by every shot of the export"""
+    global encoders
+    if encoders is None:
+        encoders = videoencode.VideoEncoderPool(
+            workers=conf["workers"],
+            ffmpeg=conf["ffmpeg"],
+            crf=conf["crf"],
+            preset=conf["preset"],
+        )
+    return encoders
+
+
+def getContactSheet(conf) -> thumbnails.ContactSheet:
+    global contactSheet
+    if contactSheet is None:
+        contactSheet = thumbnails.ContactSheet(conf["contact_sheet_columns"])
+    return contactSheet
+
+
+def getAudioSlicer(path, offset, fps) -> typing.Optional[audioslice.AudioSlicer]:
+    """The slicer of the sequence audio, opened once per export and closed
+    by :func:`finishEncoding`. None when the file cannot be sliced, ffmpeg
+    then seeks into it itself"""
+    for slicer in audioSlicers:
+        if slicer.matches(path, offset, fps):
+            return slicer
+    try:
+        slicer = audioslice.AudioSlicer(path, offset, fps)
+    except (wave.Error, EOFError, OSError) as ex:
+        log.warning("Cannot slice %s, encoding from the whole file: %s", path, ex)
+        return None
+    audioSlicers.append(slicer)
+    return slicer
+
+
+def closeAudioSlicers():
+    while audioSlicers:
+        audioSlicers.pop().close()
+
+
+def finishEncoding():
+    """Barrier: wait for the queued encodes, and their copies to be queued,
+    then build the contact sheet. Failures are reported into
+    :data:`exportutils.errorsList`. Call before
+    :func:`exportutils.finishTransfers`"""
+    global encoders, contactSheet
+    if encoders is None:
+        closeAudioSlicers()
+        return []
+    pool, encoders = encoders, None
+    sheet, contactSheet = contactSheet, None
+    errors = pool.wait()
+    # nothing reads the slices anymore
+    closeAudioSlicers()
+    if sheet is not None:
+        try:
+            output = sheet.build(pool.runner, pool.ffmpeg)
+            folder = sheet.folder()
+            if output and folder:
+                exportutils.copyFile(output, folder, depth=2)
+        except (OSError, RuntimeError) as ex:
+            log.error("Contact sheet failed", exc_info=ex)
+            errors.append("Contact sheet not made: %s" % ex)
+    pool.shutdown()
+    exportutils.errorsList.extend(errors)
+    return errors
+
+
+def assembleSequence(pl, name=SEQUENCE_MOVIE) -> typing.Optional[str]:
+    """Join the published movie of every shot of ``pl`` with a playblast,
+    in playlist order, by stream copy. Shots that were not blasted this
+    time go in as they are on the share. Call after :func:`finishEncoding`
+    and before :func:`exportutils.finishTransfers`, waits for the movies
+    of this export to be published and queues the copy of the sequence
+    movie. Returns where it is published"""
+    with publishedLock:
+        jobs = dict(publishedMovies)
+        publishedMovies.clear()
+    movies = []
+    folders = []
+    blasted = False
+    conf = None
+    for item in pl.getItems():
+        action = PlayblastExport.getActionFromList(item.actions, forceCreate=False)
+        if not action or not action.enabled:
+            continue
+        published = osp.join(action.path, movieName(imaya.getNiceName(item.name)))
+        job = jobs.get(osp.normpath(published))
+        if job is not None:
+            job.wait()
+            if not job.ok:
+                exportutils.errorsList.append(
+                    "Sequence movie not made: %s was not published" % published
+                )
+                return None
+        movie = contentstore.resolve(published)
+        if not movie.is_file():
+            continue
+        movies.append(str(movie))
+        folders.append(action.path)
+        blasted = blasted or item.selected
+        conf = conf or action.encoderConf()
+    if conf is None or not conf["sequence_movie"] or not blasted or len(movies) < 2:
+        return None
+    try:
+        videoencode.checkConcat(movies, videoencode.ffprobePath(conf["ffmpeg"]))
+        folder = osp.commonpath([osp.abspath(folder) for folder in folders])
+        workDir = tempfile.mkdtemp(prefix="multishot_sequence_")
+        output = osp.join(workDir, name)
+        videoencode.runProcess(
+            videoencode.concatCommand(
+                videoencode.writeConcatList(
+                    movies, osp.join(workDir, "shots.txt")
+                ),
+                output,
+                conf["ffmpeg"],
+            )
+        )
+    except (OSError, RuntimeError, ValueError) as ex:
+        log.error("Sequence movie failed", exc_info=ex)
+        exportutils.errorsList.append("Sequence movie not made: %s" % ex)
+        return None
+    log.info("Sequence movie of %d shots: %s", len(movies), output)
+    exportutils.copyFile(output, folder, depth=2)
+    return osp.join(folder, name)
 
 
-def label():
-    return ""
+def movieName(itemName, hd=False):
+    """The HD movie is published next to the standard one"""
+    return itemName + (HD_SUFFIX if hd else "") + ".mov"
 
 
-def recordCurrentFrame():
-    global __CURRENT_FRAME__
-    __CURRENT_FRAME__ = pc.currentTime()
+def hasHDAspect(resolution):
+    hdWidth, hdHeight = exportutils.HD_RESOLUTION
+    return abs(resolution[0] * hdHeight - resolution[1] * hdWidth) <= hdHeight
 
 
-def restoreCurrentFrame():
-    pc.currentTime(__CURRENT_FRAME__)
+def overscanSize(resolution):
+    """Capture size whose resolution gate region is ``resolution``, rounded
+    to even numbers for the encoder"""
+    return tuple(
+        int(round(side * exportutils.GATE_OVERSCAN / 2.0)) * 2 for side in resolution
+    )
 
 
-def hidePolyCount():
-    global __poly_count__
-    if pc.optionVar(q="polyCountVisibility"):
-        __poly_count__ = True
-        pc.Mel.eval("setPolyCountVisibility(0)")
+def shotBurnIns(item) -> typing.List[videoencode.BurnIn]:
+    """What the HUDs show, as burn-ins: the values of :data:`hud.current`
+    and the focal length sampled on every frame"""
+    state = hud.current
+    samples = camerabake.sampleCamera(item.camera, item.inFrame, item.outFrame)
+    BurnIn = videoencode.BurnIn
+    burnIns = [
+        BurnIn(state.date, "top-left"),
+        BurnIn(state.label, "top"),
+        BurnIn(state.username, "top-right"),
+        BurnIn("FPS: " + state.fps, "bottom-left", 1),
+        BurnIn("IN OUT: " + state.inOut, "bottom-left"),
+        BurnIn(samples.name, "bottom"),
+        BurnIn("%%{eif:n+%d:d}" % int(item.inFrame), "bottom-right", 1, expand=True),
+    ]
+    # one burn-in per run of frames with the same focal length
+    focal = [round(value, 2) for value in samples.lens["focalLength"]]
+    first = 0
+    for i in range(1, len(focal) + 1):
+        if i < len(focal) and focal[i] == focal[first]:
+            continue
+        frames = None if first == 0 and i == len(focal) else (first, i - 1)
+        burnIns.append(
+            BurnIn("Focal Length: %.2f" % focal[first], "bottom-right", 0, frames)
+        )
+        first = i
+    return burnIns
 
 
-def showPolyCount():
-    global __poly_count__
-    if __poly_count__:
-        pc.Mel.eval("setPolyCountVisibility(1)")
-        __poly_count__ = False
+def getUsername():
+    return ""
 
 
-def showNameLabel():
-    if pc.headsUpDisplay(__HUD_LABEL__, q=True, exists=True):
-        pc.headsUpDisplay(__HUD_LABEL__, remove=True)
-    pc.headsUpDisplay(
-        __HUD_LABEL__,
-        section=2,
-        block=pc.headsUpDisplay(nfb=2),
-        blockSize="large",
-        dfs="large",
-        command=label,
-    )
-    if pc.headsUpDisplay(__HUD_USERNAME__, q=True, exists=True):
-        pc.headsUpDisplay(__HUD_USERNAME__, remove=True)
-    pc.headsUpDisplay(
-        __HUD_USERNAME__,
-        section=3,
-        block=pc.headsUpDisplay(nfb=3),
-        blockSize="large",
-        dfs="large",
-        command=getUsername,
-    )
-    pc.headsUpDisplay(__HUD_USERNAME__, e=True, dfs="large")
-
-
-def showDate():
-    global __HUD_DATE__
-    if pc.headsUpDisplay(__HUD_DATE__, q=True, exists=True):
-        pc.headsUpDisplay(__HUD_DATE__, remove=True)
-    pc.headsUpDisplay(
-        __HUD_DATE__,
-        section=1,
-        block=pc.headsUpDisplay(nfb=1),
-        blockSize="large",
-        dfs="large",
-        command='import pymel.core as pc;pc.date(format="DD/MM/YYYY hh:mm")',
-    )
+def label():
+    return ""
 
 
-def removeNameLabel():
-    if pc.headsUpDisplay(__HUD_LABEL__, exists=True):
-        pc.headsUpDisplay(__HUD_LABEL__, rem=True)
-    if pc.headsUpDisplay(__HUD_USERNAME__, exists=True):
-        pc.headsUpDisplay(__HUD_USERNAME__, rem=True)
+def recordCurrentFrame():
+    global __CURRENT_FRAME__
+    __CURRENT_FRAME__ = pc.currentTime()
 
 
-def removeDate():
-    if pc.headsUpDisplay(__HUD_DATE__, exists=True):
-        pc.headsUpDisplay(__HUD_DATE__, rem=True)
+def restoreCurrentFrame():
+    pc.currentTime(__CURRENT_FRAME__)
 
 
 class PlayblastExport(Action):
@@ -159,8 +298,36 @@ class PlayblastExport(Action):
         playblastargs["fp"] = 4
         playblastargs["offScreen"] = True
         huds = {}
+        encoder = {}
+        encoder["ffmpeg"] = "ffmpeg"
+        encoder["workers"] = 2
+        encoder["crf"] = 18
+        encoder["preset"] = "medium"
+        # what maya writes the frames as, cheap to write and to decode
+        encoder["capture_format"] = "bmp"
+        # keep captured frames and only re-capture the ones that changed,
+        # only with burn-ins: frames with the HUDs baked in show the date
+        encoder["frame_cache"] = True
+        # capture without HUDs and draw them with the encoder instead
+        encoder["burn_ins"] = False
+        encoder["burn_in_color"] = "green"
+        # a .ttf for ffmpeg builds without fontconfig
+        encoder["burn_in_font"] = ""
+        # poster frame and thumbnail per shot, contact sheet per export
+        encoder["thumbnails"] = True
+        encoder["thumbnail_size"] = [320, 180]
+        encoder["contact_sheet_columns"] = 6
+        # join the shots into one review movie after the export
+        encoder["sequence_movie"] = True
         conf["playblastargs"] = playblastargs
         conf["HUDs"] = huds
+        conf["encoder"] = encoder
+        conf["capture_panel"] = capturepanel.defaultConf()
+        return conf
+
+    def encoderConf(self):
+        conf = PlayblastExport.initConf()["encoder"]
+        conf.update((self._conf or {}).get("encoder", {}))
         return conf
 
     def perform(self, readconf=True, **kwargs):
@@ -178,52 +345,102 @@ class PlayblastExport(Action):
             except IOError:
                 self._conf = PlayblastExport.initConf()
 
-            pc.select(item.camera)
-            pc.lookThru(item.camera)
-            hidePolyCount()
-            showDate()
-            exportutils.turnResolutionGateOn(item.camera)
-            exportutils.showFrameInfo(item)
-            exportutils.setDefaultResolution(
-                (1920, 1080), default=kwargs.get("defaultResolution", False)
+            # burnt in movies are captured without the HUDs
+            huds = (
+                contextlib.nullcontext()
+                if self.encoderConf()["burn_ins"]
+                else hud.session()
             )
-            exportutils.turn2dPanZoomOff(item.camera)
-            if not kwargs.get("hdOnly"):
-                t = threading.Thread(
-                    target=self.makePlayblast,
-                    kwargs={
-                        "sound": kwargs.get("sound"),
-                        "local": kwargs.get("local"),
-                    },
+            with huds, viewportstate.guarded(
+                kwargs.get("viewport"), [item.camera]
+            ) as viewport:
+                self.playblastShot(item, viewport, **kwargs)
+
+    def playblastShot(self, item, viewport: viewportstate.ViewportState, **kwargs):
+        """Playblast ``item`` with the viewport set up through ``viewport``,
+        which restores it"""
+        if not self.encoderConf()["burn_ins"]:
+            viewport.setHUDVisibility(
+                polyCount=False,
+                currentFrame=True,
+                focalLength=True,
+                cameraNames=True,
+            )
+        # the render settings of the panel are restored with the viewport
+        capturepanel.get(self._conf.get("capture_panel"), viewport)
+        hud.update(
+            label=label(),
+            username=getUsername(),
+            fps=exportutils.getFrameRate(),
+            inOut="%s - %s" % (item.inFrame, item.outFrame),
+        )
+        viewport.setCamera(
+            item.camera,
+            displayResolution=True,
+            displaySafeAction=False,
+            displaySafeTitle=False,
+            displayGateMask=True,
+            overscan=exportutils.GATE_OVERSCAN,
+            panZoomEnabled=False,
+        )
+        if not kwargs.get("defaultResolution", False):
+            viewport.setResolution(exportutils.HD_RESOLUTION)
+        hd = kwargs.get("hd")
+        # the HD deliverable is the gate region of the standard capture,
+        # it can be cropped out when both share the HD aspect ratio. Only
+        # with burn-ins, maya draws its HUDs at the edges of the viewport
+        # which the crop would cut off
+        singleCapture = (
+            hd
+            and not kwargs.get("hdOnly")
+            and self.encoderConf()["burn_ins"]
+            and hasHDAspect(viewport.resolution())
+        )
+        if singleCapture:
+            standard = viewport.resolution()
+            hdWidth, hdHeight = exportutils.HD_RESOLUTION
+            self.makePlayblast(
+                sound=kwargs.get("sound"),
+                local=kwargs.get("local", False),
+                size=overscanSize(exportutils.HD_RESOLUTION),
+                withThumbnails=True,
+                deliverables={
+                    "sd": (False, ("scale=%d:%d" % standard,), standard[1]),
+                    "hd": (
+                        True,
+                        (
+                            "crop=iw/%(o)s:ih/%(o)s"
+                            % {"o": exportutils.GATE_OVERSCAN},
+                            "scale=%d:%d" % (hdWidth, hdHeight),
+                        ),
+                        hdHeight,
+                    ),
+                },
+            )
+        elif not kwargs.get("hdOnly"):
+            self.makePlayblast(
+                sound=kwargs.get("sound"),
+                local=kwargs.get("local", False),
+                withThumbnails=True,
+            )
+
+        if hd:
+            if not singleCapture:
+                viewport.setCamera(
+                    item.camera,
+                    displayResolution=False,
+                    displaySafeAction=False,
+                    displaySafeTitle=False,
+                    displayGateMask=False,
+                    overscan=1.0,
                 )
-                t.start()
-
-            exportutils.turnResolutionGateOff(item.camera)
-            if kwargs.get("hd"):
-                exportutils.turnResolutionGateOffPer(item.camera)
-                exportutils.setDefaultResolution((1920, 1080))
-                # t = threading.Thread(
-                #     target=self.makePlayblast,
-                #     kwargs={
-                #         "sound": kwargs.get("sound"),
-                #         "hd": True,
-                #         "local": kwargs.get("local"),
-                #     },
-                # )
-                # t.start()
+                viewport.setResolution(exportutils.HD_RESOLUTION)
                 self.makePlayblast(
                     sound=kwargs.get("sound"),
                     hd=True,
                     local=kwargs.get("local", False),
+                    withThumbnails=bool(kwargs.get("hdOnly")),
                 )
-                showNameLabel()
-            exportutils.removeFrameInfo(all=True)
-            removeDate()
-            removeNameLabel()
-            showPolyCount()
-            exportutils.restoreDefaultResolution()
-            exportutils.restore2dPanZoom(item.camera)
-        exportutils.restoreFrameInfo()
 
     @property
     def objects(self) -> typing.List[str]:
@@ -264,81 +481,218 @@ class PlayblastExport(Action):
         sound=None,
         hd=False,
         local=False,
+        size=None,
+        deliverables=None,
+        withThumbnails=False,
     ):
+        """Capture the shot once, at ``size`` or the scene resolution, and
+        queue an encode for each deliverable. ``deliverables`` maps a name to
+        ``(hd, ffmpeg filters, output height)``, by default the capture is
+        encoded as is. ``withThumbnails`` also makes the poster frame and
+        the thumbnail of the shot from the same capture"""
         if not item:
             item = self.__item__
             if not item:
                 pc.warning("Item not set: cannot make playblast")
+        audio, audioOffset = "", 0.0
         if sound:
-            sound = exportutils.getAudioNode()
-            if not sound:
-                sound = [""]
-        else:
-            sound = [""]
+            nodes = exportutils.getAudioNode()
+            if nodes:
+                audio = str(nodes[0].filename.get())
+                audioOffset = nodes[0].offset.get()
+        fps = pc.mel.currentTimeUnitToFPS()
+        if audio:
+            slicer = getAudioSlicer(audio, audioOffset, fps)
+            if slicer is not None:
+                # the segment starts with the shot
+                audio = slicer.slice(item.inFrame, item.outFrame)
+                audioOffset = item.inFrame
         itemName = imaya.getNiceName(item.name)
-        tempFilePath = osp.join(self.tempPath.name, itemName)
+        encoderConf = self.encoderConf()
+        # frames are captured on the main thread, the movie is encoded
+        # in the background while the next shot is being captured
+        variant = "hd" if hd else "sd"
+        tempDir = osp.join(self.tempPath.name, "playblast", itemName + "_" + variant)
+        if osp.exists(tempDir):
+            shutil.rmtree(tempDir)
+        os.makedirs(tempDir)
+        captureFormat = encoderConf["capture_format"]
+        burnIns = encoderConf["burn_ins"]
+        captureSize = size or exportutils.getDefaultResolution()
 
         # assert (item.inFrame is not None) and (item.outFrame is not None)
 
-        pc.playblast(
-            format="qt",
-            fo=1,
-            st=item.inFrame,
-            et=item.outFrame,
-            f=tempFilePath,
-            s=str(sound[0]),
-            sequenceTime=0,
-            clearCache=1,
-            viewer=0,
-            showOrnaments=1,
-            fp=4,
-            percent=100,
-            compression="H.264",
-            quality=100,
-            widthHeight=exportutils.getDefaultResolution(),
-            offScreen=1,
-        )
-
-        # maya.utils.executeInMainThreadWithResult(get_playblast)
-
-        tempFilePath += ".mov"
-        if hd:
-            depth = 4
-            path: str = self.path  # type: ignore
-            with contextlib.suppress(Exception):
-                os.mkdir(path)
+        panel = capturepanel.get(self._conf.get("capture_panel"))
+        capturepanel.lookThru(item.camera)
+
+        def capture(folder, frames=None):
+            if frames:
+                frameRange = {"frame": frames}
+            else:
+                frameRange = {"startTime": item.inFrame, "endTime": item.outFrame}
+            pc.playblast(
+                format="image",
+                compression=captureFormat,
+                forceOverwrite=1,
+                filename=osp.join(str(folder), itemName),
+                sequenceTime=0,
+                clearCache=1,
+                viewer=0,
+                showOrnaments=0 if burnIns else 1,
+                framePadding=videoencode.FRAME_PADDING,
+                percent=100,
+                quality=100,
+                widthHeight=captureSize,
+                offScreen=1,
+                editorPanelName=panel,
+                **frameRange,
+            )
 
+        # the HUD text changes with every export, only clean frames can be
+        # reused
+        cached = encoderConf["frame_cache"] and burnIns
+        if cached:
+            # only frames whose fingerprint changed since the last export
+            # of this shot are captured again
+            fingerprints = framecache.frameFingerprints(
+                item.camera,
+                item.inFrame,
+                item.outFrame,
+                settings=[
+                    captureSize,
+                    captureFormat,
+                    variant,
+                    self._conf.get("HUDs"),
+                    burnIns,
+                    self._conf.get("capture_panel"),
+                ],
+            )
+            frameCache = exportutils.getStagingCache()
+            frameKey = "playblast-%s-%s" % (itemName, variant)
+            frameDir = str(
+                framecache.stageFrames(
+                    frameCache,
+                    frameKey,
+                    fingerprints,
+                    lambda frame: videoencode.framePattern(itemName, captureFormat)
+                    % frame,
+                    capture,
+                )
+            )
+            # kept until the encodes below are done reading it
+            releaseFrames = frameCache.pin(frameKey)
         else:
-            depth = 3
-            path: str = self.path  # type: ignore
-        infoFilePath = osp.join(osp.dirname(tempFilePath), itemName + ".json")
-        infoFileOrigPath = osp.join(path, itemName + ".json")
-        data = ""
-        if osp.exists(infoFileOrigPath):
-            with open(infoFileOrigPath) as ifr:
-                data = json.loads(ifr.read())
-        with open(infoFilePath, "a") as infoFile:
-            newData = [
+            frameDir = osp.join(tempDir, "frames")
+            os.makedirs(frameDir)
+            capture(frameDir)
+        framePrefix = osp.join(frameDir, itemName)
+
+        if deliverables is None:
+            deliverables = {"hd" if hd else "sd": (hd, (), captureSize[1])}
+        path: str = self.path  # type: ignore
+        try:
+            exportutils.ensureDir(path)
+            historyDir = osp.join(tempDir, "history")
+            os.makedirs(historyDir)
+            history.append(
+                path,
+                itemName,
                 {
                     "user": getUsername(),
                     "time": pc.date(format="DD/MM/YYYY hh:mm"),
                     "inOut": "-".join([str(item.inFrame), str(item.outFrame)]),
                     "name": itemName,
                     "focalLength": item.camera.focalLength.get(),
-                }
-            ]
-            if data:
-                if isinstance(data, list):
-                    newData[0]["user"] = data[0]["user"]
-                    newData.extend(data)
-                if isinstance(data, dict):
-                    newData[0]["user"] = data["user"]
-                    newData.append(data)
-            infoFile.write(json.dumps(newData))
-        # if local:
-        #     path = exportutils.getLocalDestination(path, depth)
-        exportutils.copyFile(infoFilePath, self.path, depth=3)
-        exportutils.copyFile(tempFilePath, path, depth=depth)
+                },
+                historyDir,
+                exportutils.copyFile,
+            )
+        except OSError as ex:
+            log.warning("Could not record the playblast of %s", itemName, exc_info=ex)
+            exportutils.errorsList.append(
+                "Playblast history of %s not updated: %s" % (itemName, ex)
+            )
+
+        makeThumbnails = withThumbnails and encoderConf["thumbnails"]
+        # the frames are removed once every job reading them is done
+        pending = [len(deliverables) + (1 if makeThumbnails else 0)]
+        lock = threading.Lock()
+
+        def release(_):
+            with lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            if cached:
+                releaseFrames()
+            else:
+                shutil.rmtree(frameDir, ignore_errors=True)
+
+        def publish(job: videoencode.EncodeJob, depth):
+            published = exportutils.copyFile(job.output, path, depth=depth)
+            with publishedLock:
+                publishedMovies[
+                    osp.normpath(osp.join(path, osp.basename(job.output)))
+                ] = published
+
+        def publishThumbnails(poster, thumbnail):
+            exportutils.copyFile(poster, path, depth=3)
+            # the contact sheet still needs it
+            exportutils.copyFile(thumbnail, path, depth=3, move=False)
+
+        encoders = getEncoders(encoderConf)
+        if makeThumbnails:
+            thumbDir = osp.join(tempDir, "thumbnails")
+            os.makedirs(thumbDir)
+            poster = osp.join(thumbDir, itemName + thumbnails.POSTER_SUFFIX)
+            thumbnail = osp.join(thumbDir, itemName + thumbnails.THUMBNAIL_SUFFIX)
+            size = tuple(encoderConf["thumbnail_size"])
+            future = encoders.run(
+                thumbnails.shotCommand(
+                    videoencode.framePattern(framePrefix, captureFormat)
+                    % thumbnails.posterFrame(item.inFrame, item.outFrame),
+                    poster,
+                    thumbnail,
+                    size,
+                    # looks like the first movie
+                    filters=next(iter(deliverables.values()))[1],
+                    labels=videoencode.burnInFilters(
+                        [videoencode.BurnIn(itemName, "bottom-left")],
+                        size[1],
+                        color=encoderConf["burn_in_color"],
+                        font=encoderConf["burn_in_font"],
+                    ),
+                    ffmpeg=encoders.ffmpeg,
+                ),
+                functools.partial(publishThumbnails, poster, thumbnail),
+            )
+            # failed or not
+            future.add_done_callback(release)
+            getContactSheet(encoderConf).add(thumbnail, path)
+        texts = shotBurnIns(item) if burnIns else []
+        for name, (isHD, filters, height) in deliverables.items():
+            os.makedirs(osp.join(tempDir, name))
+            future = encoders.submit(
+                videoencode.EncodeJob(
+                    frames=videoencode.framePattern(
+                        framePrefix, encoderConf["capture_format"]
+                    ),
+                    start=int(item.inFrame),
+                    fps=fps,
+                    output=osp.join(tempDir, name, movieName(itemName, isHD)),
+                    audio=audio,
+                    audioOffset=audioOffset,
+                    filters=tuple(filters),
+                    burnIns=videoencode.burnInFilters(
+                        texts,
+                        height,
+                        color=encoderConf["burn_in_color"],
+                        font=encoderConf["burn_in_font"],
+                    ),
+                ),
+                onDone=functools.partial(publish, depth=4 if isHD else 3),
+            )
+            future.add_done_callback(release)
 
     @staticmethod
     def getTabUI() -> typing.Type["PlayblastExportTab"]:
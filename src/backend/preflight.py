@@ -0,0 +1,135 @@
+"""Filesystem checks run before an export starts.
+
+Every path is checked on its own worker thread with its own deadline, so a
+slow or unreachable share costs about one timeout for the whole batch
+instead of one stat per path in a row. Results are cached for a few seconds
+since the same paths get asked about several times while setting up an
+export.
+"""
+
+import concurrent.futures
+import os
+import time
+import typing
+from logging import getLogger
+
+log = getLogger("MultiShotExport.Preflight")
+
+EXISTS = "exists"
+MISSING = "missing"
+TIMEOUT = "timeout"
+
+TIMEOUT_SECONDS = 5.0
+CACHE_TTL = 10.0
+MAX_WORKERS = 32
+# how often the waiting thread wakes up to call ``idle``
+POLL_SECONDS = 0.05
+
+# normalized path -> (checked at, exists)
+_statCache: typing.Dict[str, typing.Tuple[float, bool]] = {}
+
+
+def _key(path) -> str:
+    return os.path.normcase(os.path.normpath(str(path)))
+
+
+def cached(path, ttl=CACHE_TTL) -> typing.Optional[bool]:
+    entry = _statCache.get(_key(path))
+    if entry is None or time.monotonic() - entry[0] > ttl:
+        return None
+    return entry[1]
+
+
+def clearCache():
+    _statCache.clear()
+
+
+def _exists(path, started: typing.Dict[str, float]) -> bool:
+    started[path] = time.monotonic()
+    exists = os.path.exists(str(path))
+    _statCache[_key(path)] = (time.monotonic(), exists)
+    return exists
+
+
+def checkPaths(
+    paths: typing.Iterable[str],
+    timeout=TIMEOUT_SECONDS,
+    ttl=CACHE_TTL,
+    onResult: typing.Optional[typing.Callable[[str, str], None]] = None,
+    idle: typing.Optional[typing.Callable[[], None]] = None,
+) -> typing.Dict[str, str]:
+    """Check every path concurrently and return ``{path: EXISTS | MISSING |
+    TIMEOUT}``.
+
+    ``onResult(path, status)`` is called on the calling thread as each
+    result comes in, and ``idle()`` every :data:`POLL_SECONDS` while
+    waiting, so the ui keeps updating while the rest are pending. A path
+    whose stat takes longer than ``timeout`` is reported as TIMEOUT.
+
+    Every call gets its own threads: a stat hung on a dead mount can not be
+    cancelled, it is left to finish on its own instead of holding up the
+    next check."""
+    results: typing.Dict[str, str] = {}
+
+    def report(path, status):
+        results[path] = status
+        if onResult is not None:
+            onResult(path, status)
+
+    pending = []
+    for path in dict.fromkeys(str(p) for p in paths):
+        exists = cached(path, ttl)
+        if exists is not None:
+            report(path, EXISTS if exists else MISSING)
+        else:
+            pending.append(path)
+    if not pending:
+        return results
+
+    workers = min(MAX_WORKERS, len(pending))
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="MultiShotPreflight"
+    )
+    started: typing.Dict[str, float] = {}
+    futures = {executor.submit(_exists, path, started): path for path in pending}
+    # timed out checks, their threads stay busy until the stat returns
+    abandoned: typing.List[concurrent.futures.Future] = []
+    try:
+        while futures:
+            done, _ = concurrent.futures.wait(
+                futures, timeout=POLL_SECONDS, return_when="FIRST_COMPLETED"
+            )
+            for future in done:
+                path = futures.pop(future)
+                try:
+                    report(path, EXISTS if future.result() else MISSING)
+                except OSError as ex:
+                    log.warning(f"Could not check {path}: {ex}")
+                    report(path, MISSING)
+            now = time.monotonic()
+            hung = [
+                future
+                for future, path in futures.items()
+                if path in started and now - started[path] > timeout
+            ]
+            for future in hung:
+                path = futures.pop(future)
+                abandoned.append(future)
+                log.warning(f"Timed out checking {path}")
+                report(path, TIMEOUT)
+            abandoned = [future for future in abandoned if not future.done()]
+            if futures and len(abandoned) >= workers:
+                # every thread is stuck, the paths still queued never start
+                for future, path in list(futures.items()):
+                    del futures[future]
+                    future.cancel()
+                    log.warning(f"Timed out checking {path}")
+                    report(path, TIMEOUT)
+            if futures and idle is not None:
+                idle()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    return results
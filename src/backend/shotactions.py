@@ -115,6 +115,11 @@ class Action(typing.Dict[typing.Any, typing.Any], metaclass=ABCMeta):
     def perform(self, **kwargs):
         pass
 
+    def outputDirs(self) -> typing.List[str]:
+        """Directories besides :attr:`path` this action writes into, they are
+        created up front for the whole batch"""
+        return []
+
     @property
     def _item(self):
         return self.__item__
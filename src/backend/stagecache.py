@@ -0,0 +1,185 @@
+"""Persistent local cache of built outputs, keyed by fingerprint.
+
+Actions build their outputs into a fresh folder handed out by
+:meth:`StagingCache.building` and publish from the committed entry, which is
+left in place. A later export of an unchanged shot, or a retry after a
+failed transfer, finds the entry with :meth:`StagingCache.get` and only has
+to publish it again. Entries are evicted least recently used first each
+time one is committed, once the cache grows over its size budget. Entries
+still being read are pinned (:meth:`StagingCache.pin`) and never evicted.
+"""
+
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+import uuid
+from logging import getLogger
+from pathlib import Path
+
+log = getLogger("MultiShotExport.StageCache")
+
+ENTRY_FILE = ".entry.json"
+BUILD_DIR = ".build"
+
+
+def _safeKey(key: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+
+
+def _treeSize(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for phile in files:
+            with contextlib.suppress(OSError):
+                size += os.path.getsize(os.path.join(root, phile))
+    return size
+
+
+class StagingCache(object):
+    """Folders of built files under ``root``, at most ``budget`` bytes plus
+    whatever is pinned"""
+
+    def __init__(self, root: typing.Union[str, Path], budget: int):
+        self.root = Path(root)
+        self.budget = budget
+        # entry folder name -> number of readers
+        self._pins: typing.Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def entryPath(self, key: str) -> Path:
+        return self.root / _safeKey(key)
+
+    def get(self, key: typing.Optional[str]) -> typing.Optional[Path]:
+        """The committed entry for ``key``, marked as just used"""
+        if not key:
+            return None
+        path = self.entryPath(key)
+        meta = path / ENTRY_FILE
+        if not meta.is_file():
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(meta)
+        return path
+
+    def files(self, key: str) -> typing.List[Path]:
+        path = self.entryPath(key)
+        return sorted(p for p in path.iterdir() if p.name != ENTRY_FILE)
+
+    def pin(self, key: str) -> typing.Callable[[], None]:
+        """Keep the entry for ``key`` from being evicted until the returned
+        function is called"""
+        name = self.entryPath(key).name
+        with self._lock:
+            self._pins[name] = self._pins.get(name, 0) + 1
+        released = [False]
+
+        def release():
+            with self._lock:
+                if released[0]:
+                    return
+                released[0] = True
+                self._pins[name] -= 1
+                if not self._pins[name]:
+                    del self._pins[name]
+
+        return release
+
+    def pinUntil(self, key: str, jobs: typing.Sequence[typing.Any]):
+        """Pin ``key`` until every one of ``jobs`` is done, anything with an
+        ``addDoneCallback`` like :class:`transfer.TransferJob`"""
+        jobs = [job for job in jobs if job is not None]
+        release = self.pin(key)
+        remaining = [len(jobs)]
+        if not jobs:
+            release()
+            return
+
+        def _done(_):
+            with self._lock:
+                remaining[0] -= 1
+                last = not remaining[0]
+            if last:
+                release()
+
+        for job in jobs:
+            job.addDoneCallback(_done)
+
+    @contextlib.contextmanager
+    def building(self, key: str):
+        """Yield an empty folder to build ``key`` into, it becomes the entry
+        for ``key`` when the block finishes. It is thrown away on errors and
+        when nothing was written into it, which raises IOError"""
+        build = self.root / BUILD_DIR / uuid.uuid4().hex
+        build.mkdir(parents=True)
+        try:
+            yield build
+        except BaseException:
+            shutil.rmtree(str(build), ignore_errors=True)
+            raise
+        if not any(build.iterdir()):
+            shutil.rmtree(str(build), ignore_errors=True)
+            raise IOError("Nothing was built for %s" % key)
+        self.commit(key, build)
+        self.evict(keep=key)
+
+    def commit(self, key: str, build: Path) -> Path:
+        path = self.entryPath(key)
+        with open(build / ENTRY_FILE, "w") as f:
+            json.dump(
+                {"key": key, "size": _treeSize(build), "created": time.time()},
+                f,
+            )
+        if path.exists():
+            shutil.rmtree(str(path), ignore_errors=True)
+        os.replace(str(build), str(path))
+        return path
+
+    def entries(self) -> typing.List[typing.Tuple[float, int, Path]]:
+        """(last used, size, path) for every committed entry"""
+        entries = []
+        if not self.root.exists():
+            return entries
+        for path in self.root.iterdir():
+            meta = path / ENTRY_FILE
+            try:
+                lastUsed = meta.stat().st_mtime
+                with open(meta) as f:
+                    size = json.load(f)["size"]
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((lastUsed, size, path))
+        return entries
+
+    def evict(self, keep: typing.Optional[str] = None) -> typing.List[Path]:
+        """Drop least recently used entries until the cache fits its budget,
+        pinned entries and ``keep`` stay whatever their size"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            pinned = set(self._pins)
+        if keep is not None:
+            pinned.add(self.entryPath(keep).name)
+        evicted = []
+        for _, size, path in entries:
+            if total <= self.budget:
+                break
+            if path.name in pinned:
+                continue
+            shutil.rmtree(str(path), ignore_errors=True)
+            total -= size
+            evicted.append(path)
+        if evicted:
+            log.info("Evicted %d cached outputs", len(evicted))
+        return evicted
+
+    def clearBuilds(self):
+        """Remove builds left over by a crash, only call this while nothing
+        is being built"""
+        shutil.rmtree(str(self.root / BUILD_DIR), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(str(self.root), ignore_errors=True)
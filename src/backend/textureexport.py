@@ -6,7 +6,7 @@ from typing import TYPE_CHECKING
 
 import pymel.core as pc
 
-from . import exportutils, shotactions, shotplaylist
+from . import exportutils, imageencode, shotactions, shotplaylist
 
 if TYPE_CHECKING:
     from src.backend.cacheexport import CacheExportConf
@@ -14,6 +14,9 @@ if TYPE_CHECKING:
 PlayListUtils = shotplaylist.Playlist
 Action = shotactions.Action
 errorsList = []
+# extension of the published textures per format, the tif bakes have always
+# been named .iff and the pipeline looks for those names
+EXTENSIONS = {"tif": "iff"}
 
 
 class TextureExport(Action):
@@ -32,6 +35,10 @@ class TextureExport(Action):
         conf["texture_export_data"] = {"(?i).*nano.*": ["ExpRenderPlaneMtl.outColor"]}
         conf["texture_resX"] = 1024
         conf["texture_resY"] = 1024
+        conf["texture_format"] = "tif"
+        conf["texture_png_compression"] = 6
+        conf["texture_tif_compression"] = 6
+        conf["texture_encode_workers"] = 0
         return conf
 
     def perform(self, **kwargs):
@@ -70,27 +77,36 @@ class TextureExport(Action):
         """bake export animated textures from the scene"""
         if not self.get("objects"):
             return False
-        tempFilePath = osp.join(self.tempPath.name, "tex")
+        tempFilePath = osp.join(self.tempPath.name, "tex", self._item.name)
         if osp.exists(tempFilePath):
             shutil.rmtree(tempFilePath)
-        os.mkdir(tempFilePath)
+        os.makedirs(tempFilePath)
         start_time = int(self._item.inFrame)
         end_time = int(self._item.outFrame)
         rx = conf["texture_resX"]
         ry = conf["texture_resY"]
+        fmt = conf.get("texture_format", "tif")
         nameToAttrMapping = self.getNameToAttrMapping()
-        if exportAsTextures(
-            nameToAttrMapping,
-            startTime=start_time,
-            endTime=end_time,
-            rx=rx,
-            ry=ry,
-            outputDir=tempFilePath,
-        ):
+        with imageencode.EncoderPool(
+            fmt=fmt,
+            level=conf.get("texture_%s_compression" % fmt, 6),
+            workers=conf.get("texture_encode_workers") or None,
+        ) as pool:
+            exported = exportAsTextures(
+                nameToAttrMapping,
+                startTime=start_time,
+                endTime=end_time,
+                rx=rx,
+                ry=ry,
+                outputDir=tempFilePath,
+                pool=pool,
+                extension=EXTENSIONS.get(fmt, fmt),
+            )
+            errorsList.extend(pool.wait())
+        if exported:
             target_dir = osp.join(self.path, "tex")
             try:
-                if not osp.exists(target_dir):
-                    os.mkdir(target_dir)
+                exportutils.ensureDir(target_dir)
             except Exception as ex:
                 errorsList.append(str(ex))
 
@@ -106,8 +122,13 @@ def exportAsTextures(
     rx=1024,
     ry=1024,
     outputDir="images",
+    pool=None,
+    extension="iff",
 ):
-    """Export"""
+    """Export the textures as image sequences, if a
+    :class:`imageencode.EncoderPool` is given maya only writes raw bakes and
+    the pool takes care of encoding them. The files are named with
+    ``extension`` whatever their format"""
     textures_exported = False
     if not startTime:
         startTime = pc.playbackOptions(q=True, min=True)
@@ -117,17 +138,25 @@ def exportAsTextures(
         num = "%04d" % curtime
         pc.currentTime(curtime, e=True)
         for name, attr in nameToAttrMapping:
-            fileImageName = osp.join(outputDir, ".".join([name, num, "iff"]))
+            if pool is not None:
+                finalImageName = osp.join(outputDir, ".".join([name, num, extension]))
+                fileImageName = pool.rawPath(finalImageName)
+                fmt = imageencode.RAW_FORMAT
+            else:
+                fileImageName = osp.join(outputDir, ".".join([name, num, extension]))
+                fmt = "tif"
             try:
                 newobj = pc.convertSolidTx(
                     attr,
                     samplePlane=True,
                     rx=rx,
                     ry=ry,
-                    fil="tif",
+                    fil=fmt,
                     fileImageName=fileImageName,
                 )
                 pc.delete(newobj)
+                if pool is not None:
+                    pool.submit(fileImageName, finalImageName)
                 textures_exported = True
             except (WindowsError, IOError):
                 pass
@@ -0,0 +1,144 @@
+"""Poster frames, thumbnails and a sequence contact sheet, made from the
+frames the playblast already captured.
+
+Each shot gets a full size poster of its middle frame and a thumbnail
+scaled and padded to the same size for every shot, both written by one
+ffmpeg run in the encoder pool. Once every shot is done
+:class:`ContactSheet` tiles the thumbnails into a single image, in
+playlist order.
+"""
+
+import math
+import os
+import tempfile
+import typing
+from logging import getLogger
+
+from . import videoencode
+
+log = getLogger("MultiShotExport.Thumbnails")
+
+POSTER_SUFFIX = "_poster.jpg"
+THUMBNAIL_SUFFIX = "_thumb.jpg"
+CONTACT_SHEET = "contact_sheet.jpg"
+
+
+def posterFrame(start, end) -> int:
+    return int(round((float(start) + float(end)) / 2.0))
+
+
+def fitFilters(size: typing.Tuple[int, int]) -> typing.Tuple[str, ...]:
+    """Scale into ``size`` keeping the aspect ratio, and pad the rest"""
+    return (
+        "scale=%d:%d:force_original_aspect_ratio=decrease" % tuple(size),
+        "pad=%d:%d:(ow-iw)/2:(oh-ih)/2" % tuple(size),
+    )
+
+
+def shotCommand(
+    frame: str,
+    poster: str,
+    thumbnail: str,
+    size: typing.Tuple[int, int],
+    filters: typing.Sequence[str] = (),
+    labels: typing.Sequence[str] = (),
+    ffmpeg="ffmpeg",
+) -> typing.List[str]:
+    """One ffmpeg run writing the poster and the thumbnail of ``frame``.
+    ``filters`` make the frame look like the movie, ``labels`` are drawn
+    on the thumbnail only"""
+    posterFilters = list(filters) or ["null"]
+    thumbnailFilters = list(filters) + list(fitFilters(size)) + list(labels)
+    return [
+        ffmpeg,
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        frame,
+        "-vf",
+        ",".join(posterFilters),
+        "-frames:v",
+        "1",
+        "-q:v",
+        "2",
+        poster,
+        "-vf",
+        ",".join(thumbnailFilters),
+        "-frames:v",
+        "1",
+        "-q:v",
+        "3",
+        thumbnail,
+    ]
+
+
+def contactSheetCommand(
+    listFile: str, output: str, count: int, columns: int, ffmpeg="ffmpeg"
+) -> typing.List[str]:
+    columns = max(1, min(columns, count))
+    rows = int(math.ceil(count / float(columns)))
+    return [
+        ffmpeg,
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        listFile,
+        "-vf",
+        "tile=%dx%d:margin=8:padding=8" % (columns, rows),
+        "-frames:v",
+        "1",
+        "-q:v",
+        "2",
+        output,
+    ]
+
+
+class ContactSheet(object):
+    """Thumbnails of the shots of an export, tiled once they are all done"""
+
+    def __init__(self, columns=6):
+        self.columns = columns
+        # (thumbnail, folder the shot is published to)
+        self.entries: typing.List[typing.Tuple[str, str]] = []
+
+    def add(self, thumbnail: str, folder: str):
+        self.entries.append((thumbnail, folder))
+
+    def folder(self) -> typing.Optional[str]:
+        """Where the sheet is published: the folder every shot is under"""
+        folders = [os.path.abspath(folder) for _, folder in self.entries]
+        if not folders:
+            return None
+        try:
+            return os.path.commonpath(folders)
+        except ValueError:
+            # shots on different drives
+            return None
+
+    def build(
+        self, runner: typing.Callable[[typing.List[str]], None], ffmpeg="ffmpeg"
+    ) -> typing.Optional[str]:
+        """Tile the thumbnails that were written and return the sheet"""
+        thumbnails = [phile for phile, _ in self.entries if os.path.isfile(phile)]
+        if not thumbnails:
+            return None
+        workDir = tempfile.mkdtemp(prefix="multishot_contact_sheet_")
+        output = os.path.join(workDir, CONTACT_SHEET)
+        listFile = videoencode.writeConcatList(
+            thumbnails, os.path.join(workDir, "thumbnails.txt")
+        )
+        runner(
+            contactSheetCommand(
+                listFile, output, len(thumbnails), self.columns, ffmpeg
+            )
+        )
+        log.info("Contact sheet of %d shots: %s", len(thumbnails), output)
+        return output
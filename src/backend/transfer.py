@@ -0,0 +1,760 @@
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+import uuid
+from logging import getLogger
+from pathlib import Path
+
+log = getLogger("MultiShotExport.Transfer")
+
+PENDING = "pending"
+DONE = "done"
+FALLBACK = "fallback"
+FAILED = "failed"
+SKIPPED = "skipped"
+CHUNK_SIZE = 64 * 1024 * 1024
+CHUNKED_THRESHOLD = 256 * 1024 * 1024
+PART_SUFFIX = ".part"
+STAGING_DIR = ".multishot_staging"
+# smallest transfer whose throughput is fed back to its DestinationPolicy
+MIN_REPORT_SIZE = 16 * 1024 * 1024
+
+
+class TransferJob(object):
+    """A single (source, destination) copy handed to a :class:`TransferQueue`"""
+
+    def __init__(
+        self, src, des, depth=3, move=True, jobId=None, append=False, exclusive=False
+    ):
+        """With ``append`` the content of ``src`` is added at the end of the
+        destination file instead of replacing it. With ``exclusive`` it is
+        only written when the destination file does not exist yet"""
+        self.id = jobId or uuid.uuid4().hex
+        self.src = Path(src)
+        self.des = Path(des)
+        self.depth = depth
+        self.move = move
+        self.append = append
+        self.exclusive = exclusive
+        self.status = PENDING
+        self.target: typing.Optional[Path] = None
+        self.hash: typing.Optional[str] = None
+        self.size: typing.Optional[int] = None
+        self.moved = False
+        # the source could not be read, says nothing about the destination
+        self.sourceFailed = False
+        self.error: typing.Optional[str] = None
+        self.attempts = 0
+        self.started: typing.Optional[float] = None
+        self.finished: typing.Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: typing.List[typing.Callable[["TransferJob"], None]] = []
+
+    @property
+    def ok(self):
+        return self.status == DONE
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def addDoneCallback(self, callback: typing.Callable[["TransferJob"], None]):
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def skip(self):
+        self._finish(SKIPPED)
+
+    def _finish(self, status, error=None):
+        self.status = status
+        if error is not None:
+            self.error = error
+        self.finished = time.time()
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                log.exception("Transfer callback failed")
+
+    def toDict(self):
+        return {
+            "id": self.id,
+            "src": str(self.src),
+            "des": str(self.des),
+            "depth": self.depth,
+            "move": self.move,
+            "append": self.append,
+            "exclusive": self.exclusive,
+        }
+
+    def __repr__(self):
+        return "<TransferJob %s -> %s (%s)>" % (self.src, self.des, self.status)
+
+
+def resolveDestination(src: Path, des: Path) -> Path:
+    """Same rules as ``shutil.copy``: into ``des`` when it is a directory,
+    to ``des`` itself otherwise"""
+    if des.is_dir():
+        return des / src.name
+    return des
+
+
+def copyOnce(src: Path, target: Path):
+    """Copy under a temporary name and rename it into place, readers never
+    see a partial or missing ``target``"""
+    temp = target.with_name("%s.%s.tmp" % (target.name, uuid.uuid4().hex))
+    try:
+        shutil.copy(str(src), str(temp))
+        os.replace(str(temp), str(target))
+    finally:
+        with contextlib.suppress(OSError):
+            temp.unlink()
+
+
+def appendFile(src: Path, target: Path, exclusive=False):
+    """Add ``src`` at the end of ``target`` in a single write, concurrent
+    appends to the same file do not overwrite each other. With
+    ``exclusive`` nothing is written when ``target`` already exists"""
+    data = src.read_bytes()
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+    try:
+        fd = os.open(str(target), flags | (os.O_EXCL if exclusive else 0))
+    except FileExistsError:
+        log.info("%s was created by an other export", target)
+        return
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+
+
+def hashFile(path, chunkSize=CHUNK_SIZE):
+    """sha512 of ``path``, same digest as ``iutil.sha512OfFile``"""
+    hash = hashlib.sha512()
+    with open(path, "rb") as f:
+        while True:
+            piece = f.read(chunkSize)
+            if not piece:
+                return hash.hexdigest()
+            hash.update(piece)
+
+
+def _resumeOffset(fsrc: typing.BinaryIO, part: Path, chunkSize):
+    """How much of ``part`` can be kept, and the source hash up to there.
+    The part is only trusted when its content matches the source's prefix"""
+    partSize = part.stat().st_size
+    srcSize = os.fstat(fsrc.fileno()).st_size
+    if not 0 < partSize <= srcSize:
+        return 0, hashlib.sha512()
+    srcHash = hashlib.sha512()
+    partHash = hashlib.sha512()
+    remaining = partSize
+    with open(part, "rb") as fpart:
+        while remaining:
+            size = min(chunkSize, remaining)
+            srcHash.update(fsrc.read(size))
+            partHash.update(fpart.read(size))
+            remaining -= size
+    if srcHash.digest() == partHash.digest():
+        return partSize, srcHash
+    fsrc.seek(0)
+    return 0, hashlib.sha512()
+
+
+def chunkedCopy(
+    src: Path,
+    target: Path,
+    chunkSize=CHUNK_SIZE,
+    verify=True,
+    onChunk: typing.Optional[typing.Callable[[int], None]] = None,
+):
+    """Stream ``src`` to a temporary ``.part`` next to ``target`` in large
+    chunks, hashing while copying, then verify and rename it into place.
+
+    A ``.part`` left behind by a dropped connection is resumed instead of
+    copied again from scratch. Returns the sha512 of the file"""
+    part = target.with_name(target.name + PART_SUFFIX)
+    with open(src, "rb") as fsrc:
+        offset, srcHash = 0, hashlib.sha512()
+        if part.exists():
+            offset, srcHash = _resumeOffset(fsrc, part, chunkSize)
+            if offset:
+                log.info("Resuming copy of %s at %d bytes", src, offset)
+        with open(part, "r+b" if offset else "wb") as fdst:
+            fdst.seek(offset)
+            fdst.truncate()
+            while True:
+                piece = fsrc.read(chunkSize)
+                if not piece:
+                    break
+                srcHash.update(piece)
+                fdst.write(piece)
+                if onChunk is not None:
+                    onChunk(len(piece))
+            fdst.flush()
+            os.fsync(fdst.fileno())
+
+    digest = srcHash.hexdigest()
+    if part.stat().st_size != src.stat().st_size:
+        raise IOError("Size mismatch after copying %s" % src)
+    if verify and hashFile(part, chunkSize) != digest:
+        part.unlink()
+        raise IOError("Checksum mismatch after copying %s" % src)
+    os.replace(str(part), str(target))
+    return digest
+
+
+def smartCopy(
+    src: Path,
+    target: Path,
+    chunkSize=CHUNK_SIZE,
+    threshold=CHUNKED_THRESHOLD,
+    verify=True,
+    onChunk: typing.Optional[typing.Callable[[int], None]] = None,
+):
+    """Plain copy for small files, chunked/verified/resumable for big ones.
+    ``onChunk`` is told how many bytes went out, after every chunk"""
+    size = src.stat().st_size
+    if threshold is not None and size >= threshold:
+        return chunkedCopy(
+            src, target, chunkSize=chunkSize, verify=verify, onChunk=onChunk
+        )
+    copyOnce(src, target)
+    if onChunk is not None:
+        onChunk(size)
+
+
+def fallbackCopy(job: TransferJob, fallbackRoot: Path):
+    """Copy to ``fallbackRoot`` keeping the last ``depth`` folders of the
+    destination, so the artist can still find the file after an error"""
+    tempPath = fallbackRoot.joinpath(*job.des.parts[-job.depth :])
+    if not tempPath.exists():
+        tempPath.mkdir(parents=True, exist_ok=True)
+    target = tempPath / job.src.name
+    copyOnce(job.src, target)
+    return target
+
+
+def _existingAncestor(path: Path):
+    while not path.exists() and path.parent != path:
+        path = path.parent
+    return path
+
+
+def sameVolume(src: Path, target: Path) -> bool:
+    """True when ``target`` would end up on the same filesystem as ``src``"""
+    try:
+        return os.stat(src).st_dev == os.stat(_existingAncestor(target)).st_dev
+    except OSError:
+        return False
+
+
+def publishInPlace(src: Path, target: Path, move=True, link=False) -> bool:
+    """Publish without copying a byte when source and target share a volume:
+    an atomic rename for moves, a hardlink for copies when ``link`` is set.
+
+    Hardlinks are opt-in since the published file would change along with
+    the source if the source is later modified in place"""
+    if not (move or link) or not sameVolume(src, target.parent):
+        return False
+    try:
+        if move:
+            os.replace(str(src), str(target))
+        else:
+            if target.is_file():
+                target.unlink()
+            os.link(str(src), str(target))
+    except OSError as ex:
+        log.debug("Could not publish %s in place: %s", src, ex)
+        return False
+    return True
+
+
+def hideDirectory(path: Path):
+    if os.name == "nt":
+        import ctypes
+
+        FILE_ATTRIBUTE_HIDDEN = 0x02
+        ctypes.windll.kernel32.SetFileAttributesW(str(path), FILE_ATTRIBUTE_HIDDEN)
+
+
+def stagingDir(destination) -> Path:
+    """A hidden folder inside ``destination`` for exporters to write into
+    directly, see :func:`publishStaged`"""
+    root = Path(destination) / STAGING_DIR
+    if not root.exists():
+        root.mkdir(parents=True, exist_ok=True)
+        hideDirectory(root)
+    staging = root / uuid.uuid4().hex
+    staging.mkdir()
+    return staging
+
+
+def publishStaged(staging, destination) -> typing.List[TransferJob]:
+    """Rename everything written into ``staging`` into ``destination``, the
+    data is written exactly once and only shows up when complete.
+
+    Returns a finished job per file for the run manifest. They carry no
+    hash, the files never were on a local disk to hash cheaply"""
+    staging = Path(staging)
+    destination = Path(destination)
+    published = []
+    for phile in staging.iterdir():
+        job = TransferJob(phile, destination, move=True)
+        job.started = time.time()
+        job.attempts = 1
+        try:
+            job.size = phile.stat().st_size
+            job.target = destination / phile.name
+            os.replace(str(phile), str(job.target))
+            job.moved = True
+        except OSError as ex:
+            log.warning("Could not publish %s: %s", phile, ex)
+            job._finish(FAILED, str(ex))
+        else:
+            job._finish(DONE)
+        published.append(job)
+    shutil.rmtree(str(staging), ignore_errors=True)
+    with contextlib.suppress(OSError):
+        # only goes away when no other export is staging into it
+        staging.parent.rmdir()
+    return published
+
+
+def sourceError(src: Path) -> typing.Optional[Exception]:
+    """Why ``src`` cannot be read, None when it can"""
+    try:
+        with open(src, "rb"):
+            pass
+    except OSError as ex:
+        return ex
+    return None
+
+
+def runJob(
+    job: TransferJob,
+    fallbackRoot: Path,
+    retries=0,
+    retryDelay=1.0,
+    copier: typing.Callable[[Path, Path], typing.Optional[str]] = smartCopy,
+    link=False,
+    hashSource=False,
+    destinationDown=False,
+):
+    """Copy ``job`` with retries, falling back to ``fallbackRoot`` when the
+    destination stays unreachable. Same volume moves are just renamed.
+
+    With ``hashSource`` the job's hash is filled in even when the copier
+    does not compute one, from the local file before it is removed. With
+    ``destinationDown`` the destination is not tried at all. A source that
+    cannot be read fails the job right away, with ``sourceFailed`` set"""
+    job.started = time.time()
+    lastError = sourceError(job.src)
+    if lastError is not None:
+        log.warning("Cannot read %s: %s", job.src, lastError)
+        job.sourceFailed = True
+        job._finish(FAILED, str(lastError))
+        return job
+    copied = False
+    with contextlib.suppress(OSError):
+        job.size = job.src.stat().st_size
+    if destinationDown:
+        lastError = IOError("%s is unreachable" % destinationRoot(job.des))
+    while not destinationDown and job.attempts <= retries:
+        job.attempts += 1
+        try:
+            job.target = resolveDestination(job.src, job.des)
+            if job.append or job.exclusive:
+                appendFile(job.src, job.target, job.exclusive)
+            elif publishInPlace(job.src, job.target, job.move, link):
+                job.moved = job.move
+            else:
+                job.hash = copier(job.src, job.target)
+            copied = True
+            break
+        except Exception as ex:
+            lastError = ex
+            log.warning(
+                "Copy of %s failed (attempt %d): %s", job.src, job.attempts, ex
+            )
+            if sourceError(job.src) is not None:
+                # the source went away, retrying or falling back is pointless
+                job.sourceFailed = True
+                job._finish(FAILED, str(ex))
+                return job
+            if job.attempts <= retries:
+                time.sleep(retryDelay * 2 ** (job.attempts - 1))
+
+    status = DONE
+    if not copied:
+        status = FAILED
+        try:
+            job.target = fallbackCopy(job, fallbackRoot)
+            copied = True
+            status = FALLBACK
+        except Exception as ex2:
+            log.warning("Fallback copy of %s failed: %s", job.src, ex2)
+
+    # an appended file is more than the source, its hash would not match
+    appended = job.append or job.exclusive
+    if copied and hashSource and job.hash is None and not appended:
+        try:
+            job.hash = hashFile(job.target if job.moved else job.src)
+        except Exception as ex:
+            log.warning("Could not hash %s: %s", job.src, ex)
+
+    if copied and job.move and not job.moved:
+        try:
+            os.remove(job.src)
+        except Exception as ex:
+            log.warning("Could not remove %s: %s", job.src, ex)
+
+    job._finish(status, None if lastError is None else str(lastError))
+    return job
+
+
+def destinationRoot(path) -> str:
+    """The share or drive a destination lives on, ``\\\\server\\share`` for
+    UNC paths and ``X:`` for drive letters"""
+    path = str(path)
+    drive = os.path.splitdrive(path)[0]
+    if drive:
+        return drive.lower()
+    parts = Path(path).parts
+    return os.path.join(*parts[:2]).lower() if parts else ""
+
+
+class DestinationPolicy(object):
+    """Paces every transfer going into one destination root: at most
+    ``maxConcurrent`` at a time, at most ``bandwidth`` bytes per second in
+    total, and fewer parallel transfers while the share is struggling.
+
+    Concurrency adapts like TCP congestion control: it is halved when the
+    observed throughput drops well below the best seen (or a copy fails),
+    and grows back one slot at a time while throughput holds up. Only
+    transfers of at least ``minReportSize`` bytes count, small files are
+    dominated by per file overhead and always look slow."""
+
+    def __init__(
+        self,
+        maxConcurrent=4,
+        bandwidth: typing.Optional[float] = None,
+        slowdownRatio=0.5,
+        minReportSize=MIN_REPORT_SIZE,
+    ):
+        self.maxConcurrent = max(1, maxConcurrent)
+        self.bandwidth = bandwidth
+        self.slowdownRatio = slowdownRatio
+        self.minReportSize = minReportSize
+        self.limit = self.maxConcurrent
+        self.active = 0
+        self.bestThroughput = 0.0
+        self._cond = threading.Condition()
+        self._bucketTime = time.time()
+        self._bucketDebt = 0.0
+
+    @classmethod
+    def fromConf(cls, conf: typing.Dict[str, typing.Any]):
+        return cls(
+            maxConcurrent=conf.get("max_concurrent", 4),
+            bandwidth=conf.get("bandwidth"),
+            slowdownRatio=conf.get("slowdown_ratio", 0.5),
+            minReportSize=conf.get("min_report_size", MIN_REPORT_SIZE),
+        )
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    def throttle(self, nbytes: int):
+        """Sleep long enough to keep all transfers to this root under the
+        bandwidth cap (a shared token bucket)"""
+        if not self.bandwidth:
+            return
+        with self._cond:
+            now = time.time()
+            self._bucketDebt = max(
+                0.0, self._bucketDebt - (now - self._bucketTime) * self.bandwidth
+            )
+            self._bucketTime = now
+            self._bucketDebt += nbytes
+            delay = self._bucketDebt / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    def report(self, nbytes: int, seconds: float, ok=True):
+        """Feed back how a finished transfer went"""
+        with self._cond:
+            if not ok:
+                self._slowDown("transfer failed")
+                return
+            if seconds <= 0 or nbytes < max(1, self.minReportSize):
+                return
+            throughput = nbytes / seconds
+            if throughput > self.bestThroughput:
+                self.bestThroughput = throughput
+            if throughput < self.bestThroughput * self.slowdownRatio:
+                self._slowDown("%.1f MB/s" % (throughput / 1e6))
+            elif self.limit < self.maxConcurrent:
+                self.limit += 1
+                self._cond.notify_all()
+
+    def _slowDown(self, reason):
+        limit = max(1, self.limit // 2)
+        if limit != self.limit:
+            log.info("Backing off to %d transfers (%s)", limit, reason)
+        self.limit = limit
+
+
+class TransferQueue(object):
+    """Copies files in a bounded pool of worker threads so exporters can
+    queue their outputs and move on.
+
+    Every queued job is journaled to ``journal`` until it finishes, jobs left
+    over from an interrupted session are picked up again by :meth:`resume`.
+    """
+
+    def __init__(
+        self,
+        journal: typing.Union[str, Path],
+        fallbackRoot: typing.Union[str, Path],
+        workers=4,
+        retries=3,
+        retryDelay=1.0,
+        chunkSize=CHUNK_SIZE,
+        chunkedThreshold=CHUNKED_THRESHOLD,
+        verify=True,
+        link=False,
+        policies: typing.Optional[
+            typing.Dict[str, typing.Dict[str, typing.Any]]
+        ] = None,
+        hashSources=False,
+        store=None,
+    ):
+        """``policies`` maps destination roots (see :func:`destinationRoot`)
+        to :class:`DestinationPolicy` settings, the ``"default"`` entry
+        applies to every other root. ``store`` is a
+        :class:`contentstore.ContentStore` to publish through"""
+        self.journal = Path(journal)
+        self.link = link
+        self.hashSources = hashSources
+        self.store = store
+        self._policyConf = {
+            (root if root == "default" else destinationRoot(root)): conf
+            for root, conf in (policies or {}).items()
+        }
+        self._policies: typing.Dict[str, DestinationPolicy] = {}
+        # roots that failed a job after all its retries, later jobs to them
+        # go straight to the fallback
+        self._down: typing.Set[str] = set()
+        self.fallbackRoot = Path(fallbackRoot)
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.copier = functools.partial(
+            smartCopy,
+            chunkSize=chunkSize,
+            threshold=chunkedThreshold,
+            verify=verify,
+        )
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="MultiShotTransfer"
+        )
+        self._lock = threading.Lock()
+        self._jobs: typing.List[TransferJob] = []
+
+    def _record(self, event, job: TransferJob):
+        entry = dict(job.toDict(), event=event)
+        with self._lock:
+            try:
+                with open(self.journal, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except IOError as ex:
+                log.warning("Could not write transfer journal: %s", ex)
+
+    def pendingFromJournal(self) -> typing.List[TransferJob]:
+        if not self.journal.exists():
+            return []
+        queued: typing.Dict[str, dict] = {}
+        with open(self.journal) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("event") == "queued":
+                    queued[entry["id"]] = entry
+                else:
+                    queued.pop(entry.get("id"), None)
+        return [
+            TransferJob(
+                e["src"],
+                e["des"],
+                e["depth"],
+                e["move"],
+                jobId=e["id"],
+                append=e.get("append", False),
+                exclusive=e.get("exclusive", False),
+            )
+            for e in queued.values()
+            if Path(e["src"]).exists()
+        ]
+
+    def resume(self):
+        """Queue again whatever an earlier session left unfinished"""
+        jobs = self.pendingFromJournal()
+        with self._lock:
+            self.journal.write_text("")
+        for job in jobs:
+            log.info("Resuming transfer %s", job)
+            self._submit(job)
+        return jobs
+
+    def submit(
+        self,
+        src,
+        des,
+        depth=3,
+        move=True,
+        requires: typing.Iterable[TransferJob] = (),
+        append=False,
+        exclusive=False,
+    ) -> TransferJob:
+        """Queue a copy of ``src`` to ``des``. With ``requires`` the copy is
+        only started once all those jobs copied successfully, and skipped
+        if any of them did not"""
+        job = TransferJob(src, des, depth, move, append=append, exclusive=exclusive)
+        requires = [r for r in requires if r is not None]
+        if not requires:
+            return self._submit(job)
+
+        with self._lock:
+            self._jobs.append(job)
+        remaining = [len(requires)]
+
+        def _requirementDone(required: TransferJob):
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if not last:
+                return
+            if all(r.ok for r in requires):
+                self._submit(job, track=False)
+            else:
+                job.skip()
+
+        for required in requires:
+            required.addDoneCallback(_requirementDone)
+        return job
+
+    def _submit(self, job: TransferJob, track=True):
+        if track:
+            with self._lock:
+                self._jobs.append(job)
+        self._record("queued", job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def track(self, jobs: typing.Iterable[TransferJob]):
+        """Hand back ``jobs``, published some other way, from :meth:`wait`
+        along with the queued ones"""
+        with self._lock:
+            self._jobs.extend(jobs)
+
+    def policyFor(self, des) -> DestinationPolicy:
+        root = destinationRoot(des)
+        with self._lock:
+            policy = self._policies.get(root)
+            if policy is None:
+                conf = self._policyConf.get(root, self._policyConf.get("default", {}))
+                policy = self._policies[root] = DestinationPolicy.fromConf(conf)
+        return policy
+
+    def isDown(self, des) -> bool:
+        with self._lock:
+            return destinationRoot(des) in self._down
+
+    def _markDown(self, des):
+        root = destinationRoot(des)
+        with self._lock:
+            if root in self._down:
+                return
+            self._down.add(root)
+        log.warning(
+            "%s is unreachable, the remaining transfers to it go to %s",
+            root,
+            self.fallbackRoot,
+        )
+
+    def _run(self, job: TransferJob):
+        policy = self.policyFor(job.des)
+        down = self.isDown(job.des)
+        sent = [0]
+
+        def _onChunk(nbytes):
+            sent[0] += nbytes
+            policy.throttle(nbytes)
+
+        copier = functools.partial(self.copier, onChunk=_onChunk)
+        if self.store is not None:
+            copier = functools.partial(self.store.publish, copier=copier)
+        try:
+            with policy.slot():
+                start = time.time()
+                runJob(
+                    job,
+                    self.fallbackRoot,
+                    self.retries,
+                    self.retryDelay,
+                    copier,
+                    self.link,
+                    self.hashSources,
+                    down,
+                )
+                if not down and not job.sourceFailed:
+                    policy.report(sent[0], time.time() - start, job.ok)
+                    if job.status in (FALLBACK, FAILED):
+                        self._markDown(job.des)
+        except Exception as ex:
+            log.exception("Transfer of %s crashed", job.src)
+            job._finish(FAILED, str(ex))
+        finally:
+            self._record("finished", job)
+
+    def wait(self) -> typing.List[TransferJob]:
+        """Barrier: block until every queued job has finished and hand them
+        back, the queue can be reused afterwards"""
+        while True:
+            with self._lock:
+                jobs = list(self._jobs)
+            for job in jobs:
+                job.wait()
+            with self._lock:
+                if len(self._jobs) == len(jobs):
+                    self._jobs = []
+                    return jobs
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,369 @@
+"""Encode captured image sequences into movies with ffmpeg.
+
+Maya only has to write the frames of a shot, on the main thread, and can
+capture the next shot while a pool of ffmpeg processes encodes the previous
+one. The process runner can be swapped out (``runner``) to test the pool
+without ffmpeg.
+"""
+
+import concurrent.futures
+import functools
+import json
+import os
+import subprocess
+import threading
+import typing
+from logging import getLogger
+
+log = getLogger("MultiShotExport.VideoEncode")
+
+FRAME_PADDING = 4
+# where burn-ins go, (x, y) of the first line as drawtext expressions
+BURN_IN_POSITIONS = {
+    "top-left": ("%(m)d", "%(m)d"),
+    "top": ("(w-tw)/2", "%(m)d"),
+    "top-right": ("w-tw-%(m)d", "%(m)d"),
+    "bottom-left": ("%(m)d", "h-%(m)d-%(l)d"),
+    "bottom": ("(w-tw)/2", "h-%(m)d-%(l)d"),
+    "bottom-right": ("w-tw-%(m)d", "h-%(m)d-%(l)d"),
+}
+
+
+class EncodeJob(typing.NamedTuple):
+    """One movie to make from a captured sequence"""
+
+    # printf style pattern of the frames, ``shot.%04d.bmp``
+    frames: str
+    start: int
+    fps: float
+    output: str
+    audio: str = ""
+    # scene frame at which the audio starts
+    audioOffset: float = 0.0
+    # extra ffmpeg video filters, applied before the codec's even size fix
+    filters: typing.Tuple[str, ...] = ()
+    # applied after ``filters``, see :func:`burnInFilters`
+    burnIns: typing.Tuple[str, ...] = ()
+
+
+class BurnIn(typing.NamedTuple):
+    """Text drawn over the movie by the encoder"""
+
+    text: str
+    position: str = "top-left"
+    # lines stack away from the edge of the frame
+    line: int = 0
+    # first and last frame index showing the text, every frame when None
+    frames: typing.Optional[typing.Tuple[int, int]] = None
+    # expand drawtext's %{...} sequences, for the frame number
+    expand: bool = False
+
+
+def _escape(text: str, special: str) -> str:
+    return "".join("\\" + c if c in special else c for c in text)
+
+
+def burnInFilters(
+    burnIns: typing.Iterable[BurnIn], height: int, color="white", font=""
+) -> typing.Tuple[str, ...]:
+    """drawtext filters for ``burnIns`` on a ``height`` pixels high movie,
+    escaped for a filtergraph"""
+    size = max(12, int(round(height / 36.0)))
+    lineHeight = int(round(size * 1.4))
+    margin = size // 2
+    filters = []
+    for burnIn in burnIns:
+        if not burnIn.text:
+            continue
+        x, y = BURN_IN_POSITIONS[burnIn.position]
+        offset = burnIn.line * lineHeight
+        if burnIn.position.startswith("top"):
+            y = "%s+%d" % (y, offset)
+        else:
+            y = "%s-%d" % (y, offset)
+        options = [
+            ("text", burnIn.text),
+            ("expansion", "normal" if burnIn.expand else "none"),
+            ("x", x % {"m": margin, "l": lineHeight}),
+            ("y", y % {"m": margin, "l": lineHeight}),
+            ("fontsize", str(size)),
+            ("fontcolor", color),
+            ("box", "1"),
+            ("boxcolor", "black@0.4"),
+            ("boxborderw", str(max(2, size // 6))),
+        ]
+        if font:
+            options.append(("fontfile", font))
+        if burnIn.frames is not None:
+            options.append(("enable", "between(n,%d,%d)" % burnIn.frames))
+        # the option values first, then the whole filter for the graph
+        description = "drawtext=" + ":".join(
+            "%s=%s" % (key, _escape(value, "\\':")) for key, value in options
+        )
+        filters.append(_escape(description, "\\'[],;"))
+    return tuple(filters)
+
+
+def framePattern(prefix, extension, padding=FRAME_PADDING):
+    """The pattern of the files maya's image playblast writes for
+    ``filename=prefix``"""
+    return "%s.%%0%dd.%s" % (prefix, padding, extension)
+
+
+def audioArgs(job: EncodeJob) -> typing.List[str]:
+    """Line the audio up with the first captured frame the way maya does,
+    the audio node's offset is where the sound starts in the scene"""
+    if not job.audio:
+        return []
+    seconds = (job.start - job.audioOffset) / job.fps
+    if seconds >= 0:
+        return ["-ss", "%.6f" % seconds, "-i", job.audio]
+    return ["-itsoffset", "%.6f" % -seconds, "-i", job.audio]
+
+
+def buildCommand(
+    job: EncodeJob, ffmpeg="ffmpeg", crf=18, preset="medium"
+) -> typing.List[str]:
+    """H.264 .mov, the same deliverable ``pc.playblast(format="qt")``
+    produced"""
+    filters = list(job.filters) + list(job.burnIns)
+    # yuv420p needs even dimensions
+    filters.append("scale=trunc(iw/2)*2:trunc(ih/2)*2")
+    command = [
+        ffmpeg,
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-framerate",
+        "%g" % job.fps,
+        "-start_number",
+        str(int(job.start)),
+        "-i",
+        job.frames,
+    ]
+    command.extend(audioArgs(job))
+    command.extend(["-map", "0:v:0"])
+    if job.audio:
+        command.extend(["-map", "1:a:0", "-c:a", "aac", "-shortest"])
+    command.extend(
+        [
+            "-vf",
+            ",".join(filters),
+            "-c:v",
+            "libx264",
+            "-preset",
+            preset,
+            "-crf",
+            str(crf),
+            "-pix_fmt",
+            "yuv420p",
+            job.output,
+        ]
+    )
+    return command
+
+
+def writeConcatList(paths: typing.Iterable[str], listFile: str) -> str:
+    """Input list for ffmpeg's concat demuxer (``-f concat -safe 0``)"""
+    with open(listFile, "w", encoding="utf-8") as f:
+        for path in paths:
+            path = os.path.abspath(str(path)).replace("\\", "/")
+            f.write("file '%s'\n" % path.replace("'", "'\\''"))
+    return listFile
+
+
+def concatCommand(
+    listFile: str, output: str, ffmpeg="ffmpeg"
+) -> typing.List[str]:
+    """Join the movies of ``listFile`` without re-encoding them, they have
+    to share their codecs, size and frame rate"""
+    return [
+        ffmpeg,
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        listFile,
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-movflags",
+        "+faststart",
+        output,
+    ]
+
+
+def ffprobePath(ffmpeg="ffmpeg") -> str:
+    """The ffprobe installed along with ``ffmpeg``"""
+    folder, name = os.path.split(ffmpeg)
+    return os.path.join(folder, name.replace("ffmpeg", "ffprobe"))
+
+
+def probeCommand(path: str, ffprobe="ffprobe") -> typing.List[str]:
+    return [
+        ffprobe,
+        "-v",
+        "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,width,height,r_frame_rate,pix_fmt,"
+        "sample_rate,channels",
+        "-of",
+        "json",
+        path,
+    ]
+
+
+def streamLayout(probe: typing.Dict[str, typing.Any]) -> typing.Tuple[str, ...]:
+    """What has to be the same in movies joined by stream copy, one text
+    per video and audio stream of ffprobe's json output"""
+    layout = []
+    for stream in probe.get("streams", []):
+        kind = stream.get("codec_type")
+        if kind == "video":
+            layout.append(
+                "%s %sx%s %s fps %s"
+                % (
+                    stream.get("codec_name"),
+                    stream.get("width"),
+                    stream.get("height"),
+                    stream.get("r_frame_rate"),
+                    stream.get("pix_fmt"),
+                )
+            )
+        elif kind == "audio":
+            layout.append(
+                "%s %s Hz %s channels"
+                % (
+                    stream.get("codec_name"),
+                    stream.get("sample_rate"),
+                    stream.get("channels"),
+                )
+            )
+    return tuple(layout)
+
+
+def checkConcat(
+    paths: typing.Sequence[str],
+    ffprobe="ffprobe",
+    runner: typing.Optional[typing.Callable[[typing.List[str]], bytes]] = None,
+):
+    """Raise a ValueError naming the movies of ``paths`` that cannot be
+    joined by stream copy with the first one"""
+    runner = runner or runProcess
+    layouts = [
+        streamLayout(json.loads(runner(probeCommand(path, ffprobe)) or b"{}"))
+        for path in paths
+    ]
+    mismatches = [
+        "%s: %s" % (os.path.basename(path), ", ".join(layout) or "no streams")
+        for path, layout in zip(paths[1:], layouts[1:])
+        if layout != layouts[0]
+    ]
+    if mismatches:
+        raise ValueError(
+            "the shots were blasted with different settings, expected %s like "
+            "%s\n%s"
+            % (
+                ", ".join(layouts[0]) or "no streams",
+                os.path.basename(paths[0]),
+                "\n".join(mismatches),
+            )
+        )
+
+
+def runProcess(command: typing.List[str]) -> bytes:
+    """Run ``command`` without flashing a console window on windows and
+    return what it printed"""
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    result = subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **kwargs,
+    )
+    if result.returncode:
+        raise RuntimeError(
+            "ffmpeg failed (%d): %s"
+            % (result.returncode, result.stderr.decode(errors="replace").strip())
+        )
+    return result.stdout
+
+
+class VideoEncoderPool(object):
+    """Run encodes in the background, each one in its own ffmpeg process"""
+
+    def __init__(
+        self,
+        workers=2,
+        ffmpeg="ffmpeg",
+        crf=18,
+        preset="medium",
+        runner: typing.Callable[[typing.List[str]], None] = runProcess,
+    ):
+        self.ffmpeg = ffmpeg
+        self.crf = crf
+        self.preset = preset
+        self.runner = runner
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="MultiShotVideoEncoder"
+        )
+        self._futures: typing.List[concurrent.futures.Future] = []
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        job: EncodeJob,
+        onDone: typing.Optional[typing.Callable[[EncodeJob], None]] = None,
+    ) -> concurrent.futures.Future:
+        """Queue ``job``, ``onDone`` is called from the worker thread once
+        the movie is written"""
+        return self.run(
+            buildCommand(job, self.ffmpeg, self.crf, self.preset),
+            None if onDone is None else functools.partial(onDone, job),
+        )
+
+    def run(
+        self,
+        command: typing.List[str],
+        onDone: typing.Optional[typing.Callable[[], None]] = None,
+    ) -> concurrent.futures.Future:
+        """Queue any other ffmpeg ``command``"""
+        future = self._executor.submit(self._run, command, onDone)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _run(self, command: typing.List[str], onDone):
+        self.runner(command)
+        if onDone is not None:
+            onDone()
+
+    def wait(self) -> typing.List[str]:
+        """Block until everything submitted is encoded and return the errors"""
+        errors = []
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in concurrent.futures.as_completed(futures):
+            ex = future.exception()
+            if ex is not None:
+                log.error("Playblast encode failed", exc_info=ex)
+                errors.append(str(ex))
+        return errors
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
@@ -0,0 +1,193 @@
+"""Viewport, camera and HUD settings changed by the playblasts, saved once
+for the whole export.
+
+:class:`ViewportState` reads everything the playblasts touch when the
+export starts, camera attributes straight from their plugs. Each shot then
+only writes the values that differ from what is already applied, and
+everything is put back once at the end instead of after every shot.
+"""
+
+import contextlib
+import typing
+from logging import getLogger
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+import maya.mel as mel
+
+log = getLogger("MultiShotExport.ViewportState")
+
+CAMERA_BOOL_ATTRS = (
+    "displayResolution",
+    "displaySafeAction",
+    "displaySafeTitle",
+    "displayGateMask",
+    "panZoomEnabled",
+)
+CAMERA_FLOAT_ATTRS = ("overscan", "horizontalPan", "verticalPan", "zoom")
+# HUD toggles, their option var is ``<name>Visibility``
+HUD_VISIBILITY = {
+    "polyCount": "setPolyCountVisibility",
+    "cameraNames": "setCameraNamesVisibility",
+    "currentFrame": "setCurrentFrameVisibility",
+    "focalLength": "setFocalLengthVisibility",
+}
+HUD_COLORS = ("headsUpDisplayLabels", "headsUpDisplayValues")
+CAMERA = "camera"
+RESOLUTION = "resolution"
+HUD = "hud"
+COLOR = "color"
+ATTR = "attr"
+
+
+def _same(a, b) -> bool:
+    try:
+        return abs(float(a) - float(b)) < 1e-9
+    except (TypeError, ValueError):
+        return a == b
+
+
+def readCamera(camera) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+    """Full path of the camera shape and its viewport attributes, read from
+    the plugs in one pass"""
+    sel = om.MSelectionList()
+    sel.add(str(camera))
+    path = sel.getDagPath(0)
+    path.extendToShape()
+    fn = om.MFnDependencyNode(path.node())
+    values: typing.Dict[str, typing.Any] = {}
+    for attr in CAMERA_BOOL_ATTRS:
+        values[attr] = fn.findPlug(attr, False).asBool()
+    for attr in CAMERA_FLOAT_ATTRS:
+        values[attr] = fn.findPlug(attr, False).asDouble()
+    return path.fullPathName(), values
+
+
+class ViewportState(object):
+    """Remembers the original value of everything it changes, writes only
+    actual changes and puts the originals back in :meth:`restore`"""
+
+    def __init__(self):
+        self._original: typing.Dict[tuple, typing.Any] = {}
+        self._current: typing.Dict[tuple, typing.Any] = {}
+        self._shapes: typing.Dict[str, str] = {}
+        self._globals = False
+
+    def _remember(self, key: tuple, value):
+        if key not in self._original:
+            self._original[key] = value
+            self._current[key] = value
+
+    def snapshot(self, cameras: typing.Iterable = ()):
+        """Read the scene wide settings and those of ``cameras``. Cameras
+        that are not in here are read the first time they are changed"""
+        if not self._globals:
+            self._globals = True
+            for attr in ("width", "height"):
+                self._remember(
+                    (RESOLUTION, attr), cmds.getAttr("defaultResolution." + attr)
+                )
+            for name in HUD_VISIBILITY:
+                self._remember(
+                    (HUD, name), bool(cmds.optionVar(q=name + "Visibility"))
+                )
+            for name in HUD_COLORS:
+                self._remember(
+                    (COLOR, name), cmds.displayColor(name, q=True, dormant=True)
+                )
+        for camera in cameras:
+            self._cameraShape(camera)
+
+    def _cameraShape(self, camera) -> str:
+        name = str(camera)
+        shape = self._shapes.get(name)
+        if shape is None:
+            shape, values = readCamera(camera)
+            self._shapes[name] = shape
+            for attr, value in values.items():
+                self._remember((CAMERA, shape, attr), value)
+        return shape
+
+    def _write(self, key: tuple, value):
+        kind = key[0]
+        if kind == CAMERA:
+            cmds.setAttr("%s.%s" % key[1:], value)
+        elif kind == RESOLUTION:
+            cmds.setAttr("defaultResolution." + key[1], value)
+        elif kind == HUD:
+            mel.eval("%s(%d)" % (HUD_VISIBILITY[key[1]], bool(value)))
+        elif kind == COLOR:
+            cmds.displayColor(key[1], value, dormant=True)
+        elif kind == ATTR:
+            cmds.setAttr(key[1], value)
+
+    def _set(self, key: tuple, value) -> bool:
+        if _same(self._current[key], value):
+            return False
+        try:
+            self._write(key, value)
+        except RuntimeError as ex:
+            log.warning("Could not set %s to %s: %s", key[1:], value, ex)
+            return False
+        self._current[key] = value
+        return True
+
+    def setCamera(self, camera, **values):
+        """Set the viewport attributes of ``camera`` (``overscan=1.4``...)"""
+        shape = self._cameraShape(camera)
+        for attr, value in values.items():
+            self._set((CAMERA, shape, attr), value)
+
+    def setResolution(self, resolution: typing.Tuple[int, int]):
+        self.snapshot()
+        self._set((RESOLUTION, "width"), resolution[0])
+        self._set((RESOLUTION, "height"), resolution[1])
+
+    def resolution(self) -> typing.Tuple[int, int]:
+        self.snapshot()
+        return (
+            self._current[(RESOLUTION, "width")],
+            self._current[(RESOLUTION, "height")],
+        )
+
+    def setHUDVisibility(self, **flags):
+        """Toggle maya's HUDs by their :data:`HUD_VISIBILITY` name"""
+        self.snapshot()
+        for name, visible in flags.items():
+            self._set((HUD, name), bool(visible))
+
+    def setAttr(self, plug: str, value):
+        """Any other scene setting, ``hardwareRenderingGlobals.ssaoEnable``"""
+        key = (ATTR, plug)
+        if key not in self._original:
+            self._remember(key, cmds.getAttr(plug))
+        self._set(key, value)
+
+    def setHUDColors(self, label, value):
+        self.snapshot()
+        self._set((COLOR, HUD_COLORS[0]), label)
+        self._set((COLOR, HUD_COLORS[1]), value)
+
+    def restore(self):
+        """Put back every original value that was changed"""
+        for key, value in self._original.items():
+            self._set(key, value)
+
+    def __enter__(self):
+        self.snapshot()
+        return self
+
+    def __exit__(self, *args):
+        self.restore()
+
+
+@contextlib.contextmanager
+def guarded(state: typing.Optional[ViewportState] = None, cameras=()):
+    """``state`` when the caller manages one for the whole export, otherwise
+    a new state restored when the block ends"""
+    if state is not None:
+        yield state
+        return
+    with ViewportState() as state:
+        state.snapshot(cameras)
+        yield state
@@ -0,0 +1,22 @@
+"""Load the standard library only backend modules without importing the
+``src.backend`` package, which needs maya."""
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "backend")
+# stands in for ``src.backend`` so the modules can import each other
+PACKAGE = "multishot_backend"
+
+
+def loadBackendModule(name):
+    if PACKAGE not in sys.modules:
+        package = importlib.util.module_from_spec(
+            importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+        )
+        package.__path__ = [BACKEND]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(PACKAGE + "." + name)
@@ -0,0 +1,79 @@
+import os
+import struct
+import tempfile
+import unittest
+import wave
+
+from helpers import loadBackendModule
+
+audioslice = loadBackendModule("audioslice")
+
+RATE = 1000
+FPS = 10.0
+
+
+class AudioSlicerTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.folder = temp.name
+
+    def writeWav(self, frames, sampwidth=2):
+        """Mono WAV of ``frames`` samples numbered from 1"""
+        path = os.path.join(self.folder, "seq_%d.wav" % sampwidth)
+        with wave.open(path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(sampwidth)
+            out.setframerate(RATE)
+            fmt = "<%dh" % frames if sampwidth == 2 else "%dB" % frames
+            out.writeframes(struct.pack(fmt, *range(1, frames + 1)))
+        return path
+
+    def samples(self, path):
+        with wave.open(path, "rb") as f:
+            self.assertEqual(f.getframerate(), RATE)
+            count = f.getnframes()
+            return list(struct.unpack("<%dh" % count, f.readframes(count)))
+
+    def test_slice(self):
+        # one second of audio starting at scene frame 11, 100 samples a frame
+        with audioslice.AudioSlicer(self.writeWav(1000), 11, FPS) as slicer:
+            self.assertEqual(slicer.sampleAt(11), 0)
+            self.assertEqual(slicer.sampleAt(12.5), 150)
+            samples = self.samples(slicer.slice(12, 13))
+            self.assertEqual(samples, list(range(101, 301)))
+            self.assertIs(slicer.slice(12, 13), slicer.slice(12.0, 13.0))
+            self.assertTrue(slicer.matches(self.writeWav(1000), 11, FPS))
+            self.assertFalse(slicer.matches(self.writeWav(1000), 12, FPS))
+
+    def test_silence(self):
+        with audioslice.AudioSlicer(self.writeWav(1000), 11, FPS) as slicer:
+            before = self.samples(slicer.slice(10, 11))
+            self.assertEqual(before, [0] * 100 + list(range(1, 101)))
+            after = self.samples(slicer.slice(20, 21))
+            self.assertEqual(after, list(range(901, 1001)) + [0] * 100)
+            outside = self.samples(slicer.slice(30, 30))
+            self.assertEqual(outside, [0] * 100)
+
+    def test_unsigned_silence(self):
+        with audioslice.AudioSlicer(self.writeWav(100, 1), 1, FPS) as slicer:
+            with wave.open(slicer.slice(0, 0), "rb") as f:
+                self.assertEqual(f.readframes(100), b"\x80" * 100)
+
+    def test_close(self):
+        slicer = audioslice.AudioSlicer(self.writeWav(1000), 0, FPS)
+        path = slicer.slice(0, 1)
+        slicer.close()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(slicer.workDir))
+
+    def test_not_pcm(self):
+        path = os.path.join(self.folder, "seq.wav")
+        with open(path, "wb") as f:
+            f.write(b"not a wav file")
+        with self.assertRaises((wave.Error, EOFError)):
+            audioslice.AudioSlicer(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from helpers import loadBackendModule
+
+contentstore = loadBackendModule("contentstore")
+transfer = loadBackendModule("transfer")
+
+DATA = b"movie" * 100
+
+
+class ContentStoreTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.root = Path(temp.name)
+        self.sequence = self.root / "seq"
+        self.uploads = []
+
+    def copier(self, src, target):
+        self.uploads.append(target)
+        return transfer.smartCopy(src, target)
+
+    def publish(self, store, shot, data=DATA):
+        src = self.root / ("%s.mov" % shot)
+        src.write_bytes(data)
+        folder = self.sequence / "SHOTS" / shot
+        folder.mkdir(parents=True, exist_ok=True)
+        target = folder / src.name
+        return target, store.publish(src, target, copier=self.copier)
+
+    def test_store_root(self):
+        self.assertEqual(
+            contentstore.storeRoot(self.sequence / "SHOTS" / "sh010" / "a.mov"),
+            self.sequence / contentstore.STORE_DIR,
+        )
+        self.assertIsNone(contentstore.storeRoot(self.root / "a.mov"))
+
+    def test_link(self):
+        store = contentstore.ContentStore(minSize=10)
+        first, digest = self.publish(store, "sh010")
+        second, _ = self.publish(store, "sh020")
+        self.assertEqual(len(self.uploads), 1)
+        obj = contentstore.objectPath(self.sequence / contentstore.STORE_DIR, digest)
+        self.assertEqual(obj.read_bytes(), DATA)
+        self.assertTrue(os.path.samefile(first, obj))
+        self.assertTrue(os.path.samefile(second, obj))
+        self.assertEqual(digest, transfer.hashFile(first))
+        self.assertEqual(contentstore.resolve(first), first)
+
+    def test_ref(self):
+        store = contentstore.ContentStore(contentstore.REF, minSize=10)
+        target, digest = self.publish(store, "sh010")
+        self.assertFalse(target.exists())
+        ref = contentstore.readRef(target.with_name(target.name + ".msref"))
+        self.assertEqual(ref["hash"], digest)
+        self.assertEqual(ref["size"], len(DATA))
+        self.assertEqual(contentstore.resolve(target).read_bytes(), DATA)
+
+    def test_small_files(self):
+        store = contentstore.ContentStore(minSize=len(DATA) + 1)
+        target, digest = self.publish(store, "sh010")
+        self.assertIsNone(digest)
+        self.assertEqual(self.uploads, [target])
+        self.assertFalse((self.sequence / contentstore.STORE_DIR).exists())
+
+    def test_no_hardlinks(self):
+        store = contentstore.ContentStore(minSize=10)
+        with mock.patch.object(
+            contentstore.os, "link", side_effect=OSError("not supported")
+        ):
+            target, digest = self.publish(store, "sh010")
+            self.publish(store, "sh020")
+        self.assertIsNone(digest)
+        self.assertEqual(target.read_bytes(), DATA)
+        self.assertEqual(len(self.uploads), 2)
+        # probed once, nothing left in the store
+        self.assertEqual(list((self.sequence / contentstore.STORE_DIR).iterdir()), [])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            contentstore.ContentStore("copy")
+
+
+if __name__ == "__main__":
+    unittest.main()
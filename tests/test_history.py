@@ -0,0 +1,108 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from helpers import loadBackendModule
+
+history = loadBackendModule("history")
+transfer = loadBackendModule("transfer")
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.root = Path(temp.name)
+        self.share = self.root / "share"
+        self.share.mkdir()
+        self.jobs = []
+
+    def copyFile(self, src, des, depth=3, move=True, requires=(), **kwargs):
+        """exportutils.copyFile without a transfer session"""
+        job = transfer.TransferJob(src, des, depth, move, **kwargs)
+        if any(not r.ok for r in requires):
+            job.skip()
+        else:
+            transfer.runJob(job, self.root / "fallback")
+        self.jobs.append(job)
+        return job
+
+    def workDir(self):
+        return Path(tempfile.mkdtemp(dir=self.root))
+
+    def append(self, entry, name="sh010"):
+        return history.append(self.share, name, entry, self.workDir(), self.copyFile)
+
+    def writeLegacy(self, entries, name="sh010"):
+        with open(self.share / (name + history.LEGACY_SUFFIX), "w") as f:
+            json.dump(entries, f)
+
+    def test_append(self):
+        self.assertIsNone(history.latest(self.share, "sh010"))
+        self.append({"user": "ann", "time": "1"})
+        entry = self.append({"user": "bob", "time": "2"})
+        self.assertEqual(entry, {"user": "ann", "time": "2"})
+        self.assertEqual(
+            list(history.entries(self.share, "sh010")),
+            [{"user": "ann", "time": "1"}, {"user": "ann", "time": "2"}],
+        )
+        self.assertEqual(history.latest(self.share, "sh010"), entry)
+        index = history.readIndex(self.share, "sh010")
+        self.assertEqual(index["latest"], entry)
+        self.assertEqual(index["history"], "sh010" + history.HISTORY_SUFFIX)
+        self.assertTrue(all(job.ok for job in self.jobs))
+        # no temporary files left over
+        self.assertEqual(
+            sorted(p.name for p in self.share.iterdir()),
+            ["sh010" + history.INDEX_SUFFIX, "sh010" + history.HISTORY_SUFFIX],
+        )
+
+    def test_latest_without_index(self):
+        self.append({"user": "ann", "time": "1"})
+        self.append({"user": "ann", "time": "2"})
+        history.indexPath(self.share, "sh010").unlink()
+        self.assertEqual(
+            history.latest(self.share, "sh010"), {"user": "ann", "time": "2"}
+        )
+
+    def test_migrate(self):
+        legacy = [{"user": "ann", "time": "2"}, {"user": "ann", "time": "1"}]
+        self.writeLegacy(legacy)
+        entry = self.append({"user": "bob", "time": "3"})
+        self.assertEqual(entry["user"], "ann")
+        self.assertEqual(
+            [e["time"] for e in history.entries(self.share, "sh010")],
+            ["1", "2", "3"],
+        )
+        self.append({"user": "bob", "time": "4"})
+        self.assertEqual(
+            [e["time"] for e in history.entries(self.share, "sh010")],
+            ["1", "2", "3", "4"],
+        )
+        # left as it was
+        with open(self.share / ("sh010" + history.LEGACY_SUFFIX)) as f:
+            self.assertEqual(json.load(f), legacy)
+
+    def test_concurrent_migration(self):
+        self.writeLegacy([{"user": "ann", "time": "1"}])
+        workDirs = [self.workDir(), self.workDir()]
+        queued = []
+
+        def queue(src, des, **kwargs):
+            queued.append((src, des, kwargs))
+
+        # both blasts read the share before either of them published
+        for workDir, time in zip(workDirs, "23"):
+            history.append(
+                self.share, "sh010", {"user": "bob", "time": time}, workDir, queue
+            )
+        for src, des, kwargs in queued:
+            kwargs.pop("requires", None)
+            self.copyFile(src, des, **kwargs)
+        times = [e["time"] for e in history.entries(self.share, "sh010")]
+        self.assertEqual(times, ["1", "2", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from helpers import loadBackendModule
+
+imageencode = loadBackendModule("imageencode")
+
+# 3x2, odd width so the BMP rows are padded
+IMAGE = imageencode.RawImage(3, 2, bytes(range(18)))
+
+
+def writeBMP(path, image, bpp=24, topDown=False):
+    """The raw bakes maya writes, BGR(A) rows padded to 4 bytes"""
+    step = bpp // 8
+    stride = (image.width * step + 3) & ~3
+    rows = []
+    for y in range(image.height):
+        row = bytearray(stride)
+        for x in range(image.width):
+            r, g, b = image.pixels[(y * image.width + x) * 3 :][:3]
+            row[x * step : x * step + 3] = bytes((b, g, r))
+            if step == 4:
+                row[x * step + 3] = 255
+        rows.append(bytes(row))
+    if not topDown:
+        rows.reverse()
+    pixels = b"".join(rows)
+    height = -image.height if topDown else image.height
+    with open(path, "wb") as f:
+        f.write(b"BM" + struct.pack("<IHHI", 54 + len(pixels), 0, 0, 54))
+        f.write(
+            struct.pack(
+                "<IiiHHIIiiII",
+                40,
+                image.width,
+                height,
+                1,
+                bpp,
+                0,
+                len(pixels),
+                2835,
+                2835,
+                0,
+                0,
+            )
+        )
+        f.write(pixels)
+
+
+def readPNG(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos = 8
+    chunks = {}
+    while pos < len(data):
+        size, tag = struct.unpack_from(">I4s", data, pos)
+        payload = data[pos + 8 : pos + 8 + size]
+        crc = struct.unpack_from(">I", data, pos + 8 + size)[0]
+        assert crc == zlib.crc32(tag + payload) & 0xFFFFFFFF
+        chunks[tag] = payload
+        pos += 12 + size
+    width, height, depth, colorType = struct.unpack_from(">IIBB", chunks[b"IHDR"])
+    assert (depth, colorType) == (8, 2)
+    scanlines = zlib.decompress(chunks[b"IDAT"])
+    stride = width * 3 + 1
+    rows = [scanlines[y * stride : (y + 1) * stride] for y in range(height)]
+    assert all(row[0] == 0 for row in rows)
+    return imageencode.RawImage(width, height, b"".join(row[1:] for row in rows))
+
+
+def readTIFF(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:4] == b"II*\x00"
+    ifd = struct.unpack_from("<I", data, 4)[0]
+    tags = {}
+    for i in range(struct.unpack_from("<H", data, ifd)[0]):
+        tag, typ, count = struct.unpack_from("<HHI", data, ifd + 2 + i * 12)
+        fmt = "<H" if typ == 3 and count == 1 else "<I"
+        tags[tag] = struct.unpack_from(fmt, data, ifd + 2 + i * 12 + 8)[0]
+    assert struct.unpack_from("<HHH", data, tags[258]) == (8, 8, 8)
+    strip = data[tags[273] : tags[273] + tags[279]]
+    pixels = zlib.decompress(strip) if tags[259] == 8 else strip
+    return tags[259], imageencode.RawImage(tags[256], tags[257], pixels)
+
+
+class ImageEncodeTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.folder = temp.name
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def test_read_bmp(self):
+        for bpp in (24, 32):
+            for topDown in (False, True):
+                writeBMP(self.path("raw.bmp"), IMAGE, bpp, topDown)
+                self.assertEqual(imageencode.readBMP(self.path("raw.bmp")), IMAGE)
+
+    def test_read_not_bmp(self):
+        with open(self.path("raw.bmp"), "wb") as f:
+            f.write(b"II*\x00" + b"\x00" * 60)
+        with self.assertRaises(ValueError):
+            imageencode.readBMP(self.path("raw.bmp"))
+
+    def test_png(self):
+        imageencode.writePNG(self.path("tex.png"), IMAGE)
+        self.assertEqual(readPNG(self.path("tex.png")), IMAGE)
+
+    def test_tiff(self):
+        imageencode.writeTIFF(self.path("tex.tif"), IMAGE)
+        self.assertEqual(readTIFF(self.path("tex.tif")), (8, IMAGE))
+        imageencode.writeTIFF(self.path("tex.tif"), IMAGE, level=0)
+        self.assertEqual(readTIFF(self.path("tex.tif")), (1, IMAGE))
+
+    def test_pool(self):
+        with imageencode.EncoderPool("png", workers=2) as pool:
+            finals = []
+            for frame in range(4):
+                final = self.path("tex.%04d.iff" % frame)
+                raw = pool.rawPath(final)
+                self.assertEqual(raw, self.path("tex.%04d.bmp" % frame))
+                writeBMP(raw, IMAGE)
+                pool.submit(raw, final)
+                finals.append(final)
+            pool.submit(self.path("missing.bmp"), self.path("missing.png"))
+            errors = pool.wait()
+        self.assertEqual(len(errors), 1)
+        for final in finals:
+            self.assertEqual(readPNG(final), IMAGE)
+        self.assertEqual(
+            sorted(os.listdir(self.folder)), [os.path.basename(f) for f in finals]
+        )
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            imageencode.EncoderPool("exr")
+
+
+if __name__ == "__main__":
+    unittest.main()
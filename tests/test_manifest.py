@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from helpers import loadBackendModule
+
+manifest = loadBackendModule("manifest")
+transfer = loadBackendModule("transfer")
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.root = Path(temp.name)
+        (self.root / "share").mkdir()
+
+    def publish(self, name, data=b"data", **kwargs):
+        src = self.root / name
+        src.write_bytes(data)
+        job = transfer.TransferJob(src, self.root / "share", move=False, **kwargs)
+        transfer.runJob(job, self.root / "fallback", hashSource=True)
+        return job
+
+    def test_round_trip(self):
+        jobs = [self.publish("sh010.mov"), self.publish("sh010.ma")]
+        path = manifest.write(
+            self.root / "manifests" / "run.json",
+            manifest.fromJobs(jobs, scene="seq.ma"),
+        )
+        data = manifest.read(path)
+        self.assertEqual(data["scene"], "seq.ma")
+        self.assertEqual(data["version"], manifest.MANIFEST_VERSION)
+        self.assertEqual(len(data["files"]), 2)
+        entry = data["files"][0]
+        self.assertEqual(entry["status"], transfer.DONE)
+        self.assertEqual(entry["size"], 4)
+        self.assertEqual(entry["hash"], transfer.hashFile(self.root / "sh010.mov"))
+        self.assertEqual(manifest.verifyFile(path, deep=True), [])
+
+    def test_changed_files(self):
+        resized = self.publish("sh010.mov")
+        edited = self.publish("sh010.ma")
+        missing = self.publish("sh010.json")
+        (self.root / "share" / "sh010.mov").write_bytes(b"longer")
+        (self.root / "share" / "sh010.ma").write_bytes(b"date")
+        (self.root / "share" / "sh010.json").unlink()
+        data = manifest.fromJobs([resized, edited, missing])
+        errors = manifest.verify(data)
+        self.assertEqual(len(errors), 2)
+        self.assertIn("has 6 bytes, expected 4", errors[0])
+        self.assertIn("is missing", errors[1])
+        errors = manifest.verify(data, deep=True)
+        self.assertIn("does not match its source", errors[1])
+
+    def test_not_published(self):
+        skipped = transfer.TransferJob("a", "b")
+        skipped.skip()
+        failed = transfer.TransferJob(self.root / "missing.mov", self.root / "share")
+        transfer.runJob(failed, self.root / "fallback")
+        errors = manifest.verify(manifest.fromJobs([skipped, failed]))
+        self.assertEqual(len(errors), 1)
+        self.assertIn("was not published", errors[0])
+
+    def test_fallback(self):
+        job = self.publish("sh010.mov")
+        job.status = transfer.FALLBACK
+        errors = manifest.verify(manifest.fromJobs([job]))
+        self.assertIn("could not be published", errors[0])
+
+    def test_append(self):
+        log = self.root / "share" / "sh010.jsonl"
+        log.write_bytes(b"older\n")
+        job = self.publish("sh010.jsonl", b"new\n", append=True)
+        entry = manifest.entryFromJob(job)
+        self.assertTrue(entry["append"])
+        self.assertEqual(entry["size"], 4)
+        self.assertIsNone(entry["hash"])
+        self.assertIsNone(manifest.checkEntry(entry, deep=True))
+        log.write_bytes(b"")
+        self.assertIn("expected at least 4", manifest.checkEntry(entry))
+
+
+if __name__ == "__main__":
+    unittest.main()
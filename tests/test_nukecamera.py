@@ -0,0 +1,116 @@
+import io
+import os
+import tempfile
+import typing
+import unittest
+
+from helpers import loadBackendModule
+
+nukecamera = loadBackendModule("nukecamera")
+
+
+class Samples(typing.NamedTuple):
+    """Same fields as camerabake.CameraSamples"""
+
+    name: str
+    frames: typing.List[float]
+    translate: typing.List[typing.Tuple[float, float, float]]
+    rotate: typing.List[typing.Tuple[float, float, float]]
+    rotateOrder: int
+    lens: typing.Dict[str, typing.List[float]]
+    filmFit: int = 1
+    timeUnit: str = "film"
+
+
+SAMPLES = Samples(
+    name="shotCam",
+    frames=[101.0, 102.0, 103.0],
+    translate=[(0.0, 1.0, 2.0), (0.5, 1.0, 2.0), (1.0, 1.0, 2.25)],
+    rotate=[(0.0, 90.0, 0.0), (0.0, 90.5, 0.0), (0.0, 91.0, -1.0)],
+    rotateOrder=2,
+    lens={
+        "focalLength": [35.0, 35.0, 50.0],
+        "horizontalFilmAperture": [1.417] * 3,
+        "verticalFilmAperture": [0.945] * 3,
+        "nearClipPlane": [0.1] * 3,
+        "farClipPlane": [10000.0] * 3,
+    },
+)
+
+GOLDEN_CAMERA = """push 0
+Camera {
+ selectable false
+ rot_order ZXY
+ translate {{curve x101 0 0.5 1} {curve x101 1 1 1} {curve x101 2 2 2.25}}
+ rotate {{curve x101 0 0 0} {curve x101 90 90.5 91} {curve x101 0 0 -1}}
+ focal {{curve x101 35 35 50}}
+ haperture 35.9918
+ vaperture 24.003
+ near 0.1
+ far 10000
+ win_scale {1 1}
+ name Camera
+ label shotCam
+}
+"""
+
+GOLDEN_SCENE = """Scene {
+ inputs 1
+ name Maya_Scene
+}
+"""
+
+GOLDEN_CHAN = (
+    "101\t0\t1\t2\t0\t90\t0\t37.853683\n"
+    "102\t0.5\t1\t2\t0\t90.5\t0\t37.853683\n"
+    "103\t1\t1\t2.25\t0\t91\t-1\t26.994717\n"
+)
+
+
+class NukeCameraTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_camera_node(self):
+        f = io.StringIO()
+        nukecamera.writeNukeCamera(f, SAMPLES)
+        self.assertEqual(f.getvalue(), GOLDEN_CAMERA)
+
+    def test_nk(self):
+        path = nukecamera.writeNuke(SAMPLES, os.path.join(self.tmp.name, "cam.nk"))
+        self.assertEqual(self.read(path), GOLDEN_CAMERA + GOLDEN_SCENE)
+
+    def test_label(self):
+        f = io.StringIO()
+        nukecamera.writeNukeCamera(f, SAMPLES, name="sh010_cam")
+        self.assertIn(" label sh010_cam\n", f.getvalue())
+
+    def test_animated_aperture(self):
+        lens = dict(SAMPLES.lens, verticalFilmAperture=[0.945, 0.945, 1.0])
+        del lens["nearClipPlane"]
+        f = io.StringIO()
+        nukecamera.writeNukeCamera(f, SAMPLES._replace(lens=lens))
+        self.assertIn(" vaperture {curve x101 24.003 24.003 25.4}\n", f.getvalue())
+        self.assertNotIn(" near ", f.getvalue())
+
+    def test_animated_clip_planes(self):
+        lens = dict(SAMPLES.lens, nearClipPlane=[0.1, 0.5, 1.0])
+        f = io.StringIO()
+        nukecamera.writeNukeCamera(f, SAMPLES._replace(lens=lens))
+        self.assertIn(" near {curve x101 0.1 0.5 1}\n far 10000\n", f.getvalue())
+
+    def test_chan(self):
+        path = nukecamera.writeChan(SAMPLES, os.path.join(self.tmp.name, "cam.chan"))
+        self.assertEqual(self.read(path), GOLDEN_CHAN)
+
+    def test_vertical_fov(self):
+        self.assertAlmostEqual(nukecamera.verticalFov(35.0, 0.945), 37.853683, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
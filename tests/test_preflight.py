@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from helpers import loadBackendModule
+
+preflight = loadBackendModule("preflight")
+
+
+class CheckPathsTest(unittest.TestCase):
+    def setUp(self):
+        preflight.clearCache()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.addCleanup(preflight.clearCache)
+
+    def stubExists(self, hanging=(), existing=(), slow=()):
+        """``os.path.exists`` blocking on the ``hanging`` paths until the
+        test is over, and taking a while on the ``slow`` ones"""
+
+        def exists(path):
+            if path in slow:
+                time.sleep(0.2)
+            if path in hanging:
+                self.release.wait()
+            return path in existing
+
+        patcher = mock.patch.object(preflight.os.path, "exists", exists)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results(self):
+        self.stubExists(existing=("A",))
+        seen = []
+        results = preflight.checkPaths(
+            ["A", "B", "A"], onResult=lambda path, status: seen.append(path)
+        )
+        self.assertEqual(results, {"A": preflight.EXISTS, "B": preflight.MISSING})
+        self.assertEqual(sorted(seen), ["A", "B"])
+
+    def test_cached(self):
+        self.stubExists(existing=("A",))
+        preflight.checkPaths(["A"])
+        self.assertTrue(preflight.cached("A"))
+        self.stubExists(existing=())
+        self.assertEqual(preflight.checkPaths(["A"]), {"A": preflight.EXISTS})
+        self.assertEqual(preflight.checkPaths(["A"], ttl=0), {"A": preflight.MISSING})
+
+    def test_timeout(self):
+        self.stubExists(hanging=("A",), existing=("B",))
+        start = time.monotonic()
+        results = preflight.checkPaths(["A", "B"], timeout=0.2)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(results, {"A": preflight.TIMEOUT, "B": preflight.EXISTS})
+
+    def test_every_worker_hung(self):
+        # the threads hang one after the other, the last path never starts
+        self.stubExists(hanging=("A", "C"), existing=("B",), slow=("B",))
+        idle = []
+        with mock.patch.object(preflight, "MAX_WORKERS", 2):
+            start = time.monotonic()
+            results = preflight.checkPaths(
+                ["A", "B", "C", "D"], timeout=0.3, idle=lambda: idle.append(1)
+            )
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(
+            results,
+            {
+                "A": preflight.TIMEOUT,
+                "B": preflight.EXISTS,
+                "C": preflight.TIMEOUT,
+                "D": preflight.TIMEOUT,
+            },
+        )
+        self.assertTrue(idle)
+
+
+if __name__ == "__main__":
+    unittest.main()
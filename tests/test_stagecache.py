@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from helpers import loadBackendModule
+
+stagecache = loadBackendModule("stagecache")
+
+
+class Job(object):
+    """Stands in for a transfer job, finished by the test"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def addDoneCallback(self, callback):
+        self.callbacks.append(callback)
+
+    def finish(self):
+        for callback in self.callbacks:
+            callback(self)
+
+
+class StagingCacheTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.cache = stagecache.StagingCache(Path(temp.name) / "cache", 250)
+
+    def build(self, key, size=100, age=0):
+        with self.cache.building(key) as folder:
+            (folder / "out.abc").write_bytes(b"x" * size)
+        path = self.cache.get(key)
+        if age:
+            stamp = time.time() - age
+            os.utime(path / stagecache.ENTRY_FILE, (stamp, stamp))
+        return path
+
+    def keys(self):
+        return sorted(path.name for _, _, path in self.cache.entries())
+
+    def test_build(self):
+        self.assertIsNone(self.cache.get("sh010:abc"))
+        path = self.build("sh010:abc")
+        self.assertEqual(path, self.cache.entryPath("sh010:abc"))
+        self.assertEqual(path.name, "sh010_abc")
+        self.assertEqual([p.name for p in self.cache.files("sh010:abc")], ["out.abc"])
+        self.assertIsNone(self.cache.get(None))
+
+    def test_failed_build(self):
+        with self.assertRaises(RuntimeError):
+            with self.cache.building("sh010") as folder:
+                (folder / "out.abc").write_bytes(b"x")
+                raise RuntimeError("export failed")
+        self.assertIsNone(self.cache.get("sh010"))
+        with self.assertRaises(IOError):
+            with self.cache.building("sh010"):
+                pass
+        self.assertIsNone(self.cache.get("sh010"))
+        self.cache.clearBuilds()
+        self.assertFalse((self.cache.root / stagecache.BUILD_DIR).exists())
+
+    def test_evict_least_recently_used(self):
+        self.build("sh010", age=30)
+        self.build("sh020", age=20)
+        self.cache.get("sh010")
+        self.build("sh030")
+        self.assertEqual(self.keys(), ["sh010", "sh030"])
+
+    def test_keep_committed(self):
+        self.build("sh010", age=30)
+        self.build("sh020", size=300)
+        self.assertEqual(self.keys(), ["sh020"])
+
+    def test_pins(self):
+        self.build("sh010", age=30)
+        self.build("sh020", age=20)
+        release = self.cache.pin("sh010")
+        job = Job()
+        self.cache.pinUntil("sh020", [job, None])
+        self.build("sh030")
+        self.assertEqual(self.keys(), ["sh010", "sh020", "sh030"])
+        release()
+        # released twice does not unpin an other reader
+        release()
+        self.cache.evict()
+        self.assertEqual(self.keys(), ["sh020", "sh030"])
+        job.finish()
+        self.build("sh040")
+        self.assertEqual(self.keys(), ["sh030", "sh040"])
+
+
+if __name__ == "__main__":
+    unittest.main()
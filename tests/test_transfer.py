@@ -0,0 +1,259 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from helpers import loadBackendModule
+
+transfer = loadBackendModule("transfer")
+
+
+class TransferTestCase(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.root = Path(temp.name)
+        self.local = self.root / "local"
+        self.share = self.root / "share"
+        self.fallback = self.root / "fallback"
+        for folder in (self.local, self.share, self.fallback):
+            folder.mkdir()
+
+    def source(self, name, data=b"data"):
+        path = self.local / name
+        path.write_bytes(data)
+        return path
+
+    def queue(self, **kwargs):
+        queue = transfer.TransferQueue(
+            self.root / "journal.jsonl", self.fallback, retryDelay=0, **kwargs
+        )
+        self.addCleanup(queue.close)
+        return queue
+
+
+class SourceErrorTest(TransferTestCase):
+    def test_missing_source(self):
+        queue = self.queue(workers=1)
+        policy = queue.policyFor(self.share)
+        missing = queue.submit(self.local / "missing.mov", self.share)
+        copied = queue.submit(self.source("sh010.mov"), self.share)
+        queue.wait()
+        self.assertEqual(missing.status, transfer.FAILED)
+        self.assertTrue(missing.sourceFailed)
+        self.assertEqual(missing.attempts, 0)
+        self.assertEqual(copied.status, transfer.DONE)
+        self.assertEqual((self.share / "sh010.mov").read_bytes(), b"data")
+        self.assertFalse(queue.isDown(self.share))
+        self.assertEqual(policy.limit, policy.maxConcurrent)
+        self.assertEqual(list(self.fallback.iterdir()), [])
+
+    def test_unreachable_destination(self):
+        queue = self.queue(workers=1, retries=1)
+        # a file where the destination folder should be
+        share = self.share / "SHOTS"
+        share.write_bytes(b"")
+        first = queue.submit(self.source("sh010.mov"), share / "sh010")
+        second = queue.submit(self.source("sh020.mov"), share / "sh020")
+        queue.wait()
+        self.assertEqual(first.status, transfer.FALLBACK)
+        self.assertEqual(first.attempts, 2)
+        self.assertEqual(second.status, transfer.FALLBACK)
+        self.assertEqual(second.attempts, 0)
+        self.assertTrue(queue.isDown(share))
+        saved = self.fallback / "share" / "SHOTS" / "sh020" / "sh020.mov"
+        self.assertTrue(saved.is_file())
+
+
+class CopyTest(TransferTestCase):
+    def test_copy_once(self):
+        target = self.share / "sh010.mov"
+        target.write_bytes(b"old")
+        transfer.copyOnce(self.source("sh010.mov"), target)
+        self.assertEqual(target.read_bytes(), b"data")
+        self.assertEqual([p.name for p in self.share.iterdir()], ["sh010.mov"])
+
+    def test_chunked_copy(self):
+        data = bytes(range(256)) * 10
+        digest = transfer.chunkedCopy(
+            self.source("sh010.mov", data), self.share / "sh010.mov", chunkSize=100
+        )
+        self.assertEqual((self.share / "sh010.mov").read_bytes(), data)
+        self.assertEqual(digest, transfer.hashFile(self.share / "sh010.mov"))
+        self.assertFalse((self.share / "sh010.mov.part").exists())
+
+    def test_chunked_copy_resume(self):
+        data = bytes(range(256)) * 10
+        part = self.share / ("sh010.mov" + transfer.PART_SUFFIX)
+        part.write_bytes(data[:1000])
+        sent = []
+        transfer.chunkedCopy(
+            self.source("sh010.mov", data),
+            self.share / "sh010.mov",
+            chunkSize=500,
+            onChunk=sent.append,
+        )
+        self.assertEqual((self.share / "sh010.mov").read_bytes(), data)
+        self.assertEqual(sum(sent), len(data) - 1000)
+
+    def test_chunked_copy_bad_part(self):
+        data = bytes(range(256)) * 10
+        part = self.share / ("sh010.mov" + transfer.PART_SUFFIX)
+        part.write_bytes(b"x" * 1000)
+        sent = []
+        transfer.chunkedCopy(
+            self.source("sh010.mov", data),
+            self.share / "sh010.mov",
+            chunkSize=500,
+            onChunk=sent.append,
+        )
+        self.assertEqual((self.share / "sh010.mov").read_bytes(), data)
+        self.assertEqual(sum(sent), len(data))
+
+    def test_chunked_copy_verify(self):
+        src = self.source("sh010.mov", b"a" * 1000)
+        # the part reads back different from what was sent
+        with mock.patch.object(transfer, "hashFile", return_value="0" * 128):
+            with self.assertRaises(IOError):
+                transfer.chunkedCopy(src, self.share / "sh010.mov", chunkSize=100)
+        self.assertEqual(list(self.share.iterdir()), [])
+
+    def test_append(self):
+        target = self.share / "sh010.jsonl"
+        transfer.appendFile(self.source("a", b"1\n"), target)
+        transfer.appendFile(self.source("b", b"2\n"), target)
+        transfer.appendFile(self.source("c", b"3\n"), target, exclusive=True)
+        self.assertEqual(target.read_bytes(), b"1\n2\n")
+
+    def test_fallback_path(self):
+        job = transfer.TransferJob(self.source("sh010.mov"), self.share / "a/b/c/d")
+        target = transfer.fallbackCopy(job, self.fallback)
+        self.assertEqual(target, self.fallback / "b" / "c" / "d" / "sh010.mov")
+        self.assertTrue(target.is_file())
+
+
+class TransferQueueTest(TransferTestCase):
+    def test_move(self):
+        queue = self.queue()
+        src = self.source("sh010.mov")
+        job = queue.submit(src, self.share)
+        self.assertEqual(queue.wait(), [job])
+        self.assertTrue(job.ok)
+        self.assertEqual(job.target, self.share / "sh010.mov")
+        self.assertEqual(job.size, 4)
+        self.assertFalse(src.exists())
+        # the queue can be reused after the barrier
+        other = queue.submit(self.source("sh020.mov"), self.share, move=False)
+        self.assertEqual(queue.wait(), [other])
+        self.assertTrue((self.local / "sh020.mov").exists())
+
+    def test_requires(self):
+        queue = self.queue()
+        first = queue.submit(self.source("sh010.ma"), self.share)
+        second = queue.submit(self.source("sh010.mov"), self.share, requires=[first])
+        missing = queue.submit(self.local / "missing.ma", self.share)
+        skipped = queue.submit(
+            self.source("sh020.mov"), self.share, requires=[first, missing]
+        )
+        self.assertEqual(set(queue.wait()), {first, second, missing, skipped})
+        self.assertTrue(second.ok)
+        self.assertEqual(skipped.status, transfer.SKIPPED)
+        self.assertFalse((self.share / "sh020.mov").exists())
+        self.assertTrue((self.local / "sh020.mov").exists())
+
+    def test_hash_sources(self):
+        queue = self.queue(hashSources=True)
+        src = self.source("sh010.mov")
+        expected = transfer.hashFile(src)
+        job = queue.submit(src, self.share)
+        queue.wait()
+        self.assertEqual(job.hash, expected)
+
+    def test_resume(self):
+        journal = self.root / "journal.jsonl"
+        src = self.source("sh010.mov")
+        done = transfer.TransferJob(self.source("sh020.mov"), self.share)
+        pending = transfer.TransferJob(src, self.share, depth=2, append=True)
+        gone = transfer.TransferJob(self.local / "missing.mov", self.share)
+        with open(journal, "w") as f:
+            for event, job in (
+                ("queued", done),
+                ("queued", pending),
+                ("queued", gone),
+                ("finished", done),
+            ):
+                f.write(json.dumps(dict(job.toDict(), event=event)) + "\n")
+            f.write("not json\n")
+
+        queue = self.queue()
+        resumed = queue.resume()
+        self.assertEqual([job.id for job in resumed], [pending.id])
+        self.assertEqual(resumed[0].depth, 2)
+        self.assertTrue(resumed[0].append)
+        queue.wait()
+        self.assertTrue(resumed[0].ok)
+        self.assertEqual(queue.pendingFromJournal(), [])
+
+
+class DestinationPolicyTest(unittest.TestCase):
+    def test_destination_root(self):
+        self.assertEqual(
+            transfer.destinationRoot("/mnt/seq/SHOTS"),
+            transfer.destinationRoot("/mnt/other"),
+        )
+        self.assertEqual(
+            transfer.destinationRoot("//server/share/seq/SHOTS"),
+            transfer.destinationRoot("//server/share/other"),
+        )
+
+    def test_congestion(self):
+        policy = transfer.DestinationPolicy(maxConcurrent=8, minReportSize=100)
+        policy.report(1000, 1.0)
+        self.assertEqual(policy.bestThroughput, 1000)
+        # too small to say anything about the share
+        policy.report(10, 10.0)
+        self.assertEqual(policy.limit, 8)
+        policy.report(1000, 10.0)
+        self.assertEqual(policy.limit, 4)
+        policy.report(1000, 1.0, ok=False)
+        self.assertEqual(policy.limit, 2)
+        policy.report(1000, 1.0)
+        self.assertEqual(policy.limit, 3)
+
+    def test_slots(self):
+        policy = transfer.DestinationPolicy(maxConcurrent=2)
+        active = []
+        peak = [0]
+        lock = threading.Lock()
+
+        def work():
+            with policy.slot():
+                with lock:
+                    active.append(1)
+                    peak[0] = max(peak[0], len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(policy.active, 0)
+
+    def test_from_conf(self):
+        policy = transfer.DestinationPolicy.fromConf(
+            {"max_concurrent": 0, "bandwidth": 1e6}
+        )
+        self.assertEqual(policy.maxConcurrent, 1)
+        self.assertEqual(policy.bandwidth, 1e6)
+        self.assertEqual(policy.minReportSize, transfer.MIN_REPORT_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import json
+import sys
+import threading
+import unittest
+
+from helpers import loadBackendModule
+
+videoencode = loadBackendModule("videoencode")
+
+JOB = videoencode.EncodeJob(
+    frames="/tmp/sh010/sh010.%04d.bmp",
+    start=101,
+    fps=24.0,
+    output="/tmp/sh010/sh010.mov",
+)
+
+
+class StubEncoder(object):
+    """Records the commands instead of running ffmpeg, fails the ones whose
+    output is in ``failing``"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def __call__(self, command):
+        with self._lock:
+            self.commands.append(command)
+        if command[-1] in self.failing:
+            raise RuntimeError("ffmpeg failed (1): %s" % command[-1])
+
+
+class BuildCommandTest(unittest.TestCase):
+    def test_video_only(self):
+        command = videoencode.buildCommand(JOB, ffmpeg="/opt/ffmpeg", crf=20)
+        self.assertEqual(
+            command,
+            [
+                "/opt/ffmpeg",
+                "-y",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-framerate",
+                "24",
+                "-start_number",
+                "101",
+                "-i",
+                JOB.frames,
+                "-map",
+                "0:v:0",
+                "-vf",
+                "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "medium",
+                "-crf",
+                "20",
+                "-pix_fmt",
+                "yuv420p",
+                JOB.output,
+            ],
+        )
+
+    def test_audio_after_start(self):
+        job = JOB._replace(audio="/tmp/seq.wav", audioOffset=77)
+        command = videoencode.buildCommand(job)
+        index = command.index("-ss")
+        self.assertEqual(
+            command[index : index + 4], ["-ss", "1.000000", "-i", job.audio]
+        )
+        self.assertIn("1:a:0", command)
+        self.assertIn("-shortest", command)
+
+    def test_audio_before_start(self):
+        job = JOB._replace(audio="/tmp/seq.wav", audioOffset=113)
+        self.assertEqual(
+            videoencode.audioArgs(job), ["-itsoffset", "0.500000", "-i", job.audio]
+        )
+
+    def test_filter_order(self):
+        job = JOB._replace(filters=("crop=1920:1080",), burnIns=("drawtext=x",))
+        command = videoencode.buildCommand(job)
+        self.assertEqual(
+            command[command.index("-vf") + 1],
+            "crop=1920:1080,drawtext=x,scale=trunc(iw/2)*2:trunc(ih/2)*2",
+        )
+
+    def test_burn_in_escaping(self):
+        (drawtext,) = videoencode.burnInFilters(
+            [videoencode.BurnIn("it's 10:30", frames=(0, 11))], 1080
+        )
+        self.assertIn("text=it\\\\\\'s 10\\\\:30", drawtext)
+        self.assertIn("enable=between(n\\,0\\,11)", drawtext)
+
+
+class VideoEncoderPoolTest(unittest.TestCase):
+    def test_submit(self):
+        stub = StubEncoder()
+        done = []
+        with videoencode.VideoEncoderPool(workers=2, runner=stub, crf=23) as pool:
+            for shot in ("sh010", "sh020", "sh030"):
+                pool.submit(JOB._replace(output=shot + ".mov"), onDone=done.append)
+            self.assertEqual(pool.wait(), [])
+        self.assertEqual(
+            sorted(command[-1] for command in stub.commands),
+            ["sh010.mov", "sh020.mov", "sh030.mov"],
+        )
+        self.assertTrue(all("23" in command for command in stub.commands))
+        self.assertEqual(
+            sorted(job.output for job in done), ["sh010.mov", "sh020.mov", "sh030.mov"]
+        )
+
+    def test_errors(self):
+        stub = StubEncoder(failing=["sh020.mov"])
+        done = []
+        with videoencode.VideoEncoderPool(runner=stub) as pool:
+            for shot in ("sh010", "sh020"):
+                pool.submit(JOB._replace(output=shot + ".mov"), onDone=done.append)
+            errors = pool.wait()
+            # the errors are only reported once
+            self.assertEqual(pool.wait(), [])
+        self.assertEqual(errors, ["ffmpeg failed (1): sh020.mov"])
+        self.assertEqual([job.output for job in done], ["sh010.mov"])
+
+    def test_run(self):
+        stub = StubEncoder()
+        called = []
+        with videoencode.VideoEncoderPool(runner=stub) as pool:
+            pool.run(["ffmpeg", "-i", "a", "b.jpg"], lambda: called.append(True))
+            self.assertEqual(pool.wait(), [])
+        self.assertEqual(stub.commands, [["ffmpeg", "-i", "a", "b.jpg"]])
+        self.assertEqual(called, [True])
+
+
+class RunProcessTest(unittest.TestCase):
+    def test_failure(self):
+        with self.assertRaises(RuntimeError) as context:
+            videoencode.runProcess(
+                [
+                    sys.executable,
+                    "-c",
+                    "import sys; sys.stderr.write('bad'); sys.exit(3)",
+                ]
+            )
+        self.assertEqual(str(context.exception), "ffmpeg failed (3): bad")
+
+    def test_success(self):
+        videoencode.runProcess([sys.executable, "-c", "pass"])
+
+    def test_output(self):
+        output = videoencode.runProcess([sys.executable, "-c", "print('ok')"])
+        self.assertEqual(output.strip(), b"ok")
+
+
+VIDEO = {
+    "codec_type": "video",
+    "codec_name": "h264",
+    "width": 1280,
+    "height": 720,
+    "r_frame_rate": "24/1",
+    "pix_fmt": "yuv420p",
+}
+AUDIO = {"codec_type": "audio", "codec_name": "aac", "sample_rate": "48000"}
+
+
+class CheckConcatTest(unittest.TestCase):
+    def probe(self, streams):
+        def runner(command):
+            return json.dumps({"streams": streams[command[-1]]}).encode()
+
+        return runner
+
+    def test_ffprobe_path(self):
+        self.assertEqual(
+            videoencode.ffprobePath("/opt/bin/ffmpeg.exe"), "/opt/bin/ffprobe.exe"
+        )
+        self.assertEqual(videoencode.ffprobePath(), "ffprobe")
+
+    def test_matching(self):
+        runner = self.probe({"a.mov": [VIDEO, AUDIO], "b.mov": [VIDEO, AUDIO]})
+        videoencode.checkConcat(["a.mov", "b.mov"], runner=runner)
+
+    def test_mismatch(self):
+        hd = dict(VIDEO, width=1920, height=1080)
+        runner = self.probe(
+            {"a.mov": [VIDEO, AUDIO], "b.mov": [VIDEO], "c.mov": [hd, AUDIO]}
+        )
+        with self.assertRaises(ValueError) as cm:
+            videoencode.checkConcat(["a.mov", "b.mov", "c.mov"], runner=runner)
+        message = str(cm.exception)
+        self.assertIn("b.mov: h264 1280x720 24/1 fps yuv420p\n", message)
+        self.assertIn("c.mov: h264 1920x1080 24/1 fps yuv420p, aac 48000 Hz", message)
+
+
+if __name__ == "__main__":
+    unittest.main()